@@ -0,0 +1,99 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# 默认统计的百分位数
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+# 默认直方图分段：不及格 / 及格 / 中 / 良 / 优，最后一段包含 100 分
+DEFAULT_BINS = (0, 60, 70, 80, 90, 100)
+
+
+# === 课程成绩统计（向量化） ===
+def check_options(percentiles: Sequence[float], bins: Sequence[float]) -> None:
+    """校验统计参数，不合法时抛出 ValueError"""
+    if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+        raise ValueError("百分位数须在 0 到 100 之间")
+    if len(bins) < 2 or any(b >= c for b, c in zip(bins, bins[1:])):
+        raise ValueError("直方图分段至少两个端点且须严格递增")
+
+
+def percentile_key(p: float) -> str:
+    """百分位数在结果中的键：查询参数解析为浮点数，50.0 与 50 都记为 '50'，12.5 记为 '12.5'"""
+    return f"{p:g}"
+
+
+def _ranks(grades: np.ndarray) -> np.ndarray:
+    """按成绩从高到低排名，同分同名次（1, 2, 2, 4）；返回排序下标和对应名次"""
+    order = np.argsort(-grades, kind="stable")
+    descending = -grades[order]
+    # 升序数组中同分的最左位置即名次 - 1
+    return order, np.searchsorted(descending, descending, side="left") + 1
+
+
+def grade_stats(student_ids: np.ndarray, grades: np.ndarray,
+                percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                bins: Sequence[float] = DEFAULT_BINS) -> Dict:
+    """
+    一门课的成绩统计，grades 中未出成绩的为 NaN
+    排名按列返回（student_id / grade / rank 三个等长列表，按名次排序），避免逐行构造对象
+    """
+    graded = ~np.isnan(grades)
+    values = grades[graded]
+    ids = student_ids[graded]
+    stats = {
+        "enrolled": int(grades.size),
+        "graded": int(values.size),
+        "histogram": {"edges": [float(b) for b in bins], "counts": [0] * (len(bins) - 1)},
+        "ranking": {"student_id": [], "grade": [], "rank": []}
+    }
+    if not values.size:
+        stats.update(mean=None, median=None, std=None, min=None, max=None, pass_rate=None,
+                     percentiles={percentile_key(p): None for p in percentiles})
+        return stats
+
+    counts, _ = np.histogram(values, bins=bins)
+    order, ranks = _ranks(values)
+    stats.update(
+        mean=float(values.mean()),
+        median=float(np.median(values)),
+        # 总体标准差
+        std=float(values.std()),
+        min=float(values.min()),
+        max=float(values.max()),
+        pass_rate=float(np.count_nonzero(values >= 60) / values.size),
+        percentiles=dict(zip(map(percentile_key, percentiles), np.percentile(values, percentiles).tolist()))
+    )
+    stats["histogram"]["counts"] = counts.tolist()
+    stats["ranking"] = {
+        "student_id": ids[order].tolist(),
+        "grade": values[order].tolist(),
+        "rank": ranks.tolist()
+    }
+    return stats
+
+
+def course_grade_stats(columns: Dict[str, List], course_ids: Sequence[int],
+                       percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                       bins: Sequence[float] = DEFAULT_BINS) -> Dict[int, Dict]:
+    """
+    多门课的成绩统计
+    columns 为 DataStore.get_course_grades 返回的列（按 course_id 排序），一次转成数组后按课程切分
+    没有选课记录的课程也返回（各项为空）
+    """
+    course_col = np.asarray(columns["course_id"], dtype=np.int64)
+    student_col = np.asarray(columns["student_id"], dtype=np.int64)
+    # None（未出成绩）转为 NaN
+    grade_col = np.asarray(columns["grade"], dtype=float)
+
+    # 已按 course_id 排序，相邻值变化处即各课程的分界
+    bounds = {}
+    if course_col.size:
+        starts = np.flatnonzero(np.r_[True, course_col[1:] != course_col[:-1]])
+        ends = np.r_[starts[1:], course_col.size]
+        bounds = dict(zip(course_col[starts].tolist(), zip(starts.tolist(), ends.tolist())))
+
+    result = {}
+    for course_id in course_ids:
+        start, end = bounds.get(course_id, (0, 0))
+        result[course_id] = grade_stats(student_col[start:end], grade_col[start:end], percentiles, bins)
+    return result
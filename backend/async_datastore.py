@@ -0,0 +1,96 @@
+import inspect
+import itertools
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.util import greenlet_spawn
+
+from datastore import DataStore
+from db import (
+    AsyncSessionLocal, AsyncReadSessionLocal, async_read_router, make_session_factories,
+    DB_STREAM_BATCH_SIZE
+)
+
+
+def _take(gen, n: int):
+    return list(itertools.islice(gen, n))
+
+
+# === 异步执行层 ===
+class AsyncDataStore:
+    """
+    DataStore 的异步包装，查询构造和结果组装全部复用 DataStore，这里只负责执行
+    - 会话绑定异步引擎（aiomysql）的 sync_engine，方法在 greenlet 中执行，
+      每次数据库往返都让出事件循环，不占用线程
+    - 相同读请求的合并在事件循环上完成（同步的 SingleFlight 等待时会阻塞事件循环）
+    """
+
+    def __init__(self, engine=None, replica_engines=None):
+        # 会话工厂：默认使用 db 模块配置的异步主库/副本，也可传入异步引擎单独构造
+        if engine is None:
+            factories = (AsyncSessionLocal, AsyncReadSessionLocal, async_read_router)
+        else:
+            factories = make_session_factories(engine.sync_engine, [e.sync_engine for e in replica_engines or []])
+        self._store = DataStore(session_factories=factories)
+        # 内层方法不再合并，由本层按 coalesce_key 合并
+        self.single_flight = self._store.single_flight
+        self._store.single_flight = None
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._store, name)
+        # 非方法属性（principal_cache、upload_dir 等）直接透传
+        if name.startswith("_") or not callable(attr) or not hasattr(attr, "__self__"):
+            return attr
+        if inspect.isgeneratorfunction(attr):
+            return self._wrap_generator(name, attr)
+        prepare = getattr(attr, "coalesce_key", None)
+
+        async def call(*args, **kwargs):
+            if prepare is not None:
+                key, bound = prepare(self._store, args, kwargs)
+                if key is not None:
+                    # bound 中的 db 已置为 None，合并后的调用使用自己的只读会话
+                    return await self.single_flight.run_async(
+                        key, lambda: greenlet_spawn(attr, *bound.args[1:], **bound.kwargs)
+                    )
+            return await greenlet_spawn(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    @asynccontextmanager
+    async def unit_of_work(self, db: Optional[Session] = None, readonly: bool = False) -> AsyncGenerator[Session, None]:
+        """请求级事务：会话的提交、回滚和关闭同样在 greenlet 中执行"""
+        if db is not None:
+            yield db
+            return
+        cm = self._store.unit_of_work(readonly=readonly)
+        db = await greenlet_spawn(cm.__enter__)
+        try:
+            yield db
+        except BaseException:
+            await greenlet_spawn(cm.__exit__, *sys.exc_info())
+            raise
+        else:
+            await greenlet_spawn(cm.__exit__, None, None, None)
+
+    def _wrap_generator(self, name: str, fn):
+        """流式方法：生成器在 greenlet 中按批推进（服务端游标），对外表现为异步生成器"""
+
+        async def stream(*args, **kwargs):
+            gen = fn(*args, **kwargs)
+            try:
+                while True:
+                    batch = await greenlet_spawn(_take, gen, DB_STREAM_BATCH_SIZE)
+                    if not batch:
+                        return
+                    for item in batch:
+                        yield item
+            finally:
+                # 客户端断开时同样关闭生成器，释放会话和服务端游标
+                await greenlet_spawn(gen.close)
+
+        stream.__name__ = name
+        return stream
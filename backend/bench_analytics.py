@@ -0,0 +1,50 @@
+"""
+课程成绩统计的微基准
+按 DataStore.get_course_grades 的列格式构造数据，测量 analytics.course_grade_stats 的耗时：
+- 单门课：2000 名学生
+- 整个院系：多门课一次统计
+
+用法：python bench_analytics.py [每门课学生数] [院系课程数]
+"""
+import random
+import sys
+import time
+
+from analytics import course_grade_stats
+
+REPEAT = 5
+
+
+def columns(n_students: int, n_courses: int):
+    rng = random.Random(42)
+    course_col, student_col, grade_col = [], [], []
+    for course_id in range(1, n_courses + 1):
+        for student_id in range(1, n_students + 1):
+            course_col.append(course_id)
+            student_col.append(student_id)
+            # 约 5% 未出成绩
+            grade_col.append(None if rng.random() < 0.05 else round(min(100, max(0, rng.gauss(75, 12))), 1))
+    return {"course_id": course_col, "student_id": student_col, "grade": grade_col}
+
+
+def best_of(fn, *args) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_courses = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"students/course={n_students} best of {REPEAT}")
+    for label, count in (("single course", 1), (f"{n_courses} courses", n_courses)):
+        data = columns(n_students, count)
+        elapsed = best_of(course_grade_stats, data, list(range(1, count + 1)))
+        print(f"{label:<14} {elapsed * 1e3:8.2f} ms   {elapsed / count * 1e3:6.2f} ms/course")
+
+
+if __name__ == "__main__":
+    main()
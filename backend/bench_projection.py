@@ -0,0 +1,145 @@
+"""
+列表查询的微基准：整实体加载 vs 列投影
+在内存 SQLite 中写入测试数据，分别测量每行的 CPU 时间和内存峰值
+- entity：查询 ORM 实体（进入 identity map、属性插桩）后再拷贝为 dict（改动前的写法）
+- columns：DataStore 当前的写法，只选需要的列，直接从行元组构造 dict
+- rows：只选需要的列，直接返回 Row，不构造 dict（对照组）
+加上 --json 时每种写法再经 fast_json 按响应模型裁剪并编码，测量到响应体为止的开销
+
+用法：python bench_projection.py [行数] [--json]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from db import Base
+from datastore import DataStore
+from models import User, Student, Assignment, Submission
+from schemas import StudentBase, SubmissionOut
+from serialization import dumps, projector
+
+REPEAT = 5
+
+
+def seed(engine, n: int) -> None:
+    Base.metadata.create_all(engine)
+    start = datetime(2025, 9, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "user_id": i, "username": f"user{i}", "password": "x", "email": f"user{i}@example.com"
+        } for i in range(1, n + 1)])
+        conn.execute(Student.__table__.insert(), [{
+            "student_id": i, "grade": "2023", "major": "计算机科学与技术", "user_id": i
+        } for i in range(1, n + 1)])
+        conn.execute(Assignment.__table__.insert(), [{
+            "assignment_id": 1, "content": "bench", "deadline": start, "status": "open"
+        }])
+        conn.execute(Submission.__table__.insert(), [{
+            "submission_id": i, "student_id": i, "assignment_id": 1,
+            "submit_time": start + timedelta(seconds=i), "file_path": f"{i:08x}.pdf"
+        } for i in range(1, n + 1)])
+
+
+def submissions_by_entity(engine):
+    with Session(engine) as db:
+        return [{
+            "submission_id": s.submission_id,
+            "student_id": s.student_id,
+            "assignment_id": s.assignment_id,
+            "submit_time": s.submit_time,
+            "file_path": s.file_path
+        } for s in db.query(Submission).order_by(Submission.submit_time, Submission.submission_id).all()]
+
+
+def students_by_entity(engine):
+    with Session(engine) as db:
+        return [{
+            "student_id": s.student_id,
+            "grade": s.grade,
+            "major": s.major,
+            "user_id": s.user_id
+        } for s in db.query(Student).order_by(Student.student_id).all()]
+
+
+def submissions_by_row(engine):
+    with Session(engine) as db:
+        return db.query(
+            Submission.submission_id,
+            Submission.student_id,
+            Submission.assignment_id,
+            Submission.submit_time,
+            Submission.file_path
+        ).order_by(Submission.submit_time, Submission.submission_id).all()
+
+
+def students_by_row(engine):
+    with Session(engine) as db:
+        return db.query(
+            Student.student_id,
+            Student.grade,
+            Student.major,
+            Student.user_id
+        ).order_by(Student.student_id).all()
+
+
+def serialized(fn, model):
+    """fn 的结果按 model 裁剪后编码；Row 通过 _mapping 按列名取值"""
+    project = projector(model)
+
+    def run():
+        rows = fn()
+        if rows and not isinstance(rows[0], dict):
+            rows = [r._mapping for r in rows]
+        return dumps([project(r) for r in rows])
+    return run
+
+
+def measure(fn):
+    """返回 (最佳耗时, 内存峰值)"""
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def main() -> None:
+    args = [a for a in sys.argv[1:] if a != "--json"]
+    n = int(args[0]) if args else 10000
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    seed(engine, n)
+    store = DataStore(engine=engine)
+    cases = [
+        ("get_all_submissions", SubmissionOut, [
+            ("entity", lambda: submissions_by_entity(engine)),
+            ("columns", lambda: store.get_all_submissions()),
+            ("rows", lambda: submissions_by_row(engine)),
+        ]),
+        ("get_students", StudentBase, [
+            ("entity", lambda: students_by_entity(engine)),
+            ("columns", lambda: store.get_students(limit=None)),
+            ("rows", lambda: students_by_row(engine)),
+        ]),
+    ]
+    to_json = "--json" in sys.argv[1:]
+    print(f"rows={n} best of {REPEAT}" + (" +json" if to_json else ""))
+    for name, model, variants in cases:
+        results = []
+        for label, fn in variants:
+            t, m = measure(serialized(fn, model) if to_json else fn)
+            results.append(f"{label} {t / n * 1e6:6.2f} us/row {m / n:6.0f} B/row")
+        print(f"{name:<20} " + "   ".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+列表响应序列化的微基准
+对比 10k 行时每行的开销：
+- response_model：逐行构造 pydantic 模型、jsonable_encoder、标准库 json 编码（FastAPI 默认路径）
+- fast_json：按模型裁剪字段后直接编码（orjson，未安装时为标准库 json）
+
+用法：python bench_serialization.py [行数]
+"""
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+
+from schemas import StudentOut, SubmissionOut
+from serialization import _converter, dumps, orjson
+
+REPEAT = 5
+
+
+def submission_rows(n: int):
+    start = datetime(2025, 9, 1)
+    return [{
+        "submission_id": i,
+        "student_id": 1 + i % 5000,
+        "assignment_id": 1 + i % 2000,
+        "submit_time": start + timedelta(seconds=i),
+        "file_path": f"{i:08x}.pdf"
+    } for i in range(n)]
+
+
+def student_rows(n: int):
+    return [{
+        "student_id": i,
+        "grade": "2023",
+        "major": "计算机科学与技术",
+        "user_id": i,
+        "user": {"user_id": i, "username": f"user{i}", "email": f"user{i}@example.com"}
+    } for i in range(n)]
+
+
+def via_response_model(model, rows) -> bytes:
+    items = [model(**row) for row in rows]
+    return json.dumps(
+        jsonable_encoder(items), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode()
+
+
+def via_fast_json(model, rows) -> bytes:
+    return dumps(_converter(List[model])(rows))
+
+
+def best_of(fn, *args) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"rows={n} encoder={'orjson' if orjson is not None else 'json'} best of {REPEAT}")
+    for model, rows in ((SubmissionOut, submission_rows(n)), (StudentOut, student_rows(n))):
+        before = best_of(via_response_model, model, rows)
+        after = best_of(via_fast_json, model, rows)
+        print(
+            f"{model.__name__:<14} response_model {before / n * 1e6:7.2f} us/row   "
+            f"fast_json {after / n * 1e6:7.2f} us/row   x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import re
+import tempfile
+import time
+from typing import Iterator, Optional
+
+# 内容寻址文件的引用格式：sha256:<摘要>/<原文件名>，原文件名只用于展示和下载
+BLOB_PREFIX = "sha256:"
+# 引用计数归零后，文件在该时间内被上传刷新过修改时间的暂不删除
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "600"))
+# 引用中保留的原文件名最大长度（file_path 列为 200 字符）
+MAX_NAME_LENGTH = 120
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+# === 文件引用 ===
+def make_ref(digest: str, filename: Optional[str]) -> str:
+    name = os.path.basename((filename or "").replace("\\", "/")).strip() or digest
+    stem, ext = os.path.splitext(name)
+    if len(name) > MAX_NAME_LENGTH:
+        name = stem[:MAX_NAME_LENGTH - len(ext[:16])] + ext[:16]
+    return f"{BLOB_PREFIX}{digest}/{name}"
+
+
+def parse_ref(file_path: Optional[str]) -> Optional[str]:
+    """内容寻址引用返回摘要，早期按路径保存的文件返回 None"""
+    if not file_path or not file_path.startswith(BLOB_PREFIX):
+        return None
+    digest = file_path[len(BLOB_PREFIX):].split("/", 1)[0]
+    return digest if _DIGEST.match(digest) else None
+
+
+# === 内容寻址存储 ===
+class BlobStore:
+    """
+    按 sha256 保存文件，相同内容只存一份：<root>/ab/cd/<摘要>
+    引用计数保存在数据库（blob_ref 表），这里只负责文件本身
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def resolve(self, file_path: str) -> str:
+        """提交记录中的 file_path 对应的磁盘路径，兼容早期直接保存的路径"""
+        digest = parse_ref(file_path)
+        return self.path(digest) if digest else file_path
+
+    def staging_file(self):
+        """与 blob 同一文件系统的临时文件，返回 (fd, path)"""
+        return tempfile.mkstemp(dir=self.tmp_dir, prefix="upload-", suffix=".part")
+
+    def adopt(self, tmp_path: str, digest: str) -> bool:
+        """
+        把写好的临时文件收入存储，返回是否新建了 blob
+        已有相同内容时只刷新其修改时间并丢弃临时文件，不再写盘
+        """
+        path = self.path(digest)
+        try:
+            # 刷新修改时间，回收时据此判断该内容是否刚被引用
+            os.utime(path)
+            exists = True
+        except FileNotFoundError:
+            exists = False
+        if exists:
+            os.remove(tmp_path)
+            return False
+
+        fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return True
+
+    def is_idle(self, digest: str, grace: float = BLOB_GC_GRACE_SECONDS) -> bool:
+        """文件不存在，或修改时间早于 grace 秒前"""
+        try:
+            return time.time() - os.stat(self.path(digest)).st_mtime >= grace
+        except FileNotFoundError:
+            return True
+
+    def discard(self, digest: str, grace: float = BLOB_GC_GRACE_SECONDS) -> bool:
+        """
+        删除 blob 文件（调用方已删除其引用计数行），返回文件是否已不存在
+        先改名再复查修改时间：改名前恰有上传复用了该内容时放回原处
+        """
+        path = self.path(digest)
+        trash = f"{path}.{os.getpid()}.trash"
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            return True
+        try:
+            if time.time() - os.stat(trash).st_mtime < grace:
+                try:
+                    os.link(trash, path)
+                except FileExistsError:
+                    # 改名后上传又写入了相同内容
+                    pass
+                return False
+            return True
+        finally:
+            os.remove(trash)
+
+    def iter_digests(self) -> Iterator[str]:
+        """存储中现有的全部 blob"""
+        for dirpath, _, filenames in os.walk(self.root):
+            if dirpath == self.tmp_dir:
+                continue
+            for name in filenames:
+                if _DIGEST.match(name):
+                    yield name
+
+    def clean_staging(self, max_age: float) -> int:
+        """删除超过 max_age 秒的临时文件（上传中途进程退出留下的），返回删除数"""
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if now - entry.stat().st_mtime >= max_age:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
@@ -0,0 +1,306 @@
+import contextvars
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+# 身份缓存配置
+PRINCIPAL_CACHE_MAXSIZE = 4096
+PRINCIPAL_CACHE_TTL_SECONDS = 30
+
+# 查询缓存配置
+QUERY_CACHE_MAXSIZE = int(os.getenv("QUERY_CACHE_MAXSIZE", "1024"))
+# 缓存项的最长有效期（秒），版本号未能传递到的写入（其他主机、直接改库）最多在此时间后可见
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "60"))
+# 表版本号的共享存储（本机 SQLite 文件），多个 worker 据此保持一致；为空时仅进程内有效
+QUERY_CACHE_VERSIONS_PATH = os.getenv("QUERY_CACHE_VERSIONS_PATH", "")
+# worker 数（uvicorn --workers、gunicorn -w 的默认值均取自该变量）
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# 缓存填充期间为真，DataStore 此时新建的只读会话读主库（见 cached_query）
+filling = contextvars.ContextVar("query_cache_filling", default=False)
+
+
+# === 身份（principal）缓存 ===
+class PrincipalCache:
+    """
+    进程内身份缓存
+    - 键为 (用户名, 令牌签发时间)，同一令牌的请求共享一次数据库查询
+    - LRU 淘汰 + TTL 过期，记录命中/未命中次数
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_MAXSIZE, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username: str, issued_at: Any = None) -> Optional[Dict]:
+        key = (username, issued_at)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # 返回副本，避免调用方修改缓存内容
+            return dict(entry[1])
+
+    def set(self, username: str, principal: Dict, issued_at: Any = None) -> None:
+        key = (username, issued_at)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(principal))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, username: Optional[str] = None, user_id: Optional[int] = None) -> None:
+        """按用户名或用户ID删除该用户的所有缓存项"""
+        with self._lock:
+            stale = [
+                key for key, (_, principal) in self._entries.items()
+                if key[0] == username or (user_id is not None and principal.get("user_id") == user_id)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+# === 表版本号 ===
+class TableVersions:
+    """
+    进程内的表版本号
+    写方法提交后递增相关表的版本，缓存项记录读取时的版本，不一致即失效
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # 进程内计数从 0 开始，不同进程的同一版本号不代表同一份数据，ETag 中带上进程标识加以区分
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def get(self, names: Sequence[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._versions.get(name, 0) for name in names)
+
+    def bump(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class SQLiteTableVersions:
+    """
+    保存在本机 SQLite 文件中的表版本号，同一主机上的多个 worker 共享
+    每个线程使用自己的连接；WAL 模式下读不阻塞写
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # 各 worker 共享同一份版本号
+        self.epoch = "shared"
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, names: Sequence[str]) -> Tuple[int, ...]:
+        placeholders = ",".join("?" * len(names))
+        rows = dict(self._conn().execute(
+            f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})", tuple(names)
+        ).fetchall())
+        return tuple(rows.get(name, 0) for name in names)
+
+    def bump(self, *names: str) -> None:
+        # 首次写入以当前时间为初值，版本文件被删除重建后不会与旧缓存项撞号
+        self._conn().executemany(
+            "INSERT INTO table_versions (name, version) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            [(name, time.time_ns()) for name in names]
+        )
+
+
+def make_table_versions():
+    """
+    多 worker 时必须使用共享版本号：进程内版本号只在写入的 worker 中递增，
+    其他 worker 的缓存和 ETag 会一直认为数据未变
+    """
+    if QUERY_CACHE_VERSIONS_PATH:
+        return SQLiteTableVersions(QUERY_CACHE_VERSIONS_PATH)
+    if WEB_CONCURRENCY > 1:
+        raise RuntimeError("WEB_CONCURRENCY > 1 时须设置 QUERY_CACHE_VERSIONS_PATH，各 worker 共享表版本号")
+    return TableVersions()
+
+
+# === 查询结果缓存 ===
+def copy_result(value: Any) -> Any:
+    # 结果为 dict 或 dict 列表，逐行浅拷贝，避免调用方修改缓存内容
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class QueryCache:
+    """
+    按表版本失效的读穿缓存
+    - 每个缓存项记录依赖的表及读取前的版本号，任一表版本变化即视为过期
+    - 超过 ttl 秒的缓存项同样视为过期
+    - LRU 淘汰，记录命中/未命中/过期/淘汰次数
+    """
+
+    def __init__(self, versions=None, maxsize: int = QUERY_CACHE_MAXSIZE, ttl: float = QUERY_CACHE_TTL_SECONDS):
+        self.versions = versions if versions is not None else make_table_versions()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def lookup(self, key: Hashable, tables: Sequence[str]) -> Tuple[bool, Any, Tuple[int, ...]]:
+        """返回 (是否命中, 结果, 当前版本号)；未命中时调用方读库后以该版本号写回"""
+        versions = self.versions.get(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions and entry[2] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy_result(entry[1]), versions
+            if entry is not None:
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            return False, None, versions
+
+    def store(self, key: Hashable, versions: Tuple[int, ...], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (versions, copy_result(value), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared": isinstance(self.versions, SQLiteTableVersions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+def cached_query(*tables: str) -> Callable:
+    """
+    DataStore 读方法的缓存装饰器，tables 为结果依赖的表
+    - 缓存键为方法名和除 db 外的参数
+    - 传入的会话本身改动过相关表（未提交）时绕过缓存，保证读到自己的写入
+    - 未命中时不使用传入的会话，在新的主库只读会话中读取（db=None 且 filling 为真）：
+      版本号在提交后才递增，主库上一定能读到该版本的数据；副本可能滞后，
+      调用方较早开始的事务可能还看不到这次提交，以新版本号写回旧数据会一直命中
+    同步方法和 async 方法均可使用
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        def prepare(self, args, kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            db = bound.arguments.get("db")
+            touched = db.info.get("touched") if db is not None else None
+            if touched and touched.intersection(tables):
+                return None, None
+            key = (fn.__name__,) + tuple(
+                value for name, value in bound.arguments.items() if name not in ("self", "db")
+            )
+            bound.arguments["db"] = None
+            return key, bound
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self, *args, **kwargs):
+                key, bound = prepare(self, args, kwargs)
+                if key is None:
+                    return await fn(self, *args, **kwargs)
+                hit, value, versions = self.query_cache.lookup(key, tables)
+                if hit:
+                    return value
+                token = filling.set(True)
+                try:
+                    value = await fn(*bound.args, **bound.kwargs)
+                finally:
+                    filling.reset(token)
+                self.query_cache.store(key, versions, value)
+                return value
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key, bound = prepare(self, args, kwargs)
+            if key is None:
+                return fn(self, *args, **kwargs)
+            hit, value, versions = self.query_cache.lookup(key, tables)
+            if hit:
+                return value
+            token = filling.set(True)
+            try:
+                value = fn(*bound.args, **bound.kwargs)
+            finally:
+                filling.reset(token)
+            self.query_cache.store(key, versions, value)
+            return value
+        return wrapper
+
+    return decorator
@@ -0,0 +1,60 @@
+"""
+回收内容寻址存储中不再被引用的文件
+- 引用计数为 0 的 blob：删除计数行和文件（DataStore.collect_blobs）
+- 没有计数行的文件：上传已落盘但提交记录未写入（请求失败或进程退出），直接删除
+- 存储临时目录中过期的半截上传，以及超过 UPLOAD_SESSION_TTL_SECONDS 未续传的断点续传会话
+均跳过 BLOB_GC_GRACE_SECONDS 内刚写入或刚被复用的文件
+
+用法：python collect_blobs.py（可放入 cron 定期执行）
+某一步失败时记录错误日志并继续其余步骤，退出码为 1（全部完成为 0），便于 cron 告警
+"""
+import logging
+import sys
+
+from blobs import BLOB_GC_GRACE_SECONDS
+from datastore import DataStore
+from models import BlobRef
+from resumable import UploadSessions
+
+BATCH = 1000
+# 半截上传的保留时间
+STAGING_MAX_AGE = 24 * 3600
+
+logger = logging.getLogger("collect_blobs")
+
+
+def collect_orphans(store: DataStore) -> int:
+    """删除没有计数行的 blob 文件"""
+    removed = 0
+    digests = list(store.blob_store.iter_digests())
+    for offset in range(0, len(digests), BATCH):
+        batch = digests[offset:offset + BATCH]
+        with store.get_db_session() as db:
+            known = {r.digest for r in db.query(BlobRef.digest).filter(BlobRef.digest.in_(batch))}
+        for digest in batch:
+            if digest not in known and store.blob_store.is_idle(digest) and store.blob_store.discard(digest):
+                removed += 1
+    return removed
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    store = DataStore()
+    steps = [
+        ("引用计数为 0 的文件", store.collect_blobs),
+        ("无引用记录的文件", lambda: collect_orphans(store)),
+        ("过期临时文件", lambda: store.blob_store.clean_staging(max(STAGING_MAX_AGE, BLOB_GC_GRACE_SECONDS))),
+        ("过期上传会话", lambda: UploadSessions(store.blob_store).cleanup()),
+    ]
+    failures = 0
+    for name, step in steps:
+        try:
+            logger.info("%s：删除 %d 个", name, step())
+        except Exception:
+            logger.exception("%s：清理失败", name)
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# 列表数据依赖登录身份，只允许浏览器私有缓存，且每次使用前都要重新验证
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+# === 条件 GET（弱 ETag / 304） ===
+def make_etag(stamp: tuple, *parts: Any) -> str:
+    """
+    由 DataStore.get_version_stamp 返回的版本戳和影响响应内容的请求参数（游标、分页大小、响应格式等）计算弱 ETag
+    版本戳只在写方法提交后变化，不需要读取数据本身
+    版本戳只含计数值、不含键名，URL 相同而内容随调用者变化的路由须把调用者身份放进 parts
+    """
+    digest = hashlib.blake2b(repr((stamp, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    # 弱比较：忽略 W/ 前缀
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(tag) == opaque for tag in header.split(","))
+
+
+def _conditional_headers(etag: str, per_user: bool) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    if per_user:
+        # 同一 URL 的内容随登录身份变化（如 /files/submissions/my），缓存须按令牌区分
+        headers["Vary"] = "Authorization"
+    return headers
+
+
+def not_modified(etag: str, per_user: bool = False) -> Response:
+    return Response(status_code=304, headers=_conditional_headers(etag, per_user))
+
+
+def with_etag(result: Any, response: Optional[Response], etag: str, per_user: bool = False) -> Any:
+    """
+    给路由返回值加上 ETag
+    - 返回 Response 对象（fast_json、NDJSON）时直接设置其响应头
+    - 返回普通数据时设置到 FastAPI 注入的 response 上
+    - per_user：响应内容取决于调用者时加 Vary: Authorization，ETag 也须包含调用者身份
+    """
+    target = result if isinstance(result, Response) else response
+    target.headers.update(_conditional_headers(etag, per_user))
+    return result
@@ -1,40 +1,154 @@
 from fastapi import UploadFile
 from typing import List, Optional, Dict, Any, Union
 from contextlib import contextmanager
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import Counter
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
 import os
 import uuid
 import shutil
-from typing import Generator
+from typing import Generator, Iterator
 
 from models import (
     Student, Teacher, Class, Permission, Course, Assignment, Submission,
-    UserPermission, StudentClass, TeacherClass, TeacherCourse, StudentCourse
+    UserPermission, StudentClass, TeacherClass, TeacherCourse, StudentCourse, StudentTranscriptSummary, BlobRef
 )
 from models import User as model_user
-from db import SessionLocal
+from db import SessionLocal, ReadSessionLocal, read_router, make_session_factories, DB_STREAM_BATCH_SIZE
+from cache import PrincipalCache, QueryCache, cached_query, filling
+from singleflight import SingleFlight, coalesced
 from schemas import *
+import transcript
+from blobs import BlobStore, BLOB_GC_GRACE_SECONDS, make_ref, parse_ref
+from uploads import store_upload
+
+def _upsert(db: Session, model, rows: List[Dict], update) -> None:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE；SQLite（测试环境）使用等价的 INSERT ... ON CONFLICT DO UPDATE
+    update(new) 返回冲突时要更新的列，new 引用本次插入的值（MySQL 的 VALUES()，SQLite 的 excluded）
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(model.__table__.primary_key.columns), set_=update(stmt.excluded)
+        )
+    else:
+        stmt = mysql_insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update(update(stmt.inserted))
+    db.execute(stmt)
 
 # === 数据存储抽象层 ===
 class DataStore:
 
-    def __init__(self):
+    def __init__(self, engine=None, replica_engines=None, session_factories=None):
+        # 会话工厂：默认使用 db 模块配置的主库/副本，也可传入引擎单独构造，
+        # 或直接传入 (读写会话工厂, 只读会话工厂, 路由器)
+        if session_factories is not None:
+            self.session_factory, self.read_session_factory, self.read_router = session_factories
+        elif engine is None:
+            self.session_factory, self.read_session_factory, self.read_router = (
+                SessionLocal, ReadSessionLocal, read_router
+            )
+        else:
+            self.session_factory, self.read_session_factory, self.read_router = make_session_factories(
+                engine, replica_engines or []
+            )
         # 文件存储目录
         self.upload_dir = "uploads"
         os.makedirs(self.upload_dir, exist_ok=True)
+        # 提交文件按内容寻址保存，相同内容只存一份
+        self.blob_store = BlobStore(os.path.join(self.upload_dir, "blobs"))
+        # 身份缓存，由改变身份的写方法负责失效
+        self.principal_cache = PrincipalCache()
+        # 目录类查询（课程、教师、班级）的读穿缓存，按表版本失效
+        self.query_cache = QueryCache()
+        # 相同参数的并发读合并为一次查询
+        self.single_flight = SingleFlight()
+
+    def _touch(self, db, *tables: str) -> None:
+        """
+        记录本事务改动的表，事务提交后递增这些表的版本号（见 db.py 中的 after_commit 监听）
+        除表名外也可以登记实体键，如 "submission:student:42"（某个学生的提交），"submission:*" 表示批量改动
+        """
+        db.info.setdefault("touched", set()).update(tables)
+        db.info["table_versions"] = self.query_cache.versions
+
+    def get_version_stamp(self, *keys: str, db: Optional[Session] = None) -> tuple:
+        """
+        表名/实体键的当前版本戳，用于计算 ETag，不访问数据库
+        传入请求会话时该会话之后改读主库：版本号在提交后才递增，主库上一定能读到该版本的数据，
+        副本可能滞后，以新 ETag 返回旧数据后客户端会一直拿到 304
+        """
+        if db is not None:
+            db.info["primary"] = True
+        versions = self.query_cache.versions
+        return (versions.epoch,) + versions.get(keys)
+
+    @contextmanager
+    def get_db_session(self, db: Optional[Session] = None, primary: bool = False) -> Generator[Session, None, None]:
+        """
+        传入会话时直接复用（由调用方负责关闭），否则新建只读（autocommit）会话
+        primary 为真或正在填充查询缓存时，新建的会话读主库
+        """
+        if db is not None:
+            yield db
+            return
+        db = self.read_session_factory()
+        if primary or filling.get():
+            db.info["primary"] = True
+        try:
+            yield db
+        finally:
+            db.close()
 
     @contextmanager
-    def get_db_session(self) -> Generator[Session, None, None]:
-        db = SessionLocal()
+    def unit_of_work(self, db: Optional[Session] = None, readonly: bool = False) -> Generator[Session, None, None]:
+        """
+        事务边界
+        - 传入会话时加入调用方的事务，由调用方统一提交
+        - 否则新建会话，正常结束时提交，出错时回滚
+        - readonly 会话使用只读引擎，不发出 COMMIT
+        写方法内部只 flush，不单独提交
+        """
+        if db is not None:
+            yield db
+            return
+        db = self.read_session_factory() if readonly else self.session_factory()
         try:
             yield db
+            if not readonly:
+                db.commit()
+        except BaseException:
+            db.rollback()
+            raise
         finally:
             db.close()
+
+    def commit(self, db: Session) -> None:
+        """
+        提前提交 unit_of_work 打开的会话（请求在发送响应前提交），失败时回滚后抛出
+        之后 unit_of_work 退出时的提交为空操作
+        """
+        try:
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
     
     # === 用户相关方法 ===
-    def get_user(self, username: str) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            user = db.query(model_user).filter(model_user.username == username).first()
+    def get_user(self, username: str, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            user = db.query(
+                model_user.user_id,
+                model_user.username,
+                model_user.password,
+                model_user.email
+            ).filter(
+                model_user.username == username
+            ).first()
             if user:
                 return {
                     "user_id": user.user_id,
@@ -45,9 +159,16 @@ class DataStore:
                 }
             return None
     
-    def get_user_by_id(self, user_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            user = db.query(model_user).filter(model_user.user_id == user_id).first()
+    def get_user_by_id(self, user_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            user = db.query(
+                model_user.user_id,
+                model_user.username,
+                model_user.password,
+                model_user.email
+            ).filter(
+                model_user.user_id == user_id
+            ).first()
             if user:
                 return {
                     "user_id": user.user_id,
@@ -58,21 +179,22 @@ class DataStore:
                 }
             return None
     
-    def authenticate_user(self, username: str, password: str) -> Union[Dict, bool]:
-        user = self.get_user(username)
+    def authenticate_user(self, username: str, password: str, db: Optional[Session] = None) -> Union[Dict, bool]:
+        user = self.get_user(username, db=db)
         if not user or user["password"] != password:
             return False
         return user
     
-    def create_user(self, user_data) -> Dict:
-        with self.get_db_session() as db:
+    def create_user(self, user_data, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "users")
             new_user = model_user(
                 username=user_data.username,
                 password=user_data.password,
                 email=user_data.email
             )
             db.add(new_user)
-            db.commit()
+            db.flush()
             db.refresh(new_user)
             return {
                 "user_id": new_user.user_id,
@@ -81,14 +203,53 @@ class DataStore:
                 "email": new_user.email,
                 "disabled": False
             }
-    def get_user_by_username(self, username: str) -> Optional[Dict]:
+    def get_user_by_username(self, username: str, db: Optional[Session] = None) -> Optional[Dict]:
         """通过用户名获取用户 - 这是你代码中已有的方法"""
-        return self.get_user(username)
+        return self.get_user(username, db=db)
+
+    def get_principal(self, username: str, db: Optional[Session] = None) -> Optional[Dict]:
+        """一次外连接查询获取用户及其学生/教师身份"""
+        with self.get_db_session(db) as db:
+            row = db.query(
+                model_user.user_id,
+                model_user.username,
+                model_user.password,
+                model_user.email,
+                Student.student_id,
+                Teacher.teacher_id
+            ).outerjoin(
+                Student, Student.user_id == model_user.user_id
+            ).outerjoin(
+                Teacher, Teacher.user_id == model_user.user_id
+            ).filter(
+                model_user.username == username
+            ).first()
+
+            if row:
+                return {
+                    "user_id": row.user_id,
+                    "username": row.username,
+                    "password": row.password,
+                    "email": row.email,
+                    "disabled": False,
+                    "is_student": row.student_id is not None,
+                    "is_teacher": row.teacher_id is not None,
+                    "student_id": row.student_id,
+                    "teacher_id": row.teacher_id
+                }
+            return None
     
     # === 学生相关方法 ===
-    def get_student(self, student_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            student = db.query(Student).filter(Student.student_id == student_id).first()
+    def get_student(self, student_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            student = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id
+            ).filter(
+                Student.student_id == student_id
+            ).first()
             if student:
                 return {
                     "student_id": student.student_id,
@@ -98,22 +259,93 @@ class DataStore:
                 }
             return None
     
-    def get_students(self, skip: int = 0, limit: int = 100) -> List[Dict]:
-        with self.get_db_session() as db:
-            students = db.query(Student).offset(skip).limit(limit).all()
+    def get_students(self, after: Optional[int] = None, limit: Optional[int] = 100, db: Optional[Session] = None) -> List[Dict]:
+        """按主键游标分页：after 为上一页最后一个 student_id"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id
+            )
+            if after is not None:
+                query = query.filter(Student.student_id > after)
+            query = query.order_by(Student.student_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "student_id": s.student_id,
-                "grade": s.grade,
-                "major": s.major,
-                "user_id": s.user_id
-            } for s in students]
-    
-    def create_student(self, student_data) -> Dict:
-        # 创建用户
-        user_data = student_data.user
-        new_user = self.create_user(user_data)
-        
-        with self.get_db_session() as db:
+                "student_id": r.student_id,
+                "grade": r.grade,
+                "major": r.major,
+                "user_id": r.user_id
+            } for r in query.all()]
+
+    def get_student_with_user(self, student_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        """学生信息连同用户信息一次查询返回"""
+        with self.get_db_session(db) as db:
+            r = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id,
+                model_user.username,
+                model_user.email
+            ).join(
+                model_user, Student.user_id == model_user.user_id
+            ).filter(
+                Student.student_id == student_id
+            ).first()
+            if r:
+                return {
+                    "student_id": r.student_id,
+                    "grade": r.grade,
+                    "major": r.major,
+                    "user_id": r.user_id,
+                    "user": {
+                        "user_id": r.user_id,
+                        "username": r.username,
+                        "email": r.email
+                    }
+                }
+            return None
+
+    def get_students_with_users(self, after: Optional[int] = None, limit: Optional[int] = 100, db: Optional[Session] = None) -> List[Dict]:
+        """学生列表，每行内嵌用户信息（单次 JOIN 查询，避免逐行查用户），按 student_id 游标分页"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id,
+                model_user.username,
+                model_user.email
+            ).join(
+                model_user, Student.user_id == model_user.user_id
+            )
+            if after is not None:
+                query = query.filter(Student.student_id > after)
+            query = query.order_by(Student.student_id)
+            if limit is not None:
+                query = query.limit(limit)
+            results = query.all()
+            return [{
+                "student_id": r.student_id,
+                "grade": r.grade,
+                "major": r.major,
+                "user_id": r.user_id,
+                "user": {
+                    "user_id": r.user_id,
+                    "username": r.username,
+                    "email": r.email
+                }
+            } for r in results]
+
+    def create_student(self, student_data, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "users", "student", "student_transcript_summary")
+            # 创建用户（与学生记录在同一事务中提交）
+            new_user = self.create_user(student_data.user, db=db)
+            
             # 创建学生
             student = Student(
                 grade=student_data.grade,
@@ -121,8 +353,14 @@ class DataStore:
                 user_id=new_user["user_id"]
             )
             db.add(student)
-            db.commit()
+            db.flush()
             db.refresh(student)
+            # 同时建立空的成绩汇总，之后选课/录成绩只需增量更新
+            db.add(StudentTranscriptSummary(
+                student_id=student.student_id, course_count=0, graded_credits=0, earned_credits=0, grade_points=0
+            ))
+            db.flush()
+            self.principal_cache.invalidate(username=new_user["username"])
             
             return {
                 "student_id": student.student_id,
@@ -131,8 +369,9 @@ class DataStore:
                 "user_id": student.user_id
             }
     
-    def update_student(self, student_id: int, update_data) -> Dict:
-        with self.get_db_session() as db:
+    def update_student(self, student_id: int, update_data, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student")
             student = db.query(Student).filter(Student.student_id == student_id).first()
             if not student:
                 return None
@@ -142,7 +381,7 @@ class DataStore:
             if update_data.major:
                 student.major = update_data.major
             
-            db.commit()
+            db.flush()
             db.refresh(student)
             
             return {
@@ -152,10 +391,17 @@ class DataStore:
                 "user_id": student.user_id
             }
     
-    def get_student_by_user_id(self, user_id: int) -> Optional[Dict]:
+    def get_student_by_user_id(self, user_id: int, db: Optional[Session] = None) -> Optional[Dict]:
         """通过用户ID获取学生信息"""
-        with self.get_db_session() as db:
-            student = db.query(Student).filter(Student.user_id == user_id).first()
+        with self.get_db_session(db) as db:
+            student = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id
+            ).filter(
+                Student.user_id == user_id
+            ).first()
             if student:
                 return {
                     "student_id": student.student_id,
@@ -166,9 +412,17 @@ class DataStore:
             return None
     
     # === 教师相关方法 ===
-    def get_teacher(self, teacher_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
+    @cached_query("teacher")
+    def get_teacher(self, teacher_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            teacher = db.query(
+                Teacher.teacher_id,
+                Teacher.title,
+                Teacher.department,
+                Teacher.user_id
+            ).filter(
+                Teacher.teacher_id == teacher_id
+            ).first()
             if teacher:
                 return {
                     "teacher_id": teacher.teacher_id,
@@ -178,22 +432,34 @@ class DataStore:
                 }
             return None
     
-    def get_teachers(self) -> List[Dict]:
-        with self.get_db_session() as db:
-            teachers = db.query(Teacher).all()
+    @cached_query("teacher")
+    def get_teachers(self, after: Optional[int] = None, limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """按主键游标分页：after 为上一页最后一个 teacher_id，limit 为空时返回全部"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Teacher.teacher_id,
+                Teacher.title,
+                Teacher.department,
+                Teacher.user_id
+            )
+            if after is not None:
+                query = query.filter(Teacher.teacher_id > after)
+            query = query.order_by(Teacher.teacher_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "teacher_id": t.teacher_id,
-                "title": t.title,
-                "department": t.department,
-                "user_id": t.user_id
-            } for t in teachers]
-    
-    def create_teacher(self, teacher_data) -> Dict:
-        # 创建用户
-        user_data = teacher_data.user
-        new_user = self.create_user(user_data)
-        
-        with self.get_db_session() as db:
+                "teacher_id": r.teacher_id,
+                "title": r.title,
+                "department": r.department,
+                "user_id": r.user_id
+            } for r in query.all()]
+    
+    def create_teacher(self, teacher_data, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "users", "teacher")
+            # 创建用户（与教师记录在同一事务中提交）
+            new_user = self.create_user(teacher_data.user, db=db)
+            
             # 创建教师
             teacher = Teacher(
                 title=teacher_data.title,
@@ -201,8 +467,9 @@ class DataStore:
                 user_id=new_user["user_id"]
             )
             db.add(teacher)
-            db.commit()
+            db.flush()
             db.refresh(teacher)
+            self.principal_cache.invalidate(username=new_user["username"])
             
             return {
                 "teacher_id": teacher.teacher_id,
@@ -211,10 +478,17 @@ class DataStore:
                 "user_id": teacher.user_id
             }
     
-    def get_teacher_by_user_id(self, user_id: int) -> Optional[Dict]:
+    def get_teacher_by_user_id(self, user_id: int, db: Optional[Session] = None) -> Optional[Dict]:
         """通过用户ID获取教师信息"""
-        with self.get_db_session() as db:
-            teacher = db.query(Teacher).filter(Teacher.user_id == user_id).first()
+        with self.get_db_session(db) as db:
+            teacher = db.query(
+                Teacher.teacher_id,
+                Teacher.title,
+                Teacher.department,
+                Teacher.user_id
+            ).filter(
+                Teacher.user_id == user_id
+            ).first()
             if teacher:
                 return {
                     "teacher_id": teacher.teacher_id,
@@ -225,9 +499,17 @@ class DataStore:
             return None
     
     # === 课程相关方法 ===
-    def get_course(self, course_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            course = db.query(Course).filter(Course.course_id == course_id).first()
+    @cached_query("course")
+    @coalesced
+    def get_course(self, course_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            course = db.query(
+                Course.course_id,
+                Course.course_name,
+                Course.credit
+            ).filter(
+                Course.course_id == course_id
+            ).first()
             if course:
                 return {
                     "course_id": course.course_id,
@@ -236,23 +518,36 @@ class DataStore:
                 }
             return None
     
-    def get_courses(self) -> List[Dict]:
-        with self.get_db_session() as db:
-            courses = db.query(Course).all()
+    @cached_query("course")
+    @coalesced
+    def get_courses(self, after: Optional[int] = None, limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """按主键游标分页：after 为上一页最后一个 course_id，limit 为空时返回全部"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Course.course_id,
+                Course.course_name,
+                Course.credit
+            )
+            if after is not None:
+                query = query.filter(Course.course_id > after)
+            query = query.order_by(Course.course_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "course_id": c.course_id,
-                "course_name": c.course_name,
-                "credit": c.credit
-            } for c in courses]
+                "course_id": r.course_id,
+                "course_name": r.course_name,
+                "credit": r.credit
+            } for r in query.all()]
     
-    def create_course(self, course_data, teacher_id) -> Dict:
-        with self.get_db_session() as db:
+    def create_course(self, course_data, teacher_id, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "course", "teacher_course")
             course = Course(
                 course_name=course_data.course_name,
                 credit=course_data.credit
             )
             db.add(course)
-            db.commit()
+            db.flush()
             db.refresh(course)
 
             teachercourse = TeacherCourse(
@@ -260,7 +555,7 @@ class DataStore:
                 course_id = course.course_id
             )
             db.add(teachercourse)
-            db.commit()
+            db.flush()
             db.refresh(teachercourse)
 
             return {
@@ -279,85 +574,229 @@ class DataStore:
             } for tc in teachercourses]
 
     # === 作业相关方法 ===
-    def get_assignment(self, assignment_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            assignment = db.query(Assignment).filter(Assignment.assignment_id == assignment_id).first()
+    def get_assignment(self, assignment_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            assignment = db.query(
+                Assignment.assignment_id,
+                Assignment.content,
+                Assignment.deadline,
+                Assignment.status,
+                Assignment.max_upload_bytes,
+                Assignment.teacher_id,
+                Assignment.course_id
+            ).filter(
+                Assignment.assignment_id == assignment_id
+            ).first()
             if assignment:
                 return {
                     "assignment_id": assignment.assignment_id,
                     "content": assignment.content,
                     "deadline": assignment.deadline,
                     "status": assignment.status,
-                    "teacher_id": assignment.teacher_id
+                    "max_upload_bytes": assignment.max_upload_bytes,
+                    "teacher_id": assignment.teacher_id,
+                    "course_id": assignment.course_id
                 }
             return None
     
-    def create_assignment(self, assignment_data) -> Dict:
-        with self.get_db_session() as db:
+    def create_assignment(self, assignment_data, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "assignment")
+            course_id = assignment_data.course_id
+            if course_id is None:
+                # 未指定课程时只有一门课的教师归入该课程，否则必须指定，不再产生无归属的作业
+                course_ids = [r.course_id for r in db.query(TeacherCourse.course_id).filter(
+                    TeacherCourse.teacher_id == assignment_data.teacher_id
+                ).limit(2)]
+                if len(course_ids) != 1:
+                    raise ValueError("请指定作业所属课程" if course_ids else "该教师尚未教授任何课程")
+                course_id = course_ids[0]
+            # 发布者须是该课程的任课教师
+            elif not db.query(TeacherCourse).filter(
+                TeacherCourse.teacher_id == assignment_data.teacher_id,
+                TeacherCourse.course_id == course_id
+            ).first():
+                raise ValueError("该教师未教授此课程")
             assignment = Assignment(
                 content=assignment_data.content,
                 deadline=assignment_data.deadline,
                 status=assignment_data.status,
-                teacher_id=assignment_data.teacher_id
+                max_upload_bytes=assignment_data.max_upload_bytes,
+                teacher_id=assignment_data.teacher_id,
+                course_id=course_id
             )
             db.add(assignment)
-            db.commit()
+            db.flush()
             db.refresh(assignment)
             return {
                 "assignment_id": assignment.assignment_id,
                 "content": assignment.content,
                 "deadline": assignment.deadline,
                 "status": assignment.status,
-                "teacher_id": assignment.teacher_id
+                "max_upload_bytes": assignment.max_upload_bytes,
+                "teacher_id": assignment.teacher_id,
+                "course_id": assignment.course_id
             }
     
-    def create_submission(self, submission_data: Dict) -> Dict:
-        with self.get_db_session() as db:
+    def get_unassigned_assignments(self, teacher_id: int, db: Optional[Session] = None) -> List[Dict]:
+        """教师名下尚未归属课程的作业（迁移 0003 无法回填的数据），由教师补充课程"""
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Assignment.assignment_id,
+                Assignment.content,
+                Assignment.deadline,
+                Assignment.status,
+                Assignment.max_upload_bytes,
+                Assignment.teacher_id,
+                Assignment.course_id
+            ).filter(
+                Assignment.teacher_id == teacher_id,
+                Assignment.course_id.is_(None)
+            ).order_by(Assignment.assignment_id).all()
+            return [{
+                "assignment_id": r.assignment_id,
+                "content": r.content,
+                "deadline": r.deadline,
+                "status": r.status,
+                "max_upload_bytes": r.max_upload_bytes,
+                "teacher_id": r.teacher_id,
+                "course_id": r.course_id
+            } for r in results]
+
+    def set_assignment_course(self, assignment_id: int, teacher_id: int, course_id: int,
+                              db: Optional[Session] = None) -> Optional[Dict]:
+        """
+        修改作业所属课程，只能修改该教师自己发布的作业
+        作业不存在或不属于该教师时返回 None，该教师未教授此课程时抛出 ValueError
+        """
+        with self.unit_of_work(db) as db:
+            self._touch(db, "assignment")
+            if not db.query(TeacherCourse).filter(
+                TeacherCourse.teacher_id == teacher_id,
+                TeacherCourse.course_id == course_id
+            ).first():
+                raise ValueError("该教师未教授此课程")
+            updated = db.query(Assignment).filter(
+                Assignment.assignment_id == assignment_id,
+                Assignment.teacher_id == teacher_id
+            ).update({Assignment.course_id: course_id}, synchronize_session=False)
+            if not updated:
+                return None
+            return self.get_assignment(assignment_id, db=db)
+    
+    def create_submission(self, submission_data: Dict, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "submission", f"submission:student:{submission_data['student_id']}")
             submission = Submission(
                 student_id=submission_data["student_id"],
                 assignment_id=submission_data["assignment_id"],
                 submit_time=submission_data["submit_time"],
-                file_path=submission_data["file_path"]
+                file_path=submission_data["file_path"],
+                # 上传时流式计算的长度和摘要，早期提交为空
+                file_size=submission_data.get("file_size"),
+                file_sha256=submission_data.get("file_sha256")
             )
+            digest = parse_ref(submission_data["file_path"])
+            if digest:
+                self._ref_blob(db, digest, submission_data.get("file_size"))
             db.add(submission)
-            db.commit()
+            db.flush()
             db.refresh(submission)
             return {
                 "submission_id": submission.submission_id,
                 "student_id": submission.student_id,
                 "assignment_id": submission.assignment_id,
                 "submit_time": submission.submit_time,
-                "file_path": submission.file_path
+                "file_path": submission.file_path,
+                "file_size": submission.file_size,
+                "file_sha256": submission.file_sha256
             }
     
+    @staticmethod
+    def _submission_after(after: tuple):
+        """(submit_time, submission_id) 之后的行，展开为 OR 条件以便走索引范围扫描"""
+        after_time, after_id = after
+        return or_(
+            Submission.submit_time > after_time,
+            and_(Submission.submit_time == after_time, Submission.submission_id > after_id)
+        )
+
     # === 文件处理方法 ===
     def save_upload_file(self, file: UploadFile) -> str:
-        # 生成唯一文件名
-        file_ext = os.path.splitext(file.filename)[1]
-        file_name = f"{uuid.uuid4()}{file_ext}"
-        file_path = os.path.join(self.upload_dir, file_name)
-        
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        """保存到内容寻址存储，返回提交记录使用的引用（sha256:摘要/文件名）"""
+        info = store_upload(file.file, self.blob_store)
+        return make_ref(info["sha256"], file.filename)
+
+    def _ref_blob(self, db: Session, digest: str, size: Optional[int]) -> None:
+        """引用计数加一，首次引用时插入（INSERT ... ON DUPLICATE KEY UPDATE，并发上传相同内容不冲突）"""
+        self._touch(db, "blob_ref")
+        _upsert(db, BlobRef, [{"digest": digest, "size": size, "refcount": 1}],
+                lambda new: {"refcount": BlobRef.refcount + 1, "released_at": None})
+
+    def _release_blobs(self, db: Session, file_paths: List[str]) -> None:
+        """释放这些文件引用（早期路径忽略），计数归零的记下时间，文件由 collect_blobs 回收"""
+        counts = Counter(digest for digest in map(parse_ref, file_paths) if digest)
+        if not counts:
+            return
+        self._touch(db, "blob_ref")
+        for digest, n in counts.items():
+            db.query(BlobRef).filter(BlobRef.digest == digest).update(
+                {BlobRef.refcount: BlobRef.refcount - n}, synchronize_session=False
+            )
+        db.query(BlobRef).filter(
+            BlobRef.digest.in_(list(counts)), BlobRef.refcount <= 0
+        ).update({BlobRef.released_at: datetime.utcnow()}, synchronize_session=False)
+
+    def collect_blobs(self, digests: Optional[List[str]] = None, grace: float = BLOB_GC_GRACE_SECONDS) -> int:
+        """
+        删除引用计数为 0 的 blob 及其文件，返回删除的文件数
+        - 传入 digests 时只检查这些 blob（删除提交后调用，按主键查找），
+          否则按 released_at 索引找出归零超过 grace 秒的 blob（定期清理，不扫描整张表）
+        - grace 秒内被上传复用过的文件暂不删除，避免与正在提交的相同内容冲突
+        每个 blob 单独提交：先删计数行（删除时复查计数仍为 0），提交后再删文件
+        """
+        with self.get_db_session() as db:
+            query = db.query(BlobRef.digest).filter(BlobRef.released_at.isnot(None))
+            if digests is not None:
+                query = query.filter(BlobRef.digest.in_(digests))
+            else:
+                query = query.filter(BlobRef.released_at < datetime.utcnow() - timedelta(seconds=grace))
+            candidates = [r.digest for r in query.all()]
         
-        return f"/uploads/{file_name}"
+        removed = 0
+        for digest in candidates:
+            if not self.blob_store.is_idle(digest, grace):
+                continue
+            with self.unit_of_work() as db:
+                self._touch(db, "blob_ref")
+                deleted = db.query(BlobRef).filter(
+                    BlobRef.digest == digest, BlobRef.refcount <= 0
+                ).delete(synchronize_session=False)
+            if deleted and self.blob_store.discard(digest, grace):
+                removed += 1
+        return removed
     
     # === 关系操作方法 ===
-    def get_student_classes(self, student_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            student = db.query(Student).filter(Student.student_id == student_id).first()
-            if not student:
-                return []
+    def get_student_classes(self, student_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Class.class_id,
+                Class.class_name,
+                Class.grade
+            ).join(
+                StudentClass, StudentClass.class_id == Class.class_id
+            ).filter(
+                StudentClass.student_id == student_id
+            ).all()
             
             return [{
-                "class_id": c.class_id,
-                "class_name": c.class_name,
-                "grade": c.grade
-            } for c in student.classes]
+                "class_id": r.class_id,
+                "class_name": r.class_name,
+                "grade": r.grade
+            } for r in results]
     
-    def get_student_courses(self, student_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
+    def get_student_courses(self, student_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
             # 直接查询关联表和课程表
             results = db.query(
                 Course.course_id,
@@ -378,22 +817,29 @@ class DataStore:
                 "grade": r.grade
             } for r in results]
     
-    def get_teacher_classes(self, teacher_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
-            if not teacher:
-                return []
+    def get_teacher_classes(self, teacher_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Class.class_id,
+                Class.class_name,
+                Class.grade
+            ).join(
+                TeacherClass, TeacherClass.class_id == Class.class_id
+            ).filter(
+                TeacherClass.teacher_id == teacher_id
+            ).all()
             
             return [{
-                "class_id": c.class_id,
-                "class_name": c.class_name,
-                "grade": c.grade
-            } for c in teacher.classes]
+                "class_id": r.class_id,
+                "class_name": r.class_name,
+                "grade": r.grade
+            } for r in results]
     
-    def get_course_students(self, course_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
+    @coalesced
+    def get_course_students(self, course_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
             # 查询课程信息
-            course = db.query(Course).filter(Course.course_id == course_id).first()
+            course = db.query(Course.course_id).filter(Course.course_id == course_id).first()
             if not course:
                 return []
             
@@ -422,81 +868,198 @@ class DataStore:
                 "course_name": r.course_name
             } for r in results]
     
-    def get_class_students(self, class_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            class_ = db.query(Class).filter(Class.class_id == class_id).first()
-            if not class_:
-                return []
+    def get_course_grades(self, course_ids: List[int], db: Optional[Session] = None) -> Dict[str, list]:
+        """
+        这些课程的选课成绩，按列返回（course_id / student_id / grade 三个等长列表，按 course_id 排序），
+        供 analytics 模块一次转成数组做向量化统计；未出成绩的 grade 为 None
+        """
+        with self.get_db_session(db) as db:
+            rows = db.query(
+                StudentCourse.course_id,
+                StudentCourse.student_id,
+                StudentCourse.grade
+            ).filter(
+                StudentCourse.course_id.in_(course_ids)
+            ).order_by(
+                StudentCourse.course_id
+            ).all()
+            course_col, student_col, grade_col = (list(c) for c in zip(*rows)) if rows else ([], [], [])
+            return {"course_id": course_col, "student_id": student_col, "grade": grade_col}
+
+    @cached_query("teacher", "teacher_course")
+    def get_department_course_ids(self, department: str, db: Optional[Session] = None) -> List[int]:
+        """某院系教师所授的全部课程"""
+        with self.get_db_session(db) as db:
+            results = db.query(TeacherCourse.course_id).join(
+                Teacher, Teacher.teacher_id == TeacherCourse.teacher_id
+            ).filter(
+                Teacher.department == department
+            ).distinct().order_by(TeacherCourse.course_id).all()
+            return [r.course_id for r in results]
+
+    def get_class_students(self, class_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id
+            ).join(
+                StudentClass, StudentClass.student_id == Student.student_id
+            ).filter(
+                StudentClass.class_id == class_id
+            ).all()
             
             return [{
-                "student_id": s.student_id,
-                "grade": s.grade,
-                "major": s.major,
-                "user_id": s.user_id
-            } for s in class_.students]
-    
-    def get_user_permissions(self, user_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            user = db.query(model_user).filter(model_user.user_id == user_id).first()
-            if not user:
-                return []
+                "student_id": r.student_id,
+                "grade": r.grade,
+                "major": r.major,
+                "user_id": r.user_id
+            } for r in results]
+
+    def get_class_students_with_users(self, class_id: int, db: Optional[Session] = None) -> List[Dict]:
+        """班级学生列表，每行内嵌用户信息（单次 JOIN 查询）"""
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Student.student_id,
+                Student.grade,
+                Student.major,
+                Student.user_id,
+                model_user.username,
+                model_user.email
+            ).join(
+                StudentClass, StudentClass.student_id == Student.student_id
+            ).join(
+                model_user, Student.user_id == model_user.user_id
+            ).filter(
+                StudentClass.class_id == class_id
+            ).all()
+            return [{
+                "student_id": r.student_id,
+                "grade": r.grade,
+                "major": r.major,
+                "user_id": r.user_id,
+                "user": {
+                    "user_id": r.user_id,
+                    "username": r.username,
+                    "email": r.email
+                }
+            } for r in results]
+
+    def teaches_student(self, teacher_id: int, user_id: int, db: Optional[Session] = None) -> bool:
+        """该用户是否为选修了该教师所授课程的学生"""
+        with self.get_db_session(db) as db:
+            return db.query(Student.student_id).join(
+                StudentCourse, StudentCourse.student_id == Student.student_id
+            ).join(
+                TeacherCourse, TeacherCourse.course_id == StudentCourse.course_id
+            ).filter(
+                Student.user_id == user_id,
+                TeacherCourse.teacher_id == teacher_id
+            ).first() is not None
+
+    def get_user_permissions(self, user_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Permission.permission_id,
+                Permission.permission_name,
+                Permission.description
+            ).join(
+                UserPermission, UserPermission.permission_id == Permission.permission_id
+            ).filter(
+                UserPermission.user_id == user_id
+            ).all()
             
             return [{
-                "permission_id": p.permission_id,
-                "permission_name": p.permission_name,
-                "description": p.description
-            } for p in user.permissions]
+                "permission_id": r.permission_id,
+                "permission_name": r.permission_name,
+                "description": r.description
+            } for r in results]
     
-    def get_submissions_by_student(self, student_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            student = db.query(Student).filter(Student.student_id == student_id).first()
-            if not student:
-                return []
+    def get_submissions_by_student(self, student_id: int, db: Optional[Session] = None) -> List[Dict]:
+        with self.get_db_session(db) as db:
+            results = db.query(
+                Submission.submission_id,
+                Submission.student_id,
+                Submission.assignment_id,
+                Submission.submit_time,
+                Submission.file_path
+            ).filter(
+                Submission.student_id == student_id
+            ).order_by(Submission.submit_time).all()
             
             return [{
-                "submission_id": s.submission_id,
-                "student_id": s.student_id,
-                "assignment_id": s.assignment_id,
-                "submit_time": s.submit_time,
-                "file_path": s.file_path
-            } for s in student.submissions]
-    
-    def get_all_submissions(self) -> List[Dict]:
-        with self.get_db_session() as db:
-            submissions = db.query(Submission).all()
+                "submission_id": r.submission_id,
+                "student_id": r.student_id,
+                "assignment_id": r.assignment_id,
+                "submit_time": r.submit_time,
+                "file_path": r.file_path
+            } for r in results]
+    
+    def get_all_submissions(self, after: Optional[tuple] = None, limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """按 (submit_time, submission_id) 游标分页，limit 为空时返回全部"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Submission.submission_id,
+                Submission.student_id,
+                Submission.assignment_id,
+                Submission.submit_time,
+                Submission.file_path
+            )
+            if after is not None:
+                query = query.filter(self._submission_after(after))
+            query = query.order_by(Submission.submit_time, Submission.submission_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "submission_id": s.submission_id,
-                "student_id": s.student_id,
-                "assignment_id": s.assignment_id,
-                "submit_time": s.submit_time,
-                "file_path": s.file_path
-            } for s in submissions]
-    
-    def get_submission_by_id(self, submission_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            submission = db.query(Submission).filter(Submission.submission_id == submission_id).first()
+                "submission_id": r.submission_id,
+                "student_id": r.student_id,
+                "assignment_id": r.assignment_id,
+                "submit_time": r.submit_time,
+                "file_path": r.file_path
+            } for r in query.all()]
+    
+    def get_submission_by_id(self, submission_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            submission = db.query(
+                Submission.submission_id,
+                Submission.student_id,
+                Submission.assignment_id,
+                Submission.submit_time,
+                Submission.file_path,
+                Submission.file_size,
+                Submission.file_sha256
+            ).filter(
+                Submission.submission_id == submission_id
+            ).first()
             if submission:
                 return {
                     "submission_id": submission.submission_id,
                     "student_id": submission.student_id,
                     "assignment_id": submission.assignment_id,
                     "submit_time": submission.submit_time,
-                    "file_path": submission.file_path
+                    "file_path": submission.file_path,
+                    "file_size": submission.file_size,
+                    "file_sha256": submission.file_sha256
                 }
             return None
     
-    def delete_submission(self, submission_id: int) -> bool:
-        with self.get_db_session() as db:
+    def delete_submission(self, submission_id: int, db: Optional[Session] = None) -> bool:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "submission")
             submission = db.query(Submission).filter(Submission.submission_id == submission_id).first()
             if not submission:
                 return False
             
+            self._touch(db, f"submission:student:{submission.student_id}")
+            self._release_blobs(db, [submission.file_path])
             db.delete(submission)
-            db.commit()
+            db.flush()
             return True
 
-    def enroll_student_in_course(self, student_id: int, course_id: int, grade: float = None):
-        with self.get_db_session() as db:
+    def enroll_student_in_course(self, student_id: int, course_id: int, grade: float = None, db: Optional[Session] = None):
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student_course", f"student_course:student:{student_id}", "student_transcript_summary")
             # 检查是否已选课
             existing = db.query(StudentCourse).filter(
                 StudentCourse.student_id == student_id,
@@ -512,11 +1075,13 @@ class DataStore:
                 grade=grade
             )
             db.add(enrollment)
-            db.commit()
+            db.flush()
+            self._apply_transcript_delta(db, student_id, course_id, None, grade, new_course=True)
             return True
 
-    def add_student_to_class(self, student_id: int, class_id: int):
-        with self.get_db_session() as db:
+    def add_student_to_class(self, student_id: int, class_id: int, db: Optional[Session] = None):
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student_class")
             # 检查是否已在班级中
             existing = db.query(StudentClass).filter(
                 StudentClass.student_id == student_id,
@@ -531,11 +1096,12 @@ class DataStore:
                 class_id=class_id
             )
             db.add(enrollment)
-            db.commit()
+            db.flush()
             return True
 
-    def assign_permission_to_user(self, user_id: int, permission_id: int):
-        with self.get_db_session() as db:
+    def assign_permission_to_user(self, user_id: int, permission_id: int, db: Optional[Session] = None):
+        with self.unit_of_work(db) as db:
+            self._touch(db, "user_permission")
             # 检查是否已分配
             existing = db.query(UserPermission).filter(
                 UserPermission.user_id == user_id,
@@ -550,11 +1116,13 @@ class DataStore:
                 permission_id=permission_id
             )
             db.add(assignment)
-            db.commit()
+            db.flush()
+            self.principal_cache.invalidate(user_id=user_id)
             return True
 
-    def record_grade(self, student_id: int, course_id: int, grade: float):
-        with self.get_db_session() as db:
+    def record_grade(self, student_id: int, course_id: int, grade: float, db: Optional[Session] = None):
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student_course", f"student_course:student:{student_id}", "student_transcript_summary")
             # 查找选课记录
             enrollment = db.query(StudentCourse).filter(
                 StudentCourse.student_id == student_id,
@@ -562,8 +1130,10 @@ class DataStore:
             ).first()
             
             if enrollment:
+                old_grade = enrollment.grade
                 enrollment.grade = grade
-                db.commit()
+                db.flush()
+                self._apply_transcript_delta(db, student_id, course_id, old_grade, grade, new_course=False)
                 return True
             
             # 如果找不到，创建新记录
@@ -573,12 +1143,94 @@ class DataStore:
                 grade=grade
             )
             db.add(new_enrollment)
-            db.commit()
+            db.flush()
+            self._apply_transcript_delta(db, student_id, course_id, None, grade, new_course=True)
             return True
+
+    # === 成绩汇总 ===
+    def _apply_transcript_delta(self, db: Session, student_id: int, course_id: int,
+                                old_grade: Optional[float], new_grade: Optional[float], new_course: bool) -> None:
+        """
+        按增量更新成绩汇总（UPDATE ... SET 列 = 列 + 增量，并发写入不会互相覆盖）
+        汇总行不存在时（迁移前的数据未回填）按选课记录重建该学生的汇总
+        """
+        credit = db.query(Course.credit).filter(Course.course_id == course_id).scalar() or 0
+        changes = transcript.delta(credit, old_grade, new_grade, new_course)
+        updated = db.query(StudentTranscriptSummary).filter(
+            StudentTranscriptSummary.student_id == student_id
+        ).update({
+            getattr(StudentTranscriptSummary, name): getattr(StudentTranscriptSummary, name) + value
+            for name, value in changes.items()
+        }, synchronize_session=False)
+        if not updated:
+            self.rebuild_transcript_summaries([student_id], db=db)
+
+    def rebuild_transcript_summaries(self, student_ids: List[int], db: Optional[Session] = None) -> int:
+        """按选课记录重建这些学生的成绩汇总（回填或绩点换算调整后使用），返回重建的学生数"""
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student_transcript_summary", "student_transcript_summary:*")
+            ids = [r.student_id for r in db.query(Student.student_id).filter(Student.student_id.in_(student_ids))]
+            if not ids:
+                return 0
+            courses = {student_id: [] for student_id in ids}
+            rows = db.query(
+                StudentCourse.student_id, Course.credit, StudentCourse.grade
+            ).join(
+                Course, Course.course_id == StudentCourse.course_id
+            ).filter(
+                StudentCourse.student_id.in_(ids)
+            ).all()
+            for r in rows:
+                courses[r.student_id].append({"credit": r.credit, "grade": r.grade})
+            
+            # 已有的汇总行直接覆盖，缺失的插入；不先删除，与并发的增量更新或重建不会发生主键冲突
+            _upsert(db, StudentTranscriptSummary, [
+                {"student_id": student_id, **transcript.summarize(enrolled)} for student_id, enrolled in courses.items()
+            ], lambda new: {name: getattr(new, name) for name in transcript.SUMMARY_FIELDS})
+            db.flush()
+            return len(ids)
+
+    def rebuild_course_transcripts(self, course_id: int, batch_size: int = 500) -> int:
+        """
+        重建选了这门课的全部学生的成绩汇总，按批提交，返回重建的学生数
+        汇总按选课、登分时的学分增量维护，修改课程学分后须调用，否则这些学生的学分和绩点仍按旧学分计算
+        """
+        with self.get_db_session(primary=True) as db:
+            ids = [r.student_id for r in db.query(StudentCourse.student_id).filter(StudentCourse.course_id == course_id)]
+        total = 0
+        for offset in range(0, len(ids), batch_size):
+            total += self.rebuild_transcript_summaries(ids[offset:offset + batch_size])
+        return total
+
+    def get_transcript_summary(self, student_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        """学生的成绩汇总（课程数、学分、加权绩点），学生不存在时返回 None"""
+        with self.get_db_session(db) as db:
+            row = db.query(
+                StudentTranscriptSummary.course_count,
+                StudentTranscriptSummary.graded_credits,
+                StudentTranscriptSummary.earned_credits,
+                StudentTranscriptSummary.grade_points
+            ).filter(
+                StudentTranscriptSummary.student_id == student_id
+            ).first()
+            if row is not None:
+                return transcript.summary_out(student_id, row._asdict())
+            
+            # 尚未回填：按选课记录现算
+            if db.query(Student.student_id).filter(Student.student_id == student_id).first() is None:
+                return None
+            return transcript.summary_out(student_id, transcript.summarize(self.get_student_courses(student_id, db=db)))
     
-    def get_class(self, class_id: int) -> Optional[Dict]:
-        with self.get_db_session() as db:
-            class_ = db.query(Class).filter(Class.class_id == class_id).first()
+    @cached_query("class")
+    def get_class(self, class_id: int, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.get_db_session(db) as db:
+            class_ = db.query(
+                Class.class_id,
+                Class.class_name,
+                Class.grade
+            ).filter(
+                Class.class_id == class_id
+            ).first()
             if class_:
                 return {
                     "class_id": class_.class_id,
@@ -587,14 +1239,15 @@ class DataStore:
                 }
             return None
     
-    def create_class(self, class_data: ClassCreate) -> Dict:
-        with self.get_db_session() as db:
+    def create_class(self, class_data: ClassCreate, db: Optional[Session] = None) -> Dict:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "class")
             new_class = Class(
                 class_name=class_data.class_name,
                 grade=class_data.grade
             )
             db.add(new_class)
-            db.commit()
+            db.flush()
             db.refresh(new_class)
             return {
                 "class_id": new_class.class_id,
@@ -602,36 +1255,71 @@ class DataStore:
                 "grade": new_class.grade
             }
     
-    def get_assignments_by_course(self, course_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            assignments = db.query(Assignment).join(Teacher).join(TeacherCourse).filter(
-                TeacherCourse.course_id == course_id
-            ).all()
-            
+    @coalesced
+    def get_assignments_by_course(self, course_id: int, after: Optional[tuple] = None,
+                                  limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """
+        课程作业按 (deadline, assignment_id) 排序，after 为上一页最后一行的该二元组
+        走 (course_id, deadline) 索引的一次范围扫描
+        """
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Assignment.assignment_id,
+                Assignment.content,
+                Assignment.deadline,
+                Assignment.status,
+                Assignment.max_upload_bytes,
+                Assignment.teacher_id,
+                Assignment.course_id
+            ).filter(Assignment.course_id == course_id)
+            if after is not None:
+                after_deadline, after_id = after
+                query = query.filter(or_(
+                    Assignment.deadline > after_deadline,
+                    and_(Assignment.deadline == after_deadline, Assignment.assignment_id > after_id)
+                ))
+            query = query.order_by(Assignment.deadline, Assignment.assignment_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "assignment_id": a.assignment_id,
-                "content": a.content,
-                "deadline": a.deadline,
-                "status": a.status,
-                "teacher_id": a.teacher_id
-            } for a in assignments]
-    
-    def get_submissions_by_assignment(self, assignment_id: int) -> List[Dict]:
-        with self.get_db_session() as db:
-            submissions = db.query(Submission).filter(
+                "assignment_id": r.assignment_id,
+                "content": r.content,
+                "deadline": r.deadline,
+                "status": r.status,
+                "max_upload_bytes": r.max_upload_bytes,
+                "teacher_id": r.teacher_id,
+                "course_id": r.course_id
+            } for r in query.all()]
+    
+    def get_submissions_by_assignment(self, assignment_id: int, after: Optional[tuple] = None,
+                                      limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """按 (submit_time, submission_id) 游标分页，limit 为空时返回全部"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Submission.submission_id,
+                Submission.student_id,
+                Submission.assignment_id,
+                Submission.submit_time,
+                Submission.file_path
+            ).filter(
                 Submission.assignment_id == assignment_id
-            ).all()
-            
+            )
+            if after is not None:
+                query = query.filter(self._submission_after(after))
+            query = query.order_by(Submission.submit_time, Submission.submission_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "submission_id": s.submission_id,
-                "student_id": s.student_id,
-                "assignment_id": s.assignment_id,
-                "submit_time": s.submit_time,
-                "file_path": s.file_path
-            } for s in submissions]
-
-    def update_teacher(self, teacher_id: int, update_data: TeacherUpdate) -> Optional[Dict]:
-        with self.get_db_session() as db:
+                "submission_id": r.submission_id,
+                "student_id": r.student_id,
+                "assignment_id": r.assignment_id,
+                "submit_time": r.submit_time,
+                "file_path": r.file_path
+            } for r in query.all()]
+
+    def update_teacher(self, teacher_id: int, update_data: TeacherUpdate, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "teacher")
             teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
             if not teacher:
                 return None
@@ -642,7 +1330,7 @@ class DataStore:
             if update_data.department:
                 teacher.department = update_data.department
             
-            db.commit()
+            db.flush()
             db.refresh(teacher)
             
             return {
@@ -652,8 +1340,9 @@ class DataStore:
                 "user_id": teacher.user_id
             }
 
-    def delete_teacher(self, teacher_id: int) -> bool:
-        with self.get_db_session() as db:
+    def delete_teacher(self, teacher_id: int, db: Optional[Session] = None) -> bool:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "teacher", "teacher_class", "teacher_course", "assignment", "submission", "submission:*", "users")
             teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
             if not teacher:
                 return False
@@ -672,6 +1361,11 @@ class DataStore:
                 Assignment.teacher_id == teacher_id
             ).all()]
             
+            # 释放这些提交对内容寻址文件的引用
+            self._release_blobs(db, [r.file_path for r in db.query(Submission.file_path).filter(
+                Submission.assignment_id.in_(assignment_ids)
+            )])
+            
             # 删除作业相关的提交
             db.query(Submission).filter(
                 Submission.assignment_id.in_(assignment_ids)
@@ -687,20 +1381,22 @@ class DataStore:
             
             # 删除教师记录
             db.delete(teacher)
-            db.commit()
+            db.flush()
             
             # 删除关联的用户（可选，根据业务需求）
             # 如果需要保留用户账号，可以跳过此步骤
             user = db.query(model_user).filter(model_user.user_id == user_id).first()
             if user:
                 db.delete(user)
-                db.commit()
+                db.flush()
             
+            self.principal_cache.invalidate(user_id=user_id)
             return True
 
     # === 新增班级管理方法 ===
-    def update_class(self, class_id: int, update_data: ClassUpdate) -> Optional[Dict]:
-        with self.get_db_session() as db:
+    def update_class(self, class_id: int, update_data: ClassUpdate, db: Optional[Session] = None) -> Optional[Dict]:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "class")
             class_ = db.query(Class).filter(Class.class_id == class_id).first()
             if not class_:
                 return None
@@ -711,7 +1407,7 @@ class DataStore:
             if update_data.grade:
                 class_.grade = update_data.grade
             
-            db.commit()
+            db.flush()
             db.refresh(class_)
             
             return {
@@ -720,8 +1416,9 @@ class DataStore:
                 "grade": class_.grade
             }
 
-    def delete_class(self, class_id: int) -> bool:
-        with self.get_db_session() as db:
+    def delete_class(self, class_id: int, db: Optional[Session] = None) -> bool:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "class", "student_class", "teacher_class")
             class_ = db.query(Class).filter(Class.class_id == class_id).first()
             if not class_:
                 return False
@@ -735,11 +1432,12 @@ class DataStore:
             
             # 删除班级记录
             db.delete(class_)
-            db.commit()
+            db.flush()
             return True
 
-    def remove_student_from_class(self, student_id: int, class_id: int) -> bool:
-        with self.get_db_session() as db:
+    def remove_student_from_class(self, student_id: int, class_id: int, db: Optional[Session] = None) -> bool:
+        with self.unit_of_work(db) as db:
+            self._touch(db, "student_class")
             # 检查学生是否在班级中
             enrollment = db.query(StudentClass).filter(
                 StudentClass.student_id == student_id,
@@ -751,22 +1449,40 @@ class DataStore:
             
             # 删除关联记录
             db.delete(enrollment)
-            db.commit()
+            db.flush()
             return True
 
-    def get_assignments(self) -> List[Dict]:
-        with self.get_db_session() as db:
-            assignments = db.query(Assignment).all()
+    @coalesced
+    def get_assignments(self, after: Optional[int] = None, limit: Optional[int] = None, db: Optional[Session] = None) -> List[Dict]:
+        """按主键游标分页：after 为上一页最后一个 assignment_id，limit 为空时返回全部"""
+        with self.get_db_session(db) as db:
+            query = db.query(
+                Assignment.assignment_id,
+                Assignment.content,
+                Assignment.deadline,
+                Assignment.status,
+                Assignment.max_upload_bytes,
+                Assignment.teacher_id,
+                Assignment.course_id
+            )
+            if after is not None:
+                query = query.filter(Assignment.assignment_id > after)
+            query = query.order_by(Assignment.assignment_id)
+            if limit is not None:
+                query = query.limit(limit)
             return [{
-                "assignment_id": a.assignment_id,
-                "content": a.content,
-                "deadline": a.deadline,
-                "status": a.status,
-                "teacher_id": a.teacher_id
-            } for a in assignments]
-
-    def get_teacher_courses(self, teacher_id: int):
-        with self.get_db_session() as db:
+                "assignment_id": r.assignment_id,
+                "content": r.content,
+                "deadline": r.deadline,
+                "status": r.status,
+                "max_upload_bytes": r.max_upload_bytes,
+                "teacher_id": r.teacher_id,
+                "course_id": r.course_id
+            } for r in query.all()]
+
+    @cached_query("course", "teacher_course")
+    def get_teacher_courses(self, teacher_id: int, db: Optional[Session] = None):
+        with self.get_db_session(db) as db:
             results = db.query(
                 Course.course_id,
                 Course.course_name,
@@ -787,8 +1503,8 @@ class DataStore:
                 for r in results
             ]
 
-    def get_students_by_course_id(self, course_id: int):
-        with self.get_db_session() as db:
+    def get_students_by_course_id(self, course_id: int, db: Optional[Session] = None):
+        with self.get_db_session(db) as db:
             results = db.query(
                 Student.student_id,
                 model_user.username,
@@ -805,4 +1521,63 @@ class DataStore:
                 "student_id": r.student_id,
                 "username": r.username,
                 "user_id": r.user_id,
-            } for r in results]
\ No newline at end of file
+            } for r in results]
+
+    # === 流式读取 ===
+    # 整表导出使用服务端游标逐批拉取，只选需要的列，内存占用与行数无关
+    # 这些生成器自行打开只读会话，迭代结束或被关闭时释放连接；带 ETag 的响应传入 primary=True 读主库
+    def iter_all_submissions(self, batch_size: int = DB_STREAM_BATCH_SIZE) -> Iterator[Dict]:
+        with self.get_db_session() as db:
+            rows = db.query(
+                Submission.submission_id,
+                Submission.student_id,
+                Submission.assignment_id,
+                Submission.submit_time,
+                Submission.file_path
+            ).order_by(
+                Submission.submit_time, Submission.submission_id
+            ).yield_per(batch_size)
+            for r in rows:
+                yield {
+                    "submission_id": r.submission_id,
+                    "student_id": r.student_id,
+                    "assignment_id": r.assignment_id,
+                    "submit_time": r.submit_time,
+                    "file_path": r.file_path
+                }
+
+    def iter_assignments(self, batch_size: int = DB_STREAM_BATCH_SIZE, primary: bool = False) -> Iterator[Dict]:
+        with self.get_db_session(primary=primary) as db:
+            rows = db.query(
+                Assignment.assignment_id,
+                Assignment.content,
+                Assignment.deadline,
+                Assignment.status,
+                Assignment.max_upload_bytes,
+                Assignment.teacher_id,
+                Assignment.course_id
+            ).order_by(Assignment.assignment_id).yield_per(batch_size)
+            for r in rows:
+                yield {
+                    "assignment_id": r.assignment_id,
+                    "content": r.content,
+                    "deadline": r.deadline,
+                    "status": r.status,
+                    "max_upload_bytes": r.max_upload_bytes,
+                    "teacher_id": r.teacher_id,
+                    "course_id": r.course_id
+                }
+
+    def iter_courses(self, batch_size: int = DB_STREAM_BATCH_SIZE, primary: bool = False) -> Iterator[Dict]:
+        with self.get_db_session(primary=primary) as db:
+            rows = db.query(
+                Course.course_id,
+                Course.course_name,
+                Course.credit
+            ).order_by(Course.course_id).yield_per(batch_size)
+            for r in rows:
+                yield {
+                    "course_id": r.course_id,
+                    "course_name": r.course_name,
+                    "credit": r.credit
+                }
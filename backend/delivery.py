@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from fastapi import Request, Response
+from fastapi.responses import RedirectResponse
+
+from conditional import CONDITIONAL_CACHE_CONTROL
+from downloads import content_disposition, file_response
+
+# 文件发送方式：
+# - app：应用进程自己发送（默认，开发环境无需反向代理）
+# - accel：返回 X-Accel-Redirect，由 nginx 从 internal location 发送
+# - sendfile：返回 X-Sendfile（Apache mod_xsendfile、lighttpd 等）
+# - signed：重定向到短期有效的签名链接，由 nginx 校验签名后发送
+DELIVERY_MODES = ("app", "accel", "sendfile", "signed")
+FILE_DELIVERY = os.getenv("FILE_DELIVERY", "app")
+# nginx 中映射到上传目录的 internal location
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "/_protected/")
+# 签名链接的路径前缀，nginx 与应用（无反向代理时）使用同一路径
+SIGNED_URL_PREFIX = "/files/signed/"
+SIGNED_URL_TTL_SECONDS = int(os.getenv("SIGNED_URL_TTL_SECONDS", "300"))
+
+
+# === 文件发送（反向代理卸载 / 签名链接） ===
+class FileDelivery:
+    """
+    权限检查由路由完成，这里只决定文件字节由谁发送
+    签名为 HMAC-SHA256(secret, "过期时间\\n路径\\n文件名\\n是否内联")，base64url 无填充；
+    nginx 侧的校验见 deploy/nginx/signed_url.js，两边的消息格式须保持一致
+    secret 为空时不签发签名链接（signed 模式下直接报错，不回退到其他密钥）
+    """
+
+    def __init__(self, root: str, secret: Optional[str], mode: str = FILE_DELIVERY, ttl: int = SIGNED_URL_TTL_SECONDS):
+        if mode not in DELIVERY_MODES:
+            raise ValueError(f"FILE_DELIVERY 须为 {', '.join(DELIVERY_MODES)} 之一")
+        if mode == "signed" and not secret:
+            raise RuntimeError("FILE_DELIVERY=signed 时须设置 FILE_URL_SECRET（与 nginx 中的密钥一致）")
+        self.root = os.path.abspath(root)
+        self.secret = secret.encode() if secret else None
+        self.mode = mode
+        self.ttl = ttl
+
+    @property
+    def can_sign(self) -> bool:
+        return self.secret is not None
+
+    def relative(self, path: str) -> Optional[str]:
+        """上传目录内文件的相对路径（/ 分隔），目录外的返回 None"""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == os.curdir or rel.startswith(os.pardir):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def local_path(self, rel: str) -> Optional[str]:
+        """签名链接中的相对路径对应的磁盘路径，越出上传目录时返回 None"""
+        path = os.path.abspath(os.path.join(self.root, rel))
+        return path if path.startswith(self.root + os.sep) else None
+
+    def _signature(self, rel: str, filename: str, inline: bool, expires: int) -> str:
+        message = f"{expires}\n{SIGNED_URL_PREFIX}{rel}\n{filename}\n{int(inline)}"
+        digest = hmac.new(self.secret, message.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def signed_url(self, path: str, filename: str, inline: bool = False) -> Optional[Tuple[str, datetime]]:
+        """生成签名链接，返回 (url, 过期时间)；文件不在上传目录内时返回 None，须先检查 can_sign"""
+        rel = self.relative(path)
+        if rel is None:
+            return None
+        expires = int(time.time()) + self.ttl
+        query = {"name": filename, "expires": expires}
+        if inline:
+            query["inline"] = 1
+        query["sig"] = self._signature(rel, filename, inline, expires)
+        return f"{SIGNED_URL_PREFIX}{quote(rel)}?{urlencode(query, quote_via=quote)}", datetime.fromtimestamp(expires)
+
+    def verify(self, rel: str, filename: str, inline: bool, expires: int, sig: str) -> bool:
+        if self.secret is None or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(rel, filename, inline, expires), sig)
+
+    def _offload_headers(self, filename: str, inline: bool) -> Dict[str, str]:
+        # nginx 处理 X-Accel-Redirect 时保留上游的 Content-Type、Content-Disposition、Cache-Control
+        headers = {
+            "Content-Type": (mimetypes.guess_type(filename)[0] if inline else None) or "application/octet-stream",
+            "Content-Disposition": content_disposition(filename, inline),
+            "Cache-Control": CONDITIONAL_CACHE_CONTROL
+        }
+        if inline:
+            headers["Content-Security-Policy"] = "sandbox"
+            headers["X-Content-Type-Options"] = "nosniff"
+        return headers
+
+    def response(self, request: Request, path: str, filename: str, digest: Optional[str] = None,
+                 inline: bool = False) -> Response:
+        """
+        按配置的方式发送文件，文件不存在时抛出 FileNotFoundError
+        上传目录之外的早期文件无法交给反向代理，仍由应用发送
+        """
+        rel = self.relative(path)
+        if self.mode == "app" or rel is None:
+            return file_response(request, path, filename, digest, inline)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        if self.mode == "signed":
+            url, _ = self.signed_url(path, filename, inline)
+            return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+        headers = self._offload_headers(filename, inline)
+        if self.mode == "accel":
+            # Range、条件请求和 sendfile 均由 nginx 处理
+            headers["X-Accel-Redirect"] = quote(ACCEL_REDIRECT_PREFIX + rel)
+        else:
+            headers["X-Sendfile"] = os.path.abspath(path)
+        return Response(headers=headers)
@@ -0,0 +1,207 @@
+import mimetypes
+import os
+import re
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from conditional import CONDITIONAL_CACHE_CONTROL, etag_matches
+
+# 无零拷贝扩展时每次读取的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# 单个请求最多的分段数，超过时返回整个文件（防止大量小分段放大开销）
+MAX_RANGES = 16
+
+_RANGE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+# === 文件下载（分段 / 条件请求 / 零拷贝） ===
+def file_etag(stat: os.stat_result, digest: Optional[str] = None) -> str:
+    """
+    强 ETag：内容寻址文件直接用 sha256（内容不变则不变），早期文件用修改时间和大小
+    分段续传的 If-Range 只接受强 ETag
+    """
+    if digest:
+        return f'"{digest}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def content_disposition(filename: str, inline: bool = False) -> str:
+    kind = "inline" if inline else "attachment"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{kind}; filename*=utf-8''{quoted}"
+    return f'{kind}; filename="{filename}"'
+
+
+def parse_ranges(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    解析 Range 请求头，返回按起点排序、合并重叠后的闭区间列表
+    - 格式不支持或分段过多时返回 None（忽略 Range，返回整个文件）
+    - 所有分段都超出文件范围时返回空列表（416）
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    parts = spec.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+    ranges = []
+    for part in parts:
+        match = _RANGE.match(part)
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first == "":
+            # 后缀形式：最后 N 个字节
+            length = int(last)
+            if length and size:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+    value = request.headers.get("if-range")
+    if value is None:
+        return True
+    value = value.strip()
+    if value.startswith('"') or value.startswith("W/"):
+        # 强比较，弱 ETag 永不匹配
+        return value == etag
+    return value == last_modified
+
+
+def _not_modified_since(request: Request, mtime: float) -> bool:
+    value = request.headers.get("if-modified-since")
+    if not value:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class FileRangeResponse(Response):
+    """
+    按区间发送文件内容，ranges 为 None 时发送整个文件，多于一段时以 multipart/byteranges 发送
+    服务器支持 ASGI 零拷贝扩展时交给服务器 sendfile：
+    - http.response.zerocopysend：按文件描述符、偏移和长度发送，支持分段
+    - http.response.pathsend：按路径发送整个文件
+    都不支持时在线程池中分块读取
+    """
+
+    def __init__(self, path: str, size: int, ranges: Optional[List[Tuple[int, int]]], status_code: int,
+                 headers: Dict[str, str], media_type: str):
+        self.path = path
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.segments: List[Tuple[bytes, int, int]] = []
+        self.trailer = b""
+        if ranges is None:
+            self.segments.append((b"", 0, size))
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            self.segments.append((b"", start, end - start + 1))
+        else:
+            boundary = uuid.uuid4().hex
+            for start, end in ranges:
+                head = (f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("latin-1")
+                # 每段之前的 CRLF 属于分隔符，第一段之前省略
+                if self.segments:
+                    head = b"\r\n" + head
+                self.segments.append((head, start, end - start + 1))
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+        self.full_file = ranges is None
+        length = sum(len(head) + count for head, _, count in self.segments) + len(self.trailer)
+        headers["Content-Length"] = str(length)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        extensions = scope.get("extensions") or {}
+        if self.full_file and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+        zerocopy = "http.response.zerocopysend" in extensions
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            for head, offset, count in self.segments:
+                if head:
+                    await send({"type": "http.response.body", "body": head, "more_body": True})
+                if zerocopy:
+                    await send({"type": "http.response.zerocopysend", "file": f, "offset": offset,
+                                "count": count, "more_body": True})
+                    continue
+                while count > 0:
+                    chunk = await run_in_threadpool(os.pread, f.fileno(), min(count, DOWNLOAD_CHUNK_SIZE), offset)
+                    if not chunk:
+                        # 发送过程中文件被截断，已声明的长度无法满足，直接结束
+                        raise RuntimeError(f"文件在发送过程中被截断：{self.path}")
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    offset += len(chunk)
+                    count -= len(chunk)
+            await send({"type": "http.response.body", "body": self.trailer})
+        finally:
+            await run_in_threadpool(f.close)
+
+
+def file_response(request: Request, path: str, filename: str, digest: Optional[str] = None,
+                  inline: bool = False) -> Response:
+    """
+    下载文件：带 ETag / Last-Modified，处理 If-None-Match、If-Modified-Since（304）和 Range、If-Range（206 / 416）
+    文件不存在时抛出 FileNotFoundError
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat, digest)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        # 每次使用缓存前都回到服务端重新验证，权限检查不会被缓存绕过
+        "Cache-Control": CONDITIONAL_CACHE_CONTROL,
+        "Accept-Ranges": "bytes"
+    }
+
+    if "if-none-match" in request.headers:
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+    elif _not_modified_since(request, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = (mimetypes.guess_type(filename)[0] if inline else None) or "application/octet-stream"
+    headers["Content-Disposition"] = content_disposition(filename, inline)
+    if inline:
+        # 学生上传的 HTML / SVG 在浏览器中打开时不能以本站身份执行脚本
+        headers["Content-Security-Policy"] = "sandbox"
+        headers["X-Content-Type-Options"] = "nosniff"
+    ranges = None
+    if "range" in request.headers and _if_range_matches(request, etag, last_modified):
+        ranges = parse_ranges(request.headers["range"], stat.st_size)
+    if ranges == []:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+    status_code = 200 if ranges is None else 206
+    return FileRangeResponse(path, stat.st_size, ranges, status_code, headers, media_type)
@@ -1,56 +1,151 @@
-from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, File, UploadFile, Form
-from fastapi import Response
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status
+from fastapi import Request, Response, Query, BackgroundTasks, Header
+from starlette.requests import ClientDisconnect
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import List, Optional, Dict, Any, Union
 from contextlib import contextmanager
 from sqlalchemy.orm import Session
+import logging
 import os
 import uuid
-from fastapi.staticfiles import StaticFiles 
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from schemas import *
 from sqlalchemy.exc import IntegrityError
 
-from datastore import DataStore;
+from db import (
+    engine, async_engine, replica_engines, async_replica_engines,
+    read_router, async_read_router, pool_status
+)
+from async_datastore import AsyncDataStore
+from threaded_datastore import ThreadedDataStore, DataStoreOverloaded
+from tokens import make_revocation_list
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from streaming import NDJSON_RESPONSES, ndjson_response, wants_stream
+from serialization import fast_json
+from conditional import etag_matches, make_etag, not_modified, with_etag
+from uploads import UPLOAD_MAX_BYTES, UploadFormError, UploadTooLarge, receive_upload, upload_openapi
+from blobs import make_ref, parse_ref
+from resumable import UploadSessionError, UploadSessions
+from downloads import file_response
+from delivery import FileDelivery
+from analytics import DEFAULT_BINS, DEFAULT_PERCENTILES, check_options, course_grade_stats
 
 # 创建数据存储实例
-data_store = DataStore()
+# - async: 异步引擎实现（默认）
+# - threadpool: 同步 DataStore 放到定长线程池中执行
+DATASTORE_BACKEND = os.getenv("DATASTORE_BACKEND", "async")
+if DATASTORE_BACKEND == "threadpool":
+    data_store = ThreadedDataStore()
+else:
+    data_store = AsyncDataStore()
 
 # JWT 配置
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# 无状态令牌模式：访问令牌携带角色声明，验证时无需查询数据库
+# 访问令牌短期有效，通过刷新令牌续期
+STATELESS_TOKENS = os.getenv("STATELESS_TOKENS", "0") == "1"
+STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES = 5
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+
+# 令牌吊销列表（注销 / 强制下线）
+revocation_list = make_revocation_list(user_ttl=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600)
+# 拥有该权限的用户可以强制下线任意用户
+ADMIN_PERMISSION = os.getenv("ADMIN_PERMISSION", "admin")
+
+logger = logging.getLogger(__name__)
+
+
+# === 请求级事务提交 ===
+class TransactionalRoute(APIRoute):
+    """
+    路由函数返回、响应序列化完成之后，发送响应之前提交请求级会话
+    - yield 依赖的清理代码在响应发送之后才执行，在那里提交会让客户端先收到成功响应
+    - 提交失败时已回滚，返回 500
+    - 提交成功后才开启读主库窗口；后台任务（如 collect_blobs）在响应发送后执行，此时事务已提交
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            response = await handler(request)
+            db = getattr(request.state, "db", None)
+            if db is None or db.info.get("readonly"):
+                return response
+            try:
+                await data_store.commit(db)
+            except Exception:
+                logger.exception("提交请求事务失败: %s %s", request.method, request.url.path)
+                return JSONResponse(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    content={"detail": "保存失败，请稍后重试"}
+                )
+            # 有写入的请求提交后，该用户短时间内的读请求走主库
+            if db.info.get("written"):
+                data_store.read_router.note_write(db.info.get("route_key"))
+            return response
+
+        return route_handler
+
+
 # === 路由定义 ===
 # 主路由
-api_router = APIRouter()
+api_router = APIRouter(route_class=TransactionalRoute)
 
 # 学生路由
-stu_router = APIRouter()
+stu_router = APIRouter(route_class=TransactionalRoute)
 
 # 教师路由
-tea_router = APIRouter()
+tea_router = APIRouter(route_class=TransactionalRoute)
 
 # 课程路由
-course_router = APIRouter()
+course_router = APIRouter(route_class=TransactionalRoute)
 
 # 作业路由
-assign_router = APIRouter()
+assign_router = APIRouter(route_class=TransactionalRoute)
 
 # 文件路由
-file_router = APIRouter()
+file_router = APIRouter(route_class=TransactionalRoute)
 
 # 班级路由
-class_router = APIRouter()
+class_router = APIRouter(route_class=TransactionalRoute)
 
 # 用户管理
-user_router = APIRouter()
+user_router = APIRouter(route_class=TransactionalRoute)
 
 # 认证路由
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# === 请求级会话 ===
+async def get_db(request: Request):
+    """
+    每个请求使用一个会话和一个事务
+    - 路由中的所有 DataStore 调用共享该会话
+    - 请求正常结束时由 TransactionalRoute 在发送响应前提交，抛出异常时回滚
+    - GET/HEAD 请求为纯读，使用只读（autocommit）会话
+    """
+    readonly = request.method in ("GET", "HEAD")
+    async with data_store.unit_of_work(readonly=readonly) as db:
+        request.state.db = db
+        yield db
+
+# === 游标分页 ===
+def parse_cursor(cursor: Optional[str], types: tuple) -> Optional[tuple]:
+    """解析查询参数中的分页游标，格式错误时返回 400"""
+    if cursor is None:
+        return None
+    try:
+        return tuple(decode_cursor(cursor, types))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # === 认证相关函数 ===
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -58,11 +153,54 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def create_token_pair(principal: Dict) -> Dict:
+    """签发携带角色声明的访问令牌和刷新令牌"""
+    access_token = create_access_token(
+        data={
+            "sub": principal["username"],
+            "typ": "access",
+            "jti": uuid.uuid4().hex,
+            "uid": principal["user_id"],
+            "stu": principal["is_student"],
+            "tea": principal["is_teacher"],
+            "sid": principal["student_id"],
+            "tid": principal["teacher_id"]
+        },
+        expires_delta=timedelta(minutes=STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = create_access_token(
+        data={
+            "sub": principal["username"],
+            "typ": "refresh",
+            "jti": uuid.uuid4().hex,
+            "uid": principal["user_id"]
+        },
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+def principal_from_claims(payload: Dict) -> Dict:
+    """从已验证的访问令牌声明构造 principal，不访问数据库"""
+    return {
+        "user_id": payload["uid"],
+        "username": payload["sub"],
+        "disabled": False,
+        "is_student": payload.get("stu", False),
+        "is_teacher": payload.get("tea", False),
+        "student_id": payload.get("sid"),
+        "teacher_id": payload.get("tid")
+    }
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Any = Depends(get_db)):
+    """
+    解析当前请求的身份（principal）
+    - 用户、学生、教师信息通过一次查询获得
+    - FastAPI 在同一请求内缓存依赖结果，下游依赖和路由复用同一个 principal
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -76,16 +214,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    # 使用 get_user_by_username 方法
-    user = data_store.get_user(username)
-    if user is None:
+    # 会话按用户选择读库（写后读主库）
+    db.info["route_key"] = username
+    
+    issued_at = payload.get("iat")
+    token_type = payload.get("typ")
+    if token_type == "refresh":
+        # 刷新令牌不能用于访问接口
         raise credentials_exception
     
-    # 添加角色信息
-    user["is_student"] = data_store.get_student_by_user_id(user["user_id"]) is not None
-    user["is_teacher"] = data_store.get_teacher_by_user_id(user["user_id"]) is not None
+    # 无状态访问令牌：角色信息来自签名声明
+    if token_type == "access":
+        if revocation_list.is_revoked(payload.get("jti"), payload.get("uid"), issued_at):
+            raise credentials_exception
+        return principal_from_claims(payload)
+    
+    # 同一令牌的重复请求直接命中身份缓存
+    principal = data_store.principal_cache.get(username, issued_at)
+    if principal is None:
+        # 一次查询获取用户及角色信息（含 student_id / teacher_id）
+        principal = await data_store.get_principal(username, db=db)
+        if principal is None:
+            raise credentials_exception
+        data_store.principal_cache.set(username, principal, issued_at)
     
-    return user
+    if revocation_list.is_revoked(user_id=principal["user_id"], issued_at=issued_at):
+        raise credentials_exception
+    return principal
 
 async def get_current_student(current_user: User = Depends(get_current_user)):
     """获取当前学生用户"""
@@ -107,10 +262,26 @@ async def get_current_teacher(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
+async def is_admin(current_user: Dict, db: Any) -> bool:
+    """当前用户是否拥有管理员权限"""
+    return any(
+        p["permission_name"] == ADMIN_PERMISSION
+        for p in await data_store.get_user_permissions(current_user["user_id"], db=db)
+    )
+
+async def get_current_admin(current_user: User = Depends(get_current_user), db: Any = Depends(get_db)):
+    """获取拥有管理员权限的当前用户"""
+    if not await is_admin(current_user, db):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    return current_user
+
 # === 认证路由 ===
 @api_router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = data_store.get_user(form_data.username)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Any = Depends(get_db)):
+    user = await data_store.get_principal(form_data.username, db=db)
     
     if user is None:
         raise HTTPException(
@@ -126,9 +297,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 添加角色信息
-    user["is_student"] = data_store.get_student_by_user_id(user["user_id"]) is not None
-    user["is_teacher"] = data_store.get_teacher_by_user_id(user["user_id"]) is not None
+    if STATELESS_TOKENS:
+        return create_token_pair(user)
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -138,40 +308,102 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@api_router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshRequest, db: Any = Depends(get_db)):
+    """用刷新令牌换取新的令牌对（旧刷新令牌随即作废）"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="刷新令牌无效",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(request.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("typ") != "refresh":
+        raise credentials_exception
+    if revocation_list.is_revoked(payload.get("jti"), payload.get("uid"), payload.get("iat")):
+        raise credentials_exception
+    
+    # 续期时重新读取角色，使角色变更在一个访问令牌周期内生效
+    principal = await data_store.get_principal(payload["sub"], db=db)
+    if principal is None:
+        raise credentials_exception
+    
+    revocation_list.revoke_token(payload["jti"], payload["exp"])
+    return create_token_pair(principal)
+
+@api_router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(request: Optional[RefreshRequest] = None, token: str = Depends(oauth2_scheme)):
+    """注销：吊销当前访问令牌及（可选）刷新令牌"""
+    for raw in (token, request.refresh_token if request else None):
+        if not raw:
+            continue
+        try:
+            payload = jwt.decode(raw, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            continue
+        if payload.get("jti"):
+            revocation_list.revoke_token(payload["jti"], payload["exp"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.post("/users/{user_id}/revoke-tokens", status_code=status.HTTP_204_NO_CONTENT)
+async def force_logout(user_id: int, current_user: Dict = Depends(get_current_user), db: Any = Depends(get_db)):
+    """
+    强制下线：吊销该用户此前签发的所有令牌
+    可以下线自己；教师可以下线所授课程的学生；拥有管理员权限的用户可以下线任意用户
+    """
+    allowed = user_id == current_user["user_id"] or (
+        current_user["is_teacher"]
+        and await data_store.teaches_student(current_user["teacher_id"], user_id, db=db)
+    ) or await is_admin(current_user, db)
+    if not allowed:
+        raise HTTPException(status_code=403, detail="无权强制下线该用户")
+    revocation_list.revoke_user(user_id)
+    data_store.principal_cache.invalidate(user_id=user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 # === 教师管理端点 ===
 @tea_router.post("/teachers/", response_model=TeacherOut)
-async def create_teacher(teacher: TeacherCreate):
-    new_teacher = data_store.create_teacher(teacher)
-    user = data_store.get_user_by_id(new_teacher["user_id"])
+async def create_teacher(teacher: TeacherCreate, db: Any = Depends(get_db)):
+    new_teacher = await data_store.create_teacher(teacher, db=db)
+    user = await data_store.get_user_by_id(new_teacher["user_id"], db=db)
     return {**new_teacher, "user": user}
 
-@tea_router.get("/teachers/", response_model=List[TeacherOutBase])
-async def get_teachers():
-    return data_store.get_teachers()
+@tea_router.get("/teachers/", response_model=TeacherPage)
+async def get_teachers(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Any = Depends(get_db)
+):
+    after = parse_cursor(cursor, (int,))
+    teachers = await data_store.get_teachers(after=after[0] if after else None, limit=limit + 1, db=db)
+    return fast_json(TeacherPage, paginate(teachers, limit, key=lambda t: (t["teacher_id"],)))
 
 @tea_router.get("/teachers/{teacher_id}")
-async def get_teacher(teacher_id: int):
-    teacher = data_store.get_teacher(teacher_id)
+async def get_teacher(teacher_id: int, db: Any = Depends(get_db)):
+    teacher = await data_store.get_teacher(teacher_id, db=db)
     if teacher is None:
         return {}
-    user = data_store.get_user_by_id(teacher["user_id"])
+    user = await data_store.get_user_by_id(teacher["user_id"], db=db)
     return {**teacher, "user": user}
 
 @tea_router.get("/teachers/{teacher_id}/classes", response_model=List[ClassOut])
-async def get_teacher_classes(teacher_id: int):
-    return data_store.get_teacher_classes(teacher_id)
+async def get_teacher_classes(teacher_id: int, db: Any = Depends(get_db)):
+    return fast_json(List[ClassOut], await data_store.get_teacher_classes(teacher_id, db=db))
 
 @tea_router.put("/teachers/{teacher_id}", response_model=TeacherOutBase)
 async def update_teacher(
     teacher_id: int, 
     update_data: TeacherUpdate,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
     # 权限检查：只有教师本人可以更新
     if current_user["teacher_id"] != teacher_id:
         raise HTTPException(status_code=403, detail="只有老师自己可以更新自己的信息")
     
-    updated_teacher = data_store.update_teacher(teacher_id, update_data)
+    updated_teacher = await data_store.update_teacher(teacher_id, update_data, db=db)
     if not updated_teacher:
         raise HTTPException(status_code=404, detail="教师不存在")
     
@@ -180,119 +412,196 @@ async def update_teacher(
 @tea_router.delete("/teachers/{teacher_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_teacher(
     teacher_id: int,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):  
-    if not data_store.delete_teacher(teacher_id):
+    teacher = await data_store.get_teacher(teacher_id, db=db)
+    if not teacher or not await data_store.delete_teacher(teacher_id, db=db):
         raise HTTPException(status_code=404, detail="教师不存在")
     
+    # 无状态令牌中仍带有 teacher_id，需强制下线
+    revocation_list.revoke_user(teacher["user_id"])
+    
     return {"message": "删除老师成功"}
 
 @tea_router.get("/teachercourses", response_model=list[Course_])
-async def get_teacher_own_courses(current_user: dict = Depends(get_current_user)):
-    user_id = current_user.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
-
-    teacher = data_store.get_teacher_by_user_id(user_id)
-    if not teacher:
+async def get_teacher_own_courses(current_user: dict = Depends(get_current_user), db: Any = Depends(get_db)):
+    teacher_id = current_user.get("teacher_id")
+    if not teacher_id:
         return []
     
-    teacher_id = teacher.get("teacher_id")
-    courses = data_store.get_teacher_courses(teacher_id=teacher_id)
+    courses = await data_store.get_teacher_courses(teacher_id=teacher_id, db=db)
     return courses
 
 # === 学生管理端点 ===
 @stu_router.post("/students/", response_model=StudentOut)
-async def create_student(student: StudentCreate):
-    new_student = data_store.create_student(student)
-    user = data_store.get_user_by_id(new_student["user_id"])
+async def create_student(student: StudentCreate, db: Any = Depends(get_db)):
+    new_student = await data_store.create_student(student, db=db)
+    user = await data_store.get_user_by_id(new_student["user_id"], db=db)
     return {**new_student, "user": user}
 
-@stu_router.get("/students/", response_model=List[StudentOut])
-async def get_students(skip: int = 0, limit: int = 100):
-    students = data_store.get_students(skip, limit)
-    result = []
-    for student in students:
-        user = data_store.get_user_by_id(student["user_id"])
-        result.append({**student, "user": user})
-    return result
+@stu_router.get("/students/", response_model=StudentPage)
+async def get_students(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Any = Depends(get_db)
+):
+    # 学生与用户信息一次 JOIN 查询
+    after = parse_cursor(cursor, (int,))
+    students = await data_store.get_students_with_users(after=after[0] if after else None, limit=limit + 1, db=db)
+    return fast_json(StudentPage, paginate(students, limit, key=lambda s: (s["student_id"],)))
 
 @stu_router.get("/students/{student_id}", response_model=StudentDetail)
-async def get_student(student_id: int):
-    student = data_store.get_student(student_id)
+async def get_student(student_id: int, db: Any = Depends(get_db)):
+    student = await data_store.get_student_with_user(student_id, db=db)
     if not student:
         raise HTTPException(status_code=404, detail="学生不存在")
     
-    user = data_store.get_user_by_id(student["user_id"])
-    
     # 获取学生所属班级
-    classes = data_store.get_student_classes(student_id)
+    classes = await data_store.get_student_classes(student_id, db=db)
     
     # 获取学生课程成绩
-    courses = data_store.get_student_courses(student_id)
+    courses = await data_store.get_student_courses(student_id, db=db)
     
-    return {**student, "user": user, "classes": classes, "courses": courses}
+    return {**student, "classes": classes, "courses": courses}
 
 @stu_router.put("/students/{student_id}", response_model=StudentOut)
-async def update_student(student_id: int, student: StudentUpdate):
-    updated_student = data_store.update_student(student_id, student)
+async def update_student(student_id: int, student: StudentUpdate, db: Any = Depends(get_db)):
+    updated_student = await data_store.update_student(student_id, student, db=db)
     if not updated_student:
         raise HTTPException(status_code=404, detail="学生不存在")
-    user = data_store.get_user_by_id(updated_student["user_id"])
+    user = await data_store.get_user_by_id(updated_student["user_id"], db=db)
     return {**updated_student, "user": user}
 
 # === 课程管理端点 ===
 @course_router.post("/courses/", response_model=CourseOut)
-async def create_course(course: CourseCreate, current_user: Dict = Depends(get_current_teacher)):
-    teacher = data_store.get_teacher_by_user_id(current_user["user_id"])
-    new_course = data_store.create_course(course, teacher["teacher_id"])
+async def create_course(course: CourseCreate, current_user: Dict = Depends(get_current_teacher), db: Any = Depends(get_db)):
+    new_course = await data_store.create_course(course, current_user["teacher_id"], db=db)
     return new_course
 
-@course_router.get("/courses/", response_model=List[CourseOut])
-async def get_courses():
-    return data_store.get_courses()
+@course_router.get("/courses/", response_model=CoursePage, responses=NDJSON_RESPONSES)
+async def get_courses(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: Any = Depends(get_db)
+):
+    """
+    分页返回课程；流式模式下逐行返回全部课程（NDJSON），忽略 cursor/limit
+    带弱 ETag，If-None-Match 命中时直接返回 304
+    """
+    streaming = wants_stream(request, stream)
+    etag = make_etag(await data_store.get_version_stamp("course", db=db), streaming, cursor, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if streaming:
+        return with_etag(ndjson_response(data_store.iter_courses(primary=True)), None, etag)
+    after = parse_cursor(cursor, (int,))
+    courses = await data_store.get_courses(after=after[0] if after else None, limit=limit + 1, db=db)
+    return with_etag(fast_json(CoursePage, paginate(courses, limit, key=lambda c: (c["course_id"],))), response, etag)
 
 @course_router.post("/courses/{course_id}/enroll", status_code=status.HTTP_201_CREATED)
-async def enroll_course(course_id: int, current_user: Dict = Depends(get_current_student)):
+async def enroll_course(course_id: int, current_user: Dict = Depends(get_current_student), db: Any = Depends(get_db)):
     """学生选课"""
-    # 获取学生信息
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    if not student:
-        raise HTTPException(status_code=404, detail="学生信息不存在")
-
-    student_id = student["student_id"]
+    student_id = current_user["student_id"]
 
     # 检查是否已选课
-    courses = data_store.get_student_courses(student_id)
+    courses = await data_store.get_student_courses(student_id, db=db)
     if any(course["course_id"] == course_id for course in courses):
         raise HTTPException(status_code=400, detail="已选过该课程")
     
     # 添加选课记录
-    if not data_store.enroll_student_in_course(student_id, course_id):
+    if not await data_store.enroll_student_in_course(student_id, course_id, db=db):
         raise HTTPException(status_code=500, detail="选课失败")
     
     return {"message": "选课成功"}
 
 @course_router.get("/courses/{course_id}/students", response_model=List[CourseStudentOut])
-async def get_course_students(course_id: int, current_user: Dict = Depends(get_current_teacher)):
-    return data_store.get_course_students(course_id)
+async def get_course_students(course_id: int, current_user: Dict = Depends(get_current_teacher), db: Any = Depends(get_db)):
+    return fast_json(List[CourseStudentOut], await data_store.get_course_students(course_id, db=db))
+
+def check_grade_stats_options(percentiles: List[float], bins: List[float]) -> None:
+    try:
+        check_options(percentiles, bins)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@course_router.get("/courses/{course_id}/grade-stats", response_model=CourseGradeStats)
+async def get_course_grade_stats(
+    course_id: int,
+    percentiles: List[float] = Query(list(DEFAULT_PERCENTILES)),
+    bins: List[float] = Query(list(DEFAULT_BINS)),
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
+):
+    """课程成绩分布：均值、中位数、百分位数、标准差、直方图分段和排名"""
+    check_grade_stats_options(percentiles, bins)
+    if not await data_store.get_course(course_id, db=db):
+        raise HTTPException(status_code=404, detail="课程不存在")
+    columns = await data_store.get_course_grades([course_id], db=db)
+    stats = course_grade_stats(columns, [course_id], percentiles, bins)[course_id]
+    return fast_json(CourseGradeStats, {"course_id": course_id, **stats})
+
+@course_router.get("/grade-stats", response_model=List[CourseGradeStats])
+async def get_grade_stats(
+    course_id: List[int] = Query([]),
+    department: Optional[str] = None,
+    percentiles: List[float] = Query(list(DEFAULT_PERCENTILES)),
+    bins: List[float] = Query(list(DEFAULT_BINS)),
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
+):
+    """多门课的成绩统计：course_id 可重复传入，也可按 department 统计该院系教师所授的全部课程"""
+    check_grade_stats_options(percentiles, bins)
+    course_ids = list(dict.fromkeys(course_id))
+    if department:
+        course_ids += [c for c in await data_store.get_department_course_ids(department, db=db) if c not in course_ids]
+    if not course_ids:
+        raise HTTPException(status_code=400, detail="请指定课程或院系")
+    columns = await data_store.get_course_grades(course_ids, db=db)
+    # 整个院系的数据量较大，统计放到线程池中计算，不阻塞事件循环
+    stats = await run_in_threadpool(course_grade_stats, columns, course_ids, percentiles, bins)
+    return fast_json(List[CourseGradeStats], [{"course_id": c, **stats[c]} for c in course_ids])
 
 # === 作业管理端点 === 
-@assign_router.get("/assignments/", response_model=List[AssignmentOut])
-async def get_assignments():
-    return data_store.get_assignments()
+@assign_router.get("/assignments/", response_model=AssignmentPage, responses=NDJSON_RESPONSES)
+async def get_assignments(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: Any = Depends(get_db)
+):
+    """
+    分页返回作业；流式模式下逐行返回全部作业（NDJSON），忽略 cursor/limit
+    带弱 ETag，If-None-Match 命中时直接返回 304
+    """
+    streaming = wants_stream(request, stream)
+    etag = make_etag(await data_store.get_version_stamp("assignment", db=db), streaming, cursor, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if streaming:
+        return with_etag(ndjson_response(data_store.iter_assignments(primary=True)), None, etag)
+    after = parse_cursor(cursor, (int,))
+    assignments = await data_store.get_assignments(after=after[0] if after else None, limit=limit + 1, db=db)
+    page = paginate(assignments, limit, key=lambda a: (a["assignment_id"],))
+    return with_etag(fast_json(AssignmentPage, page), response, etag)
 
 @assign_router.post("/assignments/", response_model=AssignmentOut)
 async def create_assignment(
     assignment: AssignmentCreate, 
     current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
     try:
-        new_assignment = data_store.create_assignment(assignment)
+        new_assignment = await data_store.create_assignment(assignment, db=db)
         return new_assignment
     except ValueError as e:
-        # 处理预检查错误
-        raise HTTPException(status_code=404, detail=str(e))
+        # 处理预检查错误（未指定课程、未教授该课程）
+        raise HTTPException(status_code=400, detail=str(e))
     except IntegrityError as e:
         # 处理数据库约束错误
         if "foreign key" in str(e).lower():
@@ -305,25 +614,68 @@ async def create_assignment(
             detail="数据完整性错误"
         )
 
-@assign_router.get("/courses/{course_id}/assignments", response_model=List[AssignmentOut])
-async def get_course_assignments(course_id: int):
-    return data_store.get_assignments_by_course(course_id)
+@assign_router.get("/courses/{course_id}/assignments", response_model=AssignmentPage)
+async def get_course_assignments(
+    course_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Any = Depends(get_db)
+):
+    """课程作业，按截止时间排序"""
+    after = parse_cursor(cursor, (datetime, int))
+    assignments = await data_store.get_assignments_by_course(course_id, after=after, limit=limit + 1, db=db)
+    return fast_json(AssignmentPage, paginate(assignments, limit, key=lambda a: (a["deadline"], a["assignment_id"])))
+
+@assign_router.get("/assignments/unassigned", response_model=List[AssignmentOut])
+async def get_unassigned_assignments(current_user: Dict = Depends(get_current_teacher), db: Any = Depends(get_db)):
+    """当前教师名下尚未归属课程的作业，需由教师补充所属课程"""
+    return fast_json(List[AssignmentOut], await data_store.get_unassigned_assignments(current_user["teacher_id"], db=db))
+
+@assign_router.patch("/assignments/{assignment_id}/course", response_model=AssignmentOut)
+async def set_assignment_course(
+    assignment_id: int,
+    update: AssignmentCourseUpdate,
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
+):
+    """修改作业所属课程：只能修改自己发布的作业，且须为该课程的任课教师"""
+    try:
+        assignment = await data_store.set_assignment_course(
+            assignment_id, current_user["teacher_id"], update.course_id, db=db
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if assignment is None:
+        raise HTTPException(status_code=404, detail="作业不存在")
+    return assignment
+
+@assign_router.post("/courses/{course_id}/assignments", response_model=AssignmentOut)
+async def create_course_assignment(
+    course_id: int,
+    assignment: CourseAssignmentCreate,
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
+):
+    """任课教师在课程下发布作业"""
+    try:
+        return await data_store.create_assignment(AssignmentCreate(
+            **assignment.dict(), teacher_id=current_user["teacher_id"], course_id=course_id
+        ), db=db)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
 
-@assign_router.post("/assignments/{assignment_id}/submit", response_model=SubmissionOut)
+@assign_router.post("/assignments/{assignment_id}/submit", response_model=SubmissionOut,
+                    openapi_extra=upload_openapi())
 async def submit_assignment(
     assignment_id: int, 
-    file: UploadFile = File(...),
-    current_user: Dict = Depends(get_current_student)
+    request: Request,
+    current_user: Dict = Depends(get_current_student),
+    db: Any = Depends(get_db)
 ):
-    # 获取学生信息
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    if not student:
-        raise HTTPException(status_code=404, detail="学生信息不存在")
-    
-    student_id = student["student_id"]
+    student_id = current_user["student_id"]
     
     # 检查作业是否存在
-    assignment = data_store.get_assignment(assignment_id)
+    assignment = await data_store.get_assignment(assignment_id, db=db)
     if not assignment:
         raise HTTPException(status_code=404, detail="作业不存在")
 
@@ -331,52 +683,67 @@ async def submit_assignment(
     if datetime.utcnow() > assignment["deadline"]:
         raise HTTPException(status_code=400, detail="作业已截止")
     
-    # 保存文件
-    file_path = data_store.save_upload_file(file)
+    # 边接收边写入内容寻址存储（按作业的大小上限），请求体不经过 UploadFile 缓冲
+    try:
+        stored = await receive_upload(
+            request, data_store.blob_store, assignment.get("max_upload_bytes") or UPLOAD_MAX_BYTES
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadFormError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
      
     # 创建提交记录
-    new_submission = data_store.create_submission({
+    new_submission = await data_store.create_submission({
         "student_id": student_id,
         "assignment_id": assignment_id,
         "submit_time": datetime.utcnow(),
-        "file_path": file_path
-    })
+        "file_path": stored["path"],
+        "file_size": stored["size"],
+        "file_sha256": stored["sha256"]
+    }, db=db)
     
     return new_submission
 
-@assign_router.get("/assignments/{assignment_id}/submissions", response_model=List[SubmissionOut])
-async def get_assignment_submissions(assignment_id: int, current_user: Dict = Depends(get_current_teacher)):
-    submissions = data_store.get_submissions_by_assignment(assignment_id)
-    return submissions
+@assign_router.get("/assignments/{assignment_id}/submissions", response_model=SubmissionPage)
+async def get_assignment_submissions(
+    assignment_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
+):
+    after = parse_cursor(cursor, (datetime, int))
+    submissions = await data_store.get_submissions_by_assignment(
+        assignment_id, after=after, limit=limit + 1, db=db
+    )
+    return fast_json(SubmissionPage, paginate(submissions, limit, key=lambda s: (s["submit_time"], s["submission_id"])))
 
 # === 班级管理端点 ===
 @class_router.post("/", response_model=ClassOut)
-async def create_class(class_data: ClassCreate):
-    new_class = data_store.create_class(class_data)
+async def create_class(class_data: ClassCreate, db: Any = Depends(get_db)):
+    new_class = await data_store.create_class(class_data, db=db)
     return new_class
 
 @class_router.get("/{class_id}/students", response_model=List[StudentOut])
-async def get_class_students(class_id: int):
-    students = data_store.get_class_students(class_id)
-    
-    result = []
-    for student in students:
-        user = data_store.get_user_by_id(student["user_id"])
-        result.append({**student, "user": user})
-    return result
+async def get_class_students(class_id: int, db: Any = Depends(get_db)):
+    # 学生与用户信息一次 JOIN 查询
+    return fast_json(List[StudentOut], await data_store.get_class_students_with_users(class_id, db=db))
 
 @class_router.post("/{class_id}/add-student/{student_id}", status_code=status.HTTP_201_CREATED)
-async def add_student_to_class(class_id: int, student_id: int):
+async def add_student_to_class(class_id: int, student_id: int, db: Any = Depends(get_db)):
     # 检查班级是否存在
-    if not data_store.get_class(class_id):
+    if not await data_store.get_class(class_id, db=db):
         raise HTTPException(status_code=404, detail="班级不存在")
     
     # 检查学生是否存在
-    if not data_store.get_student(student_id):
+    if not await data_store.get_student(student_id, db=db):
         raise HTTPException(status_code=404, detail="学生不存在")
     
     # 添加学生到班级
-    if not data_store.add_student_to_class(student_id, class_id):
+    if not await data_store.add_student_to_class(student_id, class_id, db=db):
         raise HTTPException(status_code=400, detail="学生已在班级中或添加失败")
     
     return {"message": "学生添加成功"}
@@ -385,10 +752,11 @@ async def add_student_to_class(class_id: int, student_id: int):
 async def update_class(
     class_id: int, 
     update_data: ClassUpdate,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
     
-    updated_class = data_store.update_class(class_id, update_data)
+    updated_class = await data_store.update_class(class_id, update_data, db=db)
     if not updated_class:
         raise HTTPException(status_code=404, detail="班级不存在")
     
@@ -397,10 +765,11 @@ async def update_class(
 @class_router.delete("/{class_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_class(
     class_id: int,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
       
-    if not data_store.delete_class(class_id):
+    if not await data_store.delete_class(class_id, db=db):
         raise HTTPException(status_code=404, detail="班级不存在")
     
     return {"message": "删除班级成功"}
@@ -409,36 +778,37 @@ async def delete_class(
 async def remove_student_from_class(
     class_id: int, 
     student_id: int,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):    
     # 检查班级是否存在
-    if not data_store.get_class(class_id):
+    if not await data_store.get_class(class_id, db=db):
         raise HTTPException(status_code=404, detail="班级不存在")
     
     # 检查学生是否存在
-    if not data_store.get_student(student_id):
+    if not await data_store.get_student(student_id, db=db):
         raise HTTPException(status_code=404, detail="学生不存在")
 
     # 从班级中删除学生
-    if not data_store.remove_student_from_class(student_id, class_id):
+    if not await data_store.remove_student_from_class(student_id, class_id, db=db):
         raise HTTPException(status_code=400, detail="学生不在班级中")
 
     return {"message": "删除学生成功"}
 
 # === 权限管理端点 ===
 @api_router.get("/users/{user_id}/permissions", response_model=List[PermissionBase])
-async def get_user_permissions(user_id: int):
-    permissions = data_store.get_user_permissions(user_id)
+async def get_user_permissions(user_id: int, db: Any = Depends(get_db)):
+    permissions = await data_store.get_user_permissions(user_id, db=db)
     return permissions
 
 @api_router.post("/users/{user_id}/permissions", status_code=status.HTTP_201_CREATED)
-async def assign_permission(user_id: int, permission: PermissionAssign):
+async def assign_permission(user_id: int, permission: PermissionAssign, db: Any = Depends(get_db)):
     # 检查用户是否存在
-    if not data_store.get_user_by_id(user_id):
+    if not await data_store.get_user_by_id(user_id, db=db):
         raise HTTPException(status_code=404, detail="用户不存在")
 
     # 分配权限
-    if not data_store.assign_permission_to_user(user_id, permission.permission_id):
+    if not await data_store.assign_permission_to_user(user_id, permission.permission_id, db=db):
         raise HTTPException(status_code=400, detail="权限已分配或分配失败")
     
     return {"message": "权限分配成功"}
@@ -449,87 +819,100 @@ async def record_grade(
     course_id: int, 
     student_id: int, 
     grade: GradeUpdate,
-    current_user: Dict = Depends(get_current_teacher)
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
     # 更新成绩
-    if not data_store.record_grade(student_id, course_id, grade.grade):
+    if not await data_store.record_grade(student_id, course_id, grade.grade, db=db):
         raise HTTPException(status_code=500, detail="成绩更新失败")
     
     return {"message": "成绩更新成功"}
 
 @api_router.get("/students/{student_id}/transcript", response_model=List[Dict])
-async def get_student_transcript(student_id: int):
-    # 检查学生是否存在
-    if not data_store.get_student(student_id):
+async def get_student_transcript(student_id: int, request: Request, response: Response, db: Any = Depends(get_db)):
+    # 成绩单只随该学生的选课/成绩记录和课程信息变化
+    etag = make_etag(await data_store.get_version_stamp("course", f"student_course:student:{student_id}", db=db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # 获取学生成绩单（选课记录已关联课程名和学分，一次查询）
+    result = await data_store.get_student_courses(student_id, db=db)
+    # 没有选课记录时再区分学生是否存在
+    if not result and not await data_store.get_student(student_id, db=db):
         raise HTTPException(status_code=404, detail="学生不存在")
     
-    # 获取学生成绩单
-    transcript = data_store.get_student_courses(student_id)
-    
-    # 添加课程信息
-    result = []
-    for course in transcript:
-        course_info = data_store.get_course(course["course_id"])
-        if course_info:
-            result.append({
-                "course_id": course_info["course_id"],
-                "course_name": course_info["course_name"],
-                "credit": course_info["credit"],
-                "grade": course["grade"]
-            })
-    
-    return result
+    return with_etag(result, response, etag)
+
+@api_router.get("/students/{student_id}/transcript/summary", response_model=TranscriptSummaryOut)
+async def get_transcript_summary(student_id: int, request: Request, response: Response, db: Any = Depends(get_db)):
+    """成绩汇总：课程数、已出成绩学分、已获学分、学分加权绩点"""
+    etag = make_etag(await data_store.get_version_stamp(
+        "course", f"student_course:student:{student_id}", "student_transcript_summary:*", db=db
+    ))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    summary = await data_store.get_transcript_summary(student_id, db=db)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="学生不存在")
+    return with_etag(summary, response, etag)
 
 # === 文件管理端点 ===
-@file_router.post("/submissions/upload", response_model=SubmissionOut)
+@file_router.post("/submissions/upload", response_model=SubmissionOut,
+                  openapi_extra=upload_openapi(assignment_id="integer"))
 async def upload_submission(
-    assignment_id: int = Form(...),
-    file: UploadFile = File(...),
-    current_user: Dict = Depends(get_current_student)
+    request: Request,
+    current_user: Dict = Depends(get_current_student),
+    db: Any = Depends(get_db)
 ):
     """
     学生提交作业文件
-    - 保存文件到上传目录
+    - 表单中 assignment_id 须在 file 之前，文件开始传输前据此检查作业并确定大小上限
+    - 边接收边写入内容寻址存储（超出作业的大小上限返回 413），相同内容只存一份
     - 创建提交记录到数据库
     - 返回提交信息
     """
-    # 获取学生信息
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    if not student:
-        raise HTTPException(status_code=404, detail="学生信息不存在")
-    
-    student_id = student["student_id"]
-    
-    # 检查作业是否存在
-    assignment = data_store.get_assignment(assignment_id)
-    if not assignment:
-        raise HTTPException(status_code=404, detail="作业不存在")
-    
-    # 生成唯一文件名
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"assignment_{assignment_id}_student_{student_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}{file_ext}"
-    file_path = os.path.join(data_store.upload_dir, unique_filename)
-    
-    # 保存文件
+    student_id = current_user["student_id"]
+
+    async def upload_limit(fields: Dict[str, str]) -> int:
+        # 检查作业是否存在
+        try:
+            assignment_id = int(fields["assignment_id"])
+        except (KeyError, ValueError):
+            raise UploadFormError("表单中 assignment_id 须在 file 之前")
+        assignment = await data_store.get_assignment(assignment_id, db=db)
+        if not assignment:
+            raise HTTPException(status_code=404, detail="作业不存在")
+        return assignment.get("max_upload_bytes") or UPLOAD_MAX_BYTES
+
+    # 流式写入上传目录，同时计算长度和摘要
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        stored = await receive_upload(request, data_store.blob_store, upload_limit)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadFormError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except ClientDisconnect:
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
-    finally:
-        await file.close()
+    assignment_id = int(stored["fields"]["assignment_id"])
+    file_path = stored["path"]
     
     # 创建提交记录
     submission_data = {
         "student_id": student_id,
         "assignment_id": assignment_id,
         "submit_time": datetime.now(),
-        "file_path": file_path
+        "file_path": file_path,
+        "file_size": stored["size"],
+        "file_sha256": stored["sha256"]
     }
     
     try:
-        submission = data_store.create_submission(submission_data)
+        submission = await data_store.create_submission(submission_data, db=db)
         return {
             "submission_id": submission["submission_id"],
             "student_id": submission["student_id"],
@@ -538,83 +921,253 @@ async def upload_submission(
             "file_path": os.path.basename(submission["file_path"])
         }
     except Exception as e:
-        # 如果数据库操作失败，删除已保存的文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # 文件可能已被其他提交引用，不在这里删除；未被引用的 blob 由定期清理回收
         raise HTTPException(status_code=500, detail=f"创建提交记录失败: {str(e)}")
 
+# === 断点续传上传 ===
+# 会话保存在上传目录所在的本机磁盘
+upload_sessions = UploadSessions(data_store.blob_store)
+
+def upload_session_error(e: UploadSessionError) -> HTTPException:
+    # 偏移不一致等情况附带服务端当前偏移，客户端据此续传
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@file_router.post("/uploads", response_model=UploadSessionOut, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    session: UploadSessionCreate,
+    current_user: Dict = Depends(get_current_student),
+    db: Any = Depends(get_db)
+):
+    """
+    创建断点续传会话
+    之后用 PATCH /files/uploads/{upload_id} 按偏移上传，断线后 GET 查询已接收的偏移继续，
+    全部收到后 POST /files/uploads/{upload_id}/finalize 生成提交记录
+    """
+    assignment = await data_store.get_assignment(session.assignment_id, db=db)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="作业不存在")
+    limit = assignment.get("max_upload_bytes") or UPLOAD_MAX_BYTES
+    if session.length > limit:
+        raise HTTPException(status_code=413, detail=str(UploadTooLarge(limit)))
+    return await run_in_threadpool(
+        upload_sessions.create, current_user["student_id"], session.assignment_id, session.filename, session.length
+    )
+
+@file_router.get("/uploads/{upload_id}", response_model=UploadSessionOut)
+async def get_upload_session(upload_id: str, response: Response, current_user: Dict = Depends(get_current_student)):
+    """查询上传进度，offset 为已接收的字节数"""
+    try:
+        progress = await run_in_threadpool(upload_sessions.progress, upload_id, current_user["student_id"])
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    response.headers["Upload-Offset"] = str(progress["offset"])
+    return progress
+
+@file_router.patch("/uploads/{upload_id}", response_model=UploadSessionOut)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., ge=0),
+    current_user: Dict = Depends(get_current_student)
+):
+    """
+    上传一段数据：请求体为原始字节（非 multipart），从请求头 Upload-Offset 指定的偏移开始
+    偏移须等于已接收的字节数，否则返回 409 并在 Upload-Offset 中给出正确的偏移
+    """
+    try:
+        progress = await upload_sessions.append(upload_id, current_user["student_id"], upload_offset, request.stream())
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    except ClientDisconnect:
+        # 已收到的部分已经落盘，客户端重连后查询进度续传
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+    response.headers["Upload-Offset"] = str(progress["offset"])
+    return progress
+
+@file_router.post("/uploads/{upload_id}/finalize", response_model=SubmissionOut)
+async def finalize_upload(upload_id: str, current_user: Dict = Depends(get_current_student), db: Any = Depends(get_db)):
+    """全部字节收到后计算摘要、收入内容寻址存储并创建提交记录"""
+    student_id = current_user["student_id"]
+    try:
+        stored = await run_in_threadpool(upload_sessions.finish, upload_id, student_id)
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    meta = stored["meta"]
+    submission = await data_store.create_submission({
+        "student_id": student_id,
+        "assignment_id": meta["assignment_id"],
+        "submit_time": datetime.now(),
+        "file_path": make_ref(stored["sha256"], meta["filename"]),
+        "file_size": stored["size"],
+        "file_sha256": stored["sha256"]
+    }, db=db)
+    return {**submission, "file_path": os.path.basename(submission["file_path"])}
+
+@file_router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(upload_id: str, current_user: Dict = Depends(get_current_student)):
+    """放弃上传，删除已接收的数据"""
+    try:
+        await run_in_threadpool(upload_sessions.load, upload_id, current_user["student_id"])
+    except UploadSessionError as e:
+        raise upload_session_error(e)
+    await run_in_threadpool(upload_sessions.remove, upload_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @file_router.get("/submissions/my", response_model=List[SubmissionOut])
 async def get_my_submissions(
-    current_user: Dict = Depends(get_current_student)
+    request: Request,
+    response: Response,
+    current_user: Dict = Depends(get_current_student),
+    db: Any = Depends(get_db)
 ):
-    """学生查看自己所有的作业提交"""
-    # 获取学生信息
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    if not student:
-        raise HTTPException(status_code=404, detail="学生信息不存在")
-    
-    student_id = student["student_id"]
+    """学生查看自己所有的作业提交，带弱 ETag，If-None-Match 命中时直接返回 304"""
+    student_id = current_user["student_id"]
+    # 所有学生共用同一 URL，计数值相同时只能靠学号区分
+    etag = make_etag(
+        await data_store.get_version_stamp(f"submission:student:{student_id}", "submission:*", db=db), student_id
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag, per_user=True)
     
-    submissions = data_store.get_submissions_by_student(student_id)
+    submissions = await data_store.get_submissions_by_student(student_id, db=db)
     
     # 只返回文件名
     for sub in submissions:
         sub["file_path"] = os.path.basename(sub["file_path"])
     
-    return submissions
+    return with_etag(fast_json(List[SubmissionOut], submissions), response, etag, per_user=True)
 
-@file_router.get("/submissions/all", response_model=List[SubmissionOut])
+@file_router.get("/submissions/all", response_model=SubmissionPage, responses=NDJSON_RESPONSES)
 async def get_all_submissions(
-    current_user: Dict = Depends(get_current_teacher)
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    current_user: Dict = Depends(get_current_teacher),
+    db: Any = Depends(get_db)
 ):
-    """教师查看所有学生的作业提交"""
-    submissions = data_store.get_all_submissions()
+    """
+    教师查看所有学生的作业提交（按提交时间游标分页）
+    流式模式下逐行返回全部提交（NDJSON），忽略 cursor/limit
+    """
+    if wants_stream(request, stream):
+        return ndjson_response(
+            data_store.iter_all_submissions(),
+            transform=lambda sub: {**sub, "file_path": os.path.basename(sub["file_path"])}
+        )
+    after = parse_cursor(cursor, (datetime, int))
+    submissions = await data_store.get_all_submissions(after=after, limit=limit + 1, db=db)
+    page = paginate(submissions, limit, key=lambda s: (s["submit_time"], s["submission_id"]))
     
     # 只返回文件名
-    for sub in submissions:
+    for sub in page["items"]:
         sub["file_path"] = os.path.basename(sub["file_path"])
     
-    return submissions
+    return fast_json(SubmissionPage, page)
 
-@file_router.get("/submissions/download/{submission_id}")
-async def download_submission(
-    submission_id: int,
-    current_user: Dict = Depends(get_current_user)
-):
+# 文件字节的发送方式由 FILE_DELIVERY 决定（应用 / X-Accel-Redirect / X-Sendfile / 签名链接）
+# 签名链接使用独立的 FILE_URL_SECRET：signed 模式下未设置时启动失败，其他模式下未设置时不提供签名链接
+file_delivery = FileDelivery(data_store.upload_dir, os.getenv("FILE_URL_SECRET"))
+
+async def get_downloadable_submission(submission_id: int, current_user: Dict, db: Any) -> Dict:
     """
-    下载提交的文件
+    读取提交记录并检查下载权限
     - 学生只能下载自己的文件
     - 教师可以下载所有文件
     """
     # 获取提交记录
-    submission = data_store.get_submission_by_id(submission_id)
+    submission = await data_store.get_submission_by_id(submission_id, db=db)
     if not submission:
         raise HTTPException(status_code=404, detail="提交记录不存在")
     
-    # 权限检查
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    teacher = data_store.get_teacher_by_user_id(current_user["user_id"])
-    
-    if student:
-        if student["student_id"] != submission["student_id"]:
+    # 权限检查（复用请求内已解析的身份）
+    if current_user["is_student"]:
+        if current_user["student_id"] != submission["student_id"]:
             raise HTTPException(status_code=403, detail="无权访问此文件")
-    elif not teacher:
+    elif not current_user["is_teacher"]:
         raise HTTPException(status_code=403, detail="无权访问此文件")
-    
-    file_path = submission["file_path"]
-    if not os.path.exists(file_path):
+    return submission
+
+@file_router.api_route("/submissions/download/{submission_id}", methods=["GET", "HEAD"])
+async def download_submission(
+    submission_id: int,
+    request: Request,
+    inline: bool = Query(False, description="在浏览器中直接打开（预览 PDF、视频等）"),
+    current_user: Dict = Depends(get_current_user),
+    db: Any = Depends(get_db)
+):
+    """
+    下载提交的文件（权限同 get_downloadable_submission）
+    - 支持 Range（含多段）断点续传和拖动预览，以及 If-None-Match / If-Modified-Since 返回 304
+    - 配置反向代理时只返回 X-Accel-Redirect / X-Sendfile 或重定向到签名链接，文件不经过应用进程
+    """
+    submission = await get_downloadable_submission(submission_id, current_user, db)
+    file_path = data_store.blob_store.resolve(submission["file_path"])
+    try:
+        return file_delivery.response(
+            request,
+            file_path,
+            os.path.basename(submission["file_path"]),
+            digest=submission["file_sha256"] or parse_ref(submission["file_path"]),
+            inline=inline
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+@file_router.get("/submissions/{submission_id}/link", response_model=SignedFileLink)
+async def get_submission_link(
+    submission_id: int,
+    inline: bool = Query(False, description="在浏览器中直接打开（预览 PDF、视频等）"),
+    current_user: Dict = Depends(get_current_user),
+    db: Any = Depends(get_db)
+):
+    """
+    生成提交文件的短期签名链接（有效期 SIGNED_URL_TTL_SECONDS）
+    浏览器直接打开该链接下载或预览，不需要携带令牌，也不需要先把整个文件读进页面内存
+    未配置 FILE_URL_SECRET 时返回 404，客户端改用下载接口
+    """
+    if not file_delivery.can_sign:
+        raise HTTPException(status_code=404, detail="未启用签名链接，请使用下载接口")
+    submission = await get_downloadable_submission(submission_id, current_user, db)
+    file_path = data_store.blob_store.resolve(submission["file_path"])
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    link = file_delivery.signed_url(file_path, os.path.basename(submission["file_path"]), inline)
+    if link is None:
+        raise HTTPException(status_code=409, detail="该文件不在上传目录内，请使用下载接口")
+    url, expires_at = link
+    return {"url": url, "expires_at": expires_at}
+
+@file_router.api_route("/signed/{rel:path}", methods=["GET", "HEAD"])
+async def download_signed(
+    rel: str,
+    request: Request,
+    name: str = Query(...),
+    expires: int = Query(...),
+    sig: str = Query(...),
+    inline: bool = Query(False)
+):
+    """
+    签名链接的应用内实现：没有部署反向代理（或其未接管 /files/signed/）时由应用校验签名并发送
+    签名即授权，不需要登录
+    """
+    path = file_delivery.local_path(rel)
+    if path is None or not file_delivery.verify(rel, name, inline, expires, sig):
+        raise HTTPException(status_code=403, detail="链接无效或已过期")
+    digest = os.path.basename(rel) if rel.startswith("blobs/") else None
+    try:
+        return file_response(request, path, name, digest=digest, inline=inline)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="文件不存在")
-    
-    return FileResponse(
-        file_path,
-        filename=os.path.basename(file_path),
-        media_type="application/octet-stream"
-    )
 
 @file_router.delete("/submissions/{submission_id}")
 async def delete_submission(
     submission_id: int,
-    current_user: Dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: Dict = Depends(get_current_user),
+    db: Any = Depends(get_db)
 ):
     """
     删除提交记录及对应文件
@@ -622,33 +1175,34 @@ async def delete_submission(
     - 教师可以删除任何提交
     """
     # 获取提交记录
-    submission = data_store.get_submission_by_id(submission_id)
+    submission = await data_store.get_submission_by_id(submission_id, db=db)
     if not submission:
         raise HTTPException(status_code=404, detail="提交记录不存在")
     
-    # 权限检查
-    student = data_store.get_student_by_user_id(current_user["user_id"])
-    teacher = data_store.get_teacher_by_user_id(current_user["user_id"])
-    
-    if student:
+    # 权限检查（复用请求内已解析的身份）
+    if current_user["is_student"]:
         # 学生只能删除自己的提交
-        if student["student_id"] != submission["student_id"]:
+        if current_user["student_id"] != submission["student_id"]:
             raise HTTPException(status_code=403, detail="无权删除此提交")
-    elif not teacher:
+    elif not current_user["is_teacher"]:
         # 既不是学生也不是教师
         raise HTTPException(status_code=403, detail="无权删除此提交")
     
-    # 删除文件
+    # 删除早期按路径保存的文件；内容寻址的文件只释放引用，最后一个引用删除后才回收
     file_path = submission["file_path"]
-    if os.path.exists(file_path):
+    digest = parse_ref(file_path)
+    if digest is None and os.path.exists(file_path):
         try:
             os.remove(file_path)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"文件删除失败: {str(e)}")
     
     # 删除数据库记录
-    if not data_store.delete_submission(submission_id):
+    if not await data_store.delete_submission(submission_id, db=db):
         raise HTTPException(status_code=500, detail="删除提交记录失败")
+    # 引用计数随请求事务提交归零，之后尝试回收；未能回收的由定期清理（collect_blobs.py）处理
+    if digest is not None:
+        background_tasks.add_task(data_store.collect_blobs, [digest])
     
     return {"message": "提交记录及文件已成功删除"}
 
@@ -658,6 +1212,37 @@ def api_status():
     """API 状态检查"""
     return {"message": "API 工作正常"}
 
+# 以下运行状态接口暴露内部细节，仅限管理员
+@api_router.get("/api/cache")
+def cache_status(current_user: Dict = Depends(get_current_admin)):
+    """身份缓存、查询缓存命中统计"""
+    return {
+        "principal": data_store.principal_cache.stats(),
+        "query": data_store.query_cache.stats(),
+        "revocation": revocation_list.stats()
+    }
+
+@api_router.get("/api/datastore")
+def datastore_status(current_user: Dict = Depends(get_current_admin)):
+    """线程池卸载层的排队/执行耗时统计，以及读请求合并节省的查询数"""
+    if isinstance(data_store, ThreadedDataStore):
+        return {**data_store.stats(), "single_flight": data_store.single_flight.stats()}
+    return {"backend": DATASTORE_BACKEND, "single_flight": data_store.single_flight.stats()}
+
+@api_router.get("/api/pool")
+def pool_stats(current_user: Dict = Depends(get_current_admin)):
+    """数据库连接池状态：占用数、溢出数、获取连接等待时间、失效次数"""
+    return {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+        "sync_replicas": [pool_status(e) for e in replica_engines],
+        "async_replicas": [pool_status(e.sync_engine) for e in async_replica_engines],
+        "routing": {
+            "sync": read_router.stats(),
+            "async": async_read_router.stats()
+        }
+    }
+
 @api_router.get("/")
 def root():
     """根端点"""
@@ -665,18 +1250,13 @@ def root():
 
 @api_router.get("/users/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
-    user_id = current_user["user_id"]
-    student = data_store.get_student_by_user_id(user_id)
-    teacher = data_store.get_teacher_by_user_id(user_id)
-    is_student = student is not None
-    is_teacher = teacher is not None
     return {
-        "user_id": user_id,
+        "user_id": current_user["user_id"],
         "username": current_user["username"],
-        "is_student": is_student,
-        "is_teacher": is_teacher,
-        "student_id": student["student_id"] if student else None,
-        "teacher_id": teacher["teacher_id"] if teacher else None
+        "is_student": current_user["is_student"],
+        "is_teacher": current_user["is_teacher"],
+        "student_id": current_user["student_id"],
+        "teacher_id": current_user["teacher_id"]
     }
 
 # === 应用实例 ===
@@ -699,6 +1279,14 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有HTTP头
 )
 
+@app.exception_handler(DataStoreOverloaded)
+async def datastore_overloaded_handler(request, exc: DataStoreOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "服务繁忙，请稍后重试"},
+        headers={"Retry-After": "1"}
+    )
+
 app.include_router(api_router)
 app.include_router(stu_router, prefix="/stu", tags=["学生管理"])
 app.include_router(tea_router, prefix="/tea", tags=["教师管理"])
@@ -708,8 +1296,6 @@ app.include_router(file_router, prefix="/files", tags=["文件管理"])
 app.include_router(class_router, prefix='/classes', tags=["班级管理"])
 app.include_router(user_router, prefix='/user', tags=["用户管理"])
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
 # === 运行入口 ===
 if __name__ == "__main__":
     import uvicorn
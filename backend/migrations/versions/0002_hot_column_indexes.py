@@ -0,0 +1,49 @@
+"""index foreign-key hot columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表, 列, 是否覆盖外键列)，与 models.py 中的声明一致
+INDEXES = [
+    # 鉴权：按 user_id 查学生/教师身份
+    ("ix_student_user_id", "student", ["user_id"], True),
+    ("ix_teacher_user_id", "teacher", ["user_id"], True),
+    # 作业：按教师查、按截止时间筛选
+    ("ix_assignment_teacher_id", "assignment", ["teacher_id"], True),
+    ("ix_assignment_deadline", "assignment", ["deadline"], False),
+    # 提交：按作业/学生查询，按提交时间分页
+    ("ix_submission_assignment_student_time", "submission", ["assignment_id", "student_id", "submit_time"], True),
+    ("ix_submission_student_time", "submission", ["student_id", "submit_time"], True),
+    ("ix_submission_time_id", "submission", ["submit_time", "submission_id"], False),
+    # 关联表：复合主键的第二列反查
+    ("ix_user_permission_permission_id", "user_permission", ["permission_id"], True),
+    ("ix_student_class_class_id", "student_class", ["class_id"], True),
+    ("ix_teacher_class_class_id", "teacher_class", ["class_id"], True),
+    ("ix_teacher_course_course_id", "teacher_course", ["course_id"], True),
+    ("ix_student_course_course_id", "student_course", ["course_id"], True),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns, _ in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    # InnoDB 在新建可用索引后会删掉外键自动创建的索引，
+    # 覆盖外键列的索引不能删除（MySQL 1553），降级时保留
+    for name, table, columns, covers_fk in reversed(INDEXES):
+        if not covers_fk:
+            op.drop_index(name, table_name=table)
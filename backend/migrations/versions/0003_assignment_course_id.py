@@ -0,0 +1,47 @@
+"""assignment.course_id with backfill
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("assignment", sa.Column("course_id", sa.Integer, nullable=True))
+    op.create_foreign_key(
+        "fk_assignment_course_id", "assignment", "course", ["course_id"], ["course_id"]
+    )
+    op.create_index("ix_assignment_course_deadline", "assignment", ["course_id", "deadline"])
+
+    # 回填：只教一门课的教师，其作业归入该课程；
+    # 教多门课的无法判断归属，保持为空，由教师在前端补充
+    op.execute(
+        """
+        UPDATE assignment a
+        JOIN (
+            SELECT teacher_id, MIN(course_id) AS course_id
+            FROM teacher_course
+            GROUP BY teacher_id
+            HAVING COUNT(*) = 1
+        ) tc ON tc.teacher_id = a.teacher_id
+        SET a.course_id = tc.course_id
+        WHERE a.course_id IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_assignment_course_id", "assignment", type_="foreignkey")
+    op.drop_index("ix_assignment_course_deadline", table_name="assignment")
+    op.drop_column("assignment", "course_id")
@@ -0,0 +1,59 @@
+"""student_transcript_summary with backfill
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "student_transcript_summary",
+        sa.Column("student_id", sa.Integer, sa.ForeignKey("student.student_id"), primary_key=True),
+        sa.Column("course_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("graded_credits", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("earned_credits", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("grade_points", sa.Float, nullable=False, server_default="0"),
+    )
+
+    # 回填：绩点换算与 transcript.GRADE_POINTS 一致（迁移中保留当时的副本，之后换算调整请用 rebuild_transcripts.py 重建）
+    op.execute(
+        """
+        INSERT INTO student_transcript_summary
+            (student_id, course_count, graded_credits, earned_credits, grade_points)
+        SELECT s.student_id,
+               COUNT(sc.course_id),
+               COALESCE(SUM(CASE WHEN sc.grade IS NOT NULL THEN c.credit ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN sc.grade >= 60 THEN c.credit ELSE 0 END), 0),
+               COALESCE(SUM(c.credit * CASE
+                   WHEN sc.grade >= 90 THEN 4.0
+                   WHEN sc.grade >= 85 THEN 3.7
+                   WHEN sc.grade >= 82 THEN 3.3
+                   WHEN sc.grade >= 78 THEN 3.0
+                   WHEN sc.grade >= 75 THEN 2.7
+                   WHEN sc.grade >= 72 THEN 2.3
+                   WHEN sc.grade >= 68 THEN 2.0
+                   WHEN sc.grade >= 64 THEN 1.5
+                   WHEN sc.grade >= 60 THEN 1.0
+                   ELSE 0 END), 0)
+        FROM student s
+        LEFT JOIN student_course sc ON sc.student_id = s.student_id
+        LEFT JOIN course c ON c.course_id = sc.course_id
+        GROUP BY s.student_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("student_transcript_summary")
@@ -0,0 +1,30 @@
+"""per-assignment upload limit, submission size and digest
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("assignment", sa.Column("max_upload_bytes", sa.BigInteger, nullable=True))
+    # 早期提交没有记录大小和摘要，保持为空
+    op.add_column("submission", sa.Column("file_size", sa.BigInteger, nullable=True))
+    op.add_column("submission", sa.Column("file_sha256", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("submission", "file_sha256")
+    op.drop_column("submission", "file_size")
+    op.drop_column("assignment", "max_upload_bytes")
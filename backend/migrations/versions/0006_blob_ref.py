@@ -0,0 +1,34 @@
+"""content-addressed submission files: blob_ref
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 早期提交仍按原路径保存，不计入引用计数
+    op.create_table(
+        "blob_ref",
+        sa.Column("digest", sa.String(64), primary_key=True),
+        sa.Column("size", sa.BigInteger, nullable=True),
+        sa.Column("refcount", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("released_at", sa.TIMESTAMP, nullable=True),
+    )
+    op.create_index("ix_blob_ref_released_at", "blob_ref", ["released_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_blob_ref_released_at", table_name="blob_ref")
+    op.drop_table("blob_ref")
@@ -0,0 +1,24 @@
+"""index teacher.department for department grade stats
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_teacher_department", "teacher", ["department"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_teacher_department", table_name="teacher")
@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import TIMESTAMP, Boolean, Column, Integer, Text, ForeignKey, String
-from sqlalchemy import Float
+from sqlalchemy import TIMESTAMP, Boolean, Column, Integer, Text, ForeignKey, String, Index
+from sqlalchemy import BigInteger, Float
 from sqlalchemy.orm import relationship
 
 from db import Base
@@ -24,7 +24,8 @@ class Student(Base):
     student_id = Column(Integer, primary_key=True)
     grade = Column(String(20), nullable=False)
     major = Column(String(50), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    # 每次鉴权都按 user_id 查学生身份
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     
     # 关系定义
     user = relationship("User", back_populates="student")
@@ -37,8 +38,10 @@ class Teacher(Base):
     
     teacher_id = Column(Integer, primary_key=True)
     title = Column(String(50), nullable=False)
-    department = Column(String(50), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    # 院系成绩统计按院系筛选教师
+    department = Column(String(50), nullable=False, index=True)
+    # 每次鉴权都按 user_id 查教师身份
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     
     # 关系定义
     user = relationship("User", back_populates="teacher")
@@ -72,33 +75,54 @@ class Course(Base):
     
     course_id = Column(Integer, primary_key=True)
     course_name = Column(String(100), nullable=False)
+    # 成绩汇总按选课、登分时的学分增量维护，修改学分后须重建选课学生的汇总（rebuild_transcripts.py --course）
     credit = Column(Integer, nullable=False)
     
     # 关系定义
     students = relationship("Student", secondary="student_course", back_populates="courses")
     teachers = relationship("Teacher", secondary="teacher_course", back_populates="courses")
+    assignments = relationship("Assignment", back_populates="course")
 
 class Assignment(Base):
     __tablename__ = "assignment"
+    __table_args__ = (
+        # 课程作业列表按截止时间排序，一次索引范围扫描
+        Index("ix_assignment_course_deadline", "course_id", "deadline"),
+    )
     
     assignment_id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
-    deadline = Column(TIMESTAMP, nullable=False)
+    deadline = Column(TIMESTAMP, nullable=False, index=True)
     status = Column(String(20), nullable=False)
-    teacher_id = Column(Integer, ForeignKey("teacher.teacher_id"))
+    # 提交文件大小上限（字节），为空时使用 UPLOAD_MAX_BYTES
+    max_upload_bytes = Column(BigInteger)
+    teacher_id = Column(Integer, ForeignKey("teacher.teacher_id"), index=True)
+    # 早期作业只关联教师，迁移时无法确定课程的保持为空
+    course_id = Column(Integer, ForeignKey("course.course_id"))
     
     # 关系定义
     teacher = relationship("Teacher", back_populates="assignments")
+    course = relationship("Course", back_populates="assignments")
     submissions = relationship("Submission", back_populates="assignment")
 
 class Submission(Base):
     __tablename__ = "submission"
+    __table_args__ = (
+        # 按作业查提交、查某学生是否已交（前缀 assignment_id 同时服务外键）
+        Index("ix_submission_assignment_student_time", "assignment_id", "student_id", "submit_time"),
+        # 学生查看自己的提交
+        Index("ix_submission_student_time", "student_id", "submit_time"),
+        # 全部提交按 (submit_time, submission_id) 游标分页
+        Index("ix_submission_time_id", "submit_time", "submission_id"),
+    )
     
     submission_id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("student.student_id"))
     assignment_id = Column(Integer, ForeignKey("assignment.assignment_id"))
     submit_time = Column(TIMESTAMP, default=datetime.utcnow)
     file_path = Column(String(200), nullable=False)
+    file_size = Column(BigInteger)
+    file_sha256 = Column(String(64))
     
     # 关系定义
     student = relationship("Student", back_populates="submissions")
@@ -108,25 +132,49 @@ class Submission(Base):
 class UserPermission(Base):
     __tablename__ = "user_permission"
     user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
-    permission_id = Column(Integer, ForeignKey("permission.permission_id"), primary_key=True)
+    permission_id = Column(Integer, ForeignKey("permission.permission_id"), primary_key=True, index=True)
 
 class StudentClass(Base):
     __tablename__ = "student_class"
     student_id = Column(Integer, ForeignKey("student.student_id"), primary_key=True)
-    class_id = Column(Integer, ForeignKey("class.class_id"), primary_key=True)
+    # 复合主键以 student_id 开头，按班级反查需要单独索引
+    class_id = Column(Integer, ForeignKey("class.class_id"), primary_key=True, index=True)
 
 class TeacherClass(Base):
     __tablename__ = "teacher_class"
     teacher_id = Column(Integer, ForeignKey("teacher.teacher_id"), primary_key=True)
-    class_id = Column(Integer, ForeignKey("class.class_id"), primary_key=True)
+    class_id = Column(Integer, ForeignKey("class.class_id"), primary_key=True, index=True)
 
 class TeacherCourse(Base):
     __tablename__ = "teacher_course"
     teacher_id = Column(Integer, ForeignKey("teacher.teacher_id"), primary_key=True)
-    course_id = Column(Integer, ForeignKey("course.course_id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("course.course_id"), primary_key=True, index=True)
 
 class StudentCourse(Base):
     __tablename__ = "student_course"
     student_id = Column(Integer, ForeignKey("student.student_id"), primary_key=True)
-    course_id = Column(Integer, ForeignKey("course.course_id"), primary_key=True)
-    grade = Column(Float)
\ No newline at end of file
+    course_id = Column(Integer, ForeignKey("course.course_id"), primary_key=True, index=True)
+    grade = Column(Float)
+
+class StudentTranscriptSummary(Base):
+    """
+    学生成绩汇总，由 record_grade / enroll_student_in_course 增量维护，可按选课记录批量重建
+    课程学分变化不会自动反映到汇总中，须调用 DataStore.rebuild_course_transcripts
+    """
+    __tablename__ = "student_transcript_summary"
+    student_id = Column(Integer, ForeignKey("student.student_id"), primary_key=True)
+    course_count = Column(Integer, nullable=False, default=0)
+    # 已出成绩课程的学分（绩点的分母）、及格课程的学分、Σ(学分 × 绩点)
+    graded_credits = Column(Integer, nullable=False, default=0)
+    earned_credits = Column(Integer, nullable=False, default=0)
+    grade_points = Column(Float, nullable=False, default=0)
+
+class BlobRef(Base):
+    """内容寻址文件（blobs.BlobStore）的引用计数，计数归零后由 collect_blobs 回收"""
+    __tablename__ = "blob_ref"
+    digest = Column(String(64), primary_key=True)
+    size = Column(BigInteger)
+    # 不建索引：回收按 released_at 查找，计数只在删除时按主键复查
+    refcount = Column(Integer, nullable=False, default=0)
+    # 计数归零的时间（UTC），定期回收按此筛选；重新被引用时置空
+    released_at = Column(TIMESTAMP, index=True)
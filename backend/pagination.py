@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 每页默认/最大条数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+# === 游标（keyset）分页 ===
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把最后一行的排序键编码为不透明游标"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    解析游标，按 types 还原排序键
+    游标格式不正确时抛出 ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("无效的分页游标") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("无效的分页游标")
+    try:
+        return [
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for value, type_ in zip(values, types)
+        ]
+    except (ValueError, TypeError) as e:
+        raise ValueError("无效的分页游标") from e
+
+
+def paginate(rows: List[Dict], limit: int, key: Callable[[Dict], Sequence[Any]]) -> Dict:
+    """
+    组装分页响应
+    rows 应多取一行（limit + 1），据此判断是否还有下一页
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return {"items": rows, "next_cursor": encode_cursor(key(rows[-1]))}
+    return {"items": rows, "next_cursor": None}
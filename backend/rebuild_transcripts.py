@@ -0,0 +1,41 @@
+"""
+批量重建学生成绩汇总（student_transcript_summary）
+按学号分批，每批一个事务；用于迁移后的补充回填，或调整绩点换算（transcript.GRADE_POINTS）之后
+汇总按选课、登分时的学分增量维护，修改课程学分后须用 --course 重建选了该课程的学生
+
+用法：python rebuild_transcripts.py [每批学生数] [--course 课程号 ...]
+"""
+import argparse
+
+from datastore import DataStore
+
+DEFAULT_BATCH = 500
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量重建学生成绩汇总")
+    parser.add_argument("batch", nargs="?", type=int, default=DEFAULT_BATCH, help="每批学生数")
+    parser.add_argument("--course", type=int, action="append", default=[],
+                        help="只重建选了该课程的学生（修改学分后使用），可重复")
+    args = parser.parse_args()
+    store = DataStore()
+    if args.course:
+        for course_id in args.course:
+            print(f"课程 {course_id}：已重建 {store.rebuild_course_transcripts(course_id, args.batch)} 名学生")
+        return
+
+    after = None
+    total = 0
+    while True:
+        students = store.get_students(after=after, limit=args.batch)
+        if not students:
+            break
+        ids = [s["student_id"] for s in students]
+        total += store.rebuild_transcript_summaries(ids)
+        after = ids[-1]
+        print(f"已重建 {total} 名学生（至学号 {after}）")
+    print(f"完成，共 {total} 名学生")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from blobs import BlobStore
+from uploads import UPLOAD_CHUNK_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：单进程运行，不加文件锁
+    fcntl = None
+
+# 会话在最后一次写入后保留的时间（秒），过期后由清理任务删除
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadSessionError(Exception):
+    """会话操作失败，status_code 为对应的 HTTP 状态码"""
+
+    def __init__(self, status_code: int, message: str, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+# === 断点续传会话 ===
+class UploadSessions:
+    """
+    断点续传的上传会话，保存在本机磁盘：<root>/<id>.json（元数据）和 <id>.part（已收到的字节）
+    - 已收到的字节数即 .part 文件的长度，续传时客户端从该偏移继续，已收到的字节不再重传
+    - 追加写入时对 .part 加文件锁，同一会话的并发请求按偏移校验，不会交错写入
+    - 与 BlobStore 在同一文件系统，完成时直接改名收入存储
+    """
+
+    def __init__(self, blobs: BlobStore, ttl: float = UPLOAD_SESSION_TTL_SECONDS):
+        self.blobs = blobs
+        self.ttl = ttl
+        self.root = os.path.join(blobs.root, "sessions")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, upload_id: str):
+        if not _SESSION_ID.match(upload_id):
+            raise UploadSessionError(404, "上传会话不存在")
+        base = os.path.join(self.root, upload_id)
+        return f"{base}.json", f"{base}.part"
+
+    def _expires_at(self, meta: Dict, stat: os.stat_result) -> float:
+        return max(stat.st_mtime, meta["created_at"]) + self.ttl
+
+    def _progress(self, meta: Dict, part_path: str) -> Dict:
+        stat = os.stat(part_path)
+        return {
+            "upload_id": meta["upload_id"],
+            "assignment_id": meta["assignment_id"],
+            "filename": meta["filename"],
+            "length": meta["length"],
+            "offset": stat.st_size,
+            "expires_at": datetime.fromtimestamp(self._expires_at(meta, stat))
+        }
+
+    def create(self, student_id: int, assignment_id: int, filename: str, length: int) -> Dict:
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        meta = {
+            "upload_id": upload_id,
+            "student_id": student_id,
+            "assignment_id": assignment_id,
+            "filename": filename,
+            "length": length,
+            "created_at": time.time()
+        }
+        open(part_path, "wb").close()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return self._progress(meta, part_path)
+
+    def load(self, upload_id: str, student_id: int) -> Dict:
+        """读取会话元数据；不存在、已过期或不属于该学生时抛出 UploadSessionError"""
+        meta_path, part_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            stat = os.stat(part_path)
+        except FileNotFoundError:
+            raise UploadSessionError(404, "上传会话不存在")
+        if meta["student_id"] != student_id:
+            raise UploadSessionError(404, "上传会话不存在")
+        if self._expires_at(meta, stat) <= time.time():
+            self.remove(upload_id)
+            raise UploadSessionError(410, "上传会话已过期")
+        return meta
+
+    def progress(self, upload_id: str, student_id: int) -> Dict:
+        meta = self.load(upload_id, student_id)
+        return self._progress(meta, self._paths(upload_id)[1])
+
+    async def append(self, upload_id: str, student_id: int, offset: int, body: AsyncIterator[bytes]) -> Dict:
+        """
+        从 offset 处追加请求体，offset 须等于已收到的字节数，否则抛出 409（附当前偏移）
+        连接中途断开时已写入的部分保留，客户端查询进度后续传
+        """
+        meta = await run_in_threadpool(self.load, upload_id, student_id)
+        part_path = self._paths(upload_id)[1]
+        target = await run_in_threadpool(_open_locked, part_path)
+        try:
+            current = await run_in_threadpool(_size, target)
+            if offset != current:
+                raise UploadSessionError(409, "偏移与已接收的字节数不一致", offset=current)
+            remaining = meta["length"] - current
+            buffer = bytearray()
+            try:
+                async for chunk in body:
+                    if len(chunk) > remaining:
+                        buffer += chunk[:remaining]
+                        remaining = 0
+                        raise UploadSessionError(413, "超出创建会话时声明的文件大小")
+                    buffer += chunk
+                    remaining -= len(chunk)
+                    # 攒够一块再写，减少线程切换
+                    if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                        await run_in_threadpool(target.write, bytes(buffer))
+                        buffer.clear()
+            finally:
+                # 包括客户端断开在内，已收到的字节都落盘
+                if buffer:
+                    await run_in_threadpool(target.write, bytes(buffer))
+                await run_in_threadpool(target.flush)
+        finally:
+            await run_in_threadpool(target.close)
+        return self._progress(meta, part_path)
+
+    def finish(self, upload_id: str, student_id: int) -> Dict:
+        """
+        校验已收齐后计算摘要并收入 BlobStore，返回 {"sha256", "size", "created", "meta"}
+        会话文件随之删除；在线程池中调用
+        """
+        meta = self.load(upload_id, student_id)
+        meta_path, part_path = self._paths(upload_id)
+        with _open_locked(part_path) as part:
+            size = _size(part)
+            if size != meta["length"]:
+                raise UploadSessionError(409, "文件尚未上传完整", offset=size)
+            digest = hashlib.sha256()
+            part.seek(0)
+            for chunk in iter(lambda: part.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+            sha256 = digest.hexdigest()
+            created = self.blobs.adopt(part_path, sha256)
+        os.remove(meta_path)
+        return {"sha256": sha256, "size": size, "created": created, "meta": meta}
+
+    def remove(self, upload_id: str) -> None:
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self) -> int:
+        """删除过期（最后一次写入超过 ttl）的会话，返回删除数"""
+        last_activity: Dict[str, float] = {}
+        for entry in os.scandir(self.root):
+            upload_id, ext = os.path.splitext(entry.name)
+            if ext not in (".json", ".part") or not _SESSION_ID.match(upload_id):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            last_activity[upload_id] = max(mtime, last_activity.get(upload_id, 0))
+        now = time.time()
+        expired = [upload_id for upload_id, last in last_activity.items() if now - last >= self.ttl]
+        for upload_id in expired:
+            self.remove(upload_id)
+        return len(expired)
+
+
+def _open_locked(path: str):
+    """
+    以追加方式打开 .part 并加排他锁，关闭时释放
+    已有请求在写（例如客户端断线重连时旧连接尚未结束）时不等待，直接返回 409
+    """
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise UploadSessionError(404, "上传会话不存在")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            size = _size(f)
+            f.close()
+            raise UploadSessionError(409, "该上传会话正在写入，请稍后重试", offset=size)
+    f.seek(0, os.SEEK_END)
+    return f
+
+
+def _size(f) -> int:
+    return os.fstat(f.fileno()).st_size
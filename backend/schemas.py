@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from fastapi import UploadFile, File
@@ -7,6 +7,10 @@ from fastapi import UploadFile, File
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class UserBase(BaseModel):
     username: str
@@ -84,13 +88,24 @@ class AssignmentBase(BaseModel):
     content: str
     deadline: datetime
     status: str
+    # 提交文件大小上限（字节），为空时使用系统默认值
+    max_upload_bytes: Optional[int] = None
 
 class AssignmentCreate(AssignmentBase):
     teacher_id: int
+    course_id: Optional[int] = None
+
+class CourseAssignmentCreate(AssignmentBase):
+    pass
 
 class AssignmentOut(AssignmentBase):
     assignment_id: int
     teacher_id: int
+    course_id: Optional[int] = None
+
+# 修改作业所属课程（补充迁移前无法回填课程的作业）
+class AssignmentCourseUpdate(BaseModel):
+    course_id: int
 
 class SubmissionBase(BaseModel):
     student_id: int
@@ -104,6 +119,27 @@ class SubmissionOut(SubmissionBase):
     submission_id: int
     file_path: str
 
+# 短期有效的文件签名链接，浏览器直接打开，由反向代理校验后发送
+class SignedFileLink(BaseModel):
+    url: str
+    expires_at: datetime
+
+# === 断点续传 ===
+class UploadSessionCreate(BaseModel):
+    assignment_id: int
+    filename: str
+    # 文件总字节数
+    length: int = Field(..., ge=0)
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    assignment_id: int
+    filename: str
+    length: int
+    # 已接收的字节数，续传从这里开始
+    offset: int
+    expires_at: datetime
+
 class ClassBase(BaseModel):
     class_name: str
     grade: str
@@ -130,4 +166,58 @@ class PermissionAssign(BaseModel):
     permission_id: int
 
 class GradeUpdate(BaseModel):
-    grade: float
\ No newline at end of file
+    grade: float
+
+# === 课程成绩统计 ===
+class GradeHistogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+class GradeRanking(BaseModel):
+    # 按名次排序的三个等长列表
+    student_id: List[int]
+    grade: List[float]
+    rank: List[int]
+
+class CourseGradeStats(BaseModel):
+    course_id: int
+    enrolled: int
+    graded: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    pass_rate: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+    histogram: GradeHistogram
+    ranking: GradeRanking
+
+class TranscriptSummaryOut(BaseModel):
+    student_id: int
+    course_count: int
+    graded_credits: int
+    earned_credits: int
+    # 学分加权绩点（4.0 制），尚无成绩时为空
+    gpa: Optional[float] = None
+
+# === 游标分页响应 ===
+class StudentPage(BaseModel):
+    items: List[StudentOut]
+    next_cursor: Optional[str] = None
+
+class TeacherPage(BaseModel):
+    items: List[TeacherOutBase]
+    next_cursor: Optional[str] = None
+
+class CoursePage(BaseModel):
+    items: List[CourseOut]
+    next_cursor: Optional[str] = None
+
+class AssignmentPage(BaseModel):
+    items: List[AssignmentOut]
+    next_cursor: Optional[str] = None
+
+class SubmissionPage(BaseModel):
+    items: List[SubmissionOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,114 @@
+import json
+import os
+import typing
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库
+    orjson = None
+
+# 列表接口的快速序列化：跳过 response_model 的逐行校验，直接编码
+# DataStore 返回的数据来自数据库中类型确定的列，无需再次校验
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# === 按响应模型裁剪字段 ===
+def _model_fields(model) -> typing.Dict[str, Any]:
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:
+        return {name: field.annotation for name, field in fields.items()}
+    # pydantic v1
+    return {name: field.outer_type_ for name, field in model.__fields__.items()}
+
+
+def _is_model(tp) -> bool:
+    return isinstance(tp, type) and issubclass(tp, BaseModel)
+
+
+def _converter(tp) -> Callable[[Any], Any]:
+    """按类型注解生成转换函数：模型裁剪为声明的字段，其他值原样返回"""
+    origin = typing.get_origin(tp)
+    if origin is typing.Union:
+        args = [a for a in typing.get_args(tp) if a is not type(None)]
+        if len(args) == 1:
+            inner = _converter(args[0])
+            if inner is None:
+                # Optional[标量] 无需转换，按普通字段原样输出
+                return None
+            return lambda v: None if v is None else inner(v)
+        return lambda v: v
+    if origin in (list, typing.List):
+        args = typing.get_args(tp)
+        inner = _converter(args[0]) if args else None
+        if inner is None:
+            return lambda v: v
+        return lambda v: [inner(item) for item in v]
+    if _is_model(tp):
+        project = projector(tp)
+        return lambda v: None if v is None else project(v)
+    return None
+
+
+@lru_cache(maxsize=None)
+def projector(model) -> Callable[[Any], Any]:
+    """
+    返回把 dict 裁剪为 model 声明字段的函数，等价于 response_model 的字段过滤，但不做校验
+    嵌套模型、List[模型]、Optional[模型] 递归处理
+    """
+    plain = []
+    nested = []
+    for name, tp in _model_fields(model).items():
+        convert = _converter(tp)
+        if convert is None:
+            plain.append(name)
+        else:
+            nested.append((name, convert))
+
+    if not nested:
+        return lambda row: {name: row.get(name) for name in plain}
+
+    def project(row):
+        out = {name: row.get(name) for name in plain}
+        for name, convert in nested:
+            out[name] = convert(row.get(name))
+        return out
+
+    return project
+
+
+def fast_json(model, content: Any):
+    """
+    列表接口的返回值
+    - FAST_JSON 开启时按 model 裁剪字段后直接编码返回，response_model 仅用于生成文档
+    - 关闭时原样返回，由 FastAPI 按 response_model 校验和序列化
+    model 可以是响应模型或 List[响应模型]
+    """
+    if not FAST_JSON:
+        return content
+    convert = _converter(model) or (lambda v: v)
+    return FastJSONResponse(convert(content))
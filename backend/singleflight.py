@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from cache import copy_result
+
+
+# === 相同读请求合并（single-flight） ===
+class _Call:
+    """同步调用的进行中记录，跟随者在 done 上等待"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    同一方法、同一参数的并发读调用只执行一次，其余调用等待并共享结果
+    记录每个方法实际执行的次数（leaders）和合并掉的等待者数（coalesced）
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    def _record(self, name: str, leader: bool) -> None:
+        # 调用方需持有 self._lock
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = {"leaders": 0, "coalesced": 0}
+        m["leaders" if leader else "coalesced"] += 1
+
+    async def run_async(self, key: Hashable, start: Callable[[], Any]) -> Any:
+        with self._lock:
+            task = self._calls.get(key)
+            leader = task is None
+            if leader:
+                # 独立任务执行，发起者被取消时不影响其他等待者
+                task = self._calls[key] = asyncio.ensure_future(start())
+                task.add_done_callback(functools.partial(self._finish_async, key))
+            self._record(key[0], leader)
+        return copy_result(await asyncio.shield(task))
+
+    def _finish_async(self, key: Hashable, task: asyncio.Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+        # 所有等待者都已取消时，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def run(self, key: Hashable, start: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._record(key[0], leader)
+        if leader:
+            try:
+                call.result = start()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy_result(call.result)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            leaders = sum(m["leaders"] for m in self._metrics.values())
+            coalesced = sum(m["coalesced"] for m in self._metrics.values())
+            return {
+                "in_flight": len(self._calls),
+                "leaders": leaders,
+                "coalesced": coalesced,
+                # 合并掉的调用占全部调用的比例，即省下的数据库查询比例
+                "saved_ratio": coalesced / (leaders + coalesced) if leaders + coalesced else 0.0,
+                "methods": {name: dict(m) for name, m in self._metrics.items()}
+            }
+
+
+def coalesced(fn: Callable) -> Callable:
+    """
+    DataStore 读方法的合并装饰器
+    - 键为方法名和除 db 外的参数
+    - 合并后的调用使用自己的只读会话（db=None），因此只在调用方未传会话、
+      或传入的是未写入的只读会话时合并；写事务中的读、以及处于写后读主库
+      窗口内的用户的读照常执行
+    - 要求读主库的会话（info["primary"]，如计算 ETag 的请求）同样不合并，合并后的调用可能读副本
+    同步方法和 async 方法均可使用
+    """
+    signature = inspect.signature(fn)
+
+    def prepare(self, args, kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        db = bound.arguments.get("db")
+        if db is not None and (
+            not db.info.get("readonly") or db.info.get("touched") or db.info.get("primary")
+            or self.read_router.is_sticky(db.info.get("route_key"))
+        ):
+            return None, None
+        key = (fn.__name__,) + tuple(
+            value for name, value in bound.arguments.items() if name not in ("self", "db")
+        )
+        bound.arguments["db"] = None
+        return key, bound
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            key, bound = prepare(self, args, kwargs)
+            if key is None:
+                return await fn(self, *args, **kwargs)
+            return await self.single_flight.run_async(key, lambda: fn(*bound.args, **bound.kwargs))
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        key, bound = prepare(self, args, kwargs)
+        if key is None or self.single_flight is None:
+            return fn(self, *args, **kwargs)
+        return self.single_flight.run(key, lambda: fn(*bound.args, **bound.kwargs))
+    # AsyncDataStore 据此在事件循环上合并（同步的 run 会阻塞事件循环），此时内层的 single_flight 为 None
+    wrapper.coalesce_key = prepare
+    return wrapper
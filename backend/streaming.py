@@ -0,0 +1,46 @@
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# 攒够该行数再写出一次，减少小包发送
+NDJSON_LINES_PER_CHUNK = 200
+
+# 路由装饰器中声明，OpenAPI 文档里列出流式响应类型
+NDJSON_RESPONSES = {200: {"content": {NDJSON_MEDIA_TYPE: {}}}}
+
+
+# === NDJSON 流式响应 ===
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    """?stream=true 或 Accept: application/x-ndjson 时使用流式响应"""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+async def _ndjson_chunks(rows: AsyncIterator[Dict], transform: Optional[Callable[[Dict], Dict]]):
+    lines = []
+    async for row in rows:
+        if transform is not None:
+            row = transform(row)
+        lines.append(json.dumps(row, ensure_ascii=False, default=_default))
+        if len(lines) >= NDJSON_LINES_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode()
+            lines.clear()
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def ndjson_response(rows: AsyncIterator[Dict], transform: Optional[Callable[[Dict], Dict]] = None) -> StreamingResponse:
+    """
+    逐行写出 JSON（每行一个对象），不在内存中组装整个响应
+    transform 用于对每行做与普通响应相同的后处理
+    """
+    return StreamingResponse(_ndjson_chunks(rows, transform), media_type=NDJSON_MEDIA_TYPE)
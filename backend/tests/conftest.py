@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+# 测试使用临时目录中的 SQLite，须在导入 db 模块之前设置
+_tmp = tempfile.mkdtemp(prefix="course-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# DataStore 在当前目录下创建 uploads 目录
+os.chdir(_tmp)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from db import Base, engine
+    import main
+    Base.metadata.create_all(engine)
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as c:
+        yield c
+
+
+def _unique() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@pytest.fixture
+def make_teacher(client):
+    """创建教师并登录，返回 (教师信息, 认证请求头)"""
+
+    def make():
+        name = _unique()
+        teacher = client.post("/tea/teachers/", json={
+            "title": "讲师", "department": "计算机",
+            "user": {"username": name, "password": "p", "email": f"{name}@example.com"}
+        }).json()
+        token = client.post("/token", data={"username": name, "password": "p"}).json()["access_token"]
+        return teacher, {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def make_student(client):
+    """创建学生并登录，返回 (学生信息, 认证请求头)"""
+
+    def make():
+        name = _unique()
+        student = client.post("/stu/students/", json={
+            "grade": "2021", "major": "计算机",
+            "user": {"username": name, "password": "p", "email": f"{name}@example.com"}
+        }).json()
+        token = client.post("/token", data={"username": name, "password": "p"}).json()["access_token"]
+        return student, {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def make_submission(client, make_teacher, make_student):
+    """教师发布作业、学生提交文件，返回 (提交信息, 学生认证请求头)"""
+
+    def make(data: bytes, filename: str = "report.pdf"):
+        teacher, headers = make_teacher()
+        client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=headers)
+        assignment = client.post("/assign/assignments/", json={
+            "content": "实验", "deadline": (datetime.utcnow() + timedelta(days=7)).isoformat(), "status": "open",
+            "teacher_id": teacher["teacher_id"]
+        }, headers=headers).json()
+        _, student_headers = make_student()
+        submission = client.post(f"/assign/assignments/{assignment['assignment_id']}/submit",
+                                 files={"file": (filename, data)}, headers=student_headers).json()
+        return submission, student_headers
+
+    return make
@@ -0,0 +1,23 @@
+import numpy as np
+
+from analytics import course_grade_stats, grade_stats
+
+
+def test_percentile_keys_match_requested_values():
+    stats = grade_stats(np.array([1, 2, 3, 4]), np.array([60.0, 70.0, 80.0, 90.0]), [50.0, 12.5, 90])
+    assert list(stats["percentiles"]) == ["50", "12.5", "90"]
+    assert stats["percentiles"]["50"] == 75.0
+
+
+def test_percentile_keys_without_grades():
+    stats = course_grade_stats({"course_id": [], "student_id": [], "grade": []}, [1], [25.0, 99.9])[1]
+    assert stats["percentiles"] == {"25": None, "99.9": None}
+
+
+def test_grade_stats_endpoint_uses_integer_keys(client, make_teacher):
+    _, headers = make_teacher()
+    course = client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=headers).json()
+    response = client.get(f"/course/courses/{course['course_id']}/grade-stats",
+                          params={"percentiles": [50, 12.5]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["percentiles"] == {"50": None, "12.5": None}
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from db import SessionLocal
+from models import Assignment
+
+DEADLINE = (datetime.utcnow() + timedelta(days=7)).isoformat()
+
+
+def _create_course(client, headers, name):
+    return client.post("/course/courses/", json={"course_name": name, "credit": 3}, headers=headers).json()
+
+
+def _assignment(teacher, **extra):
+    return {"content": "实验", "deadline": DEADLINE, "status": "open", "teacher_id": teacher["teacher_id"], **extra}
+
+
+def _insert_unassigned(teacher_id):
+    # 模拟迁移 0003 未能回填的作业
+    with SessionLocal() as db:
+        row = Assignment(content="旧作业", deadline=datetime.utcnow(), status="open", teacher_id=teacher_id)
+        db.add(row)
+        db.commit()
+        return row.assignment_id
+
+
+def test_create_infers_only_course_and_requires_choice_otherwise(client, make_teacher):
+    teacher, headers = make_teacher()
+    assert client.post("/assign/assignments/", json=_assignment(teacher), headers=headers).status_code == 400
+
+    course = _create_course(client, headers, "数据库")
+    created = client.post("/assign/assignments/", json=_assignment(teacher), headers=headers)
+    assert created.status_code == 200
+    assert created.json()["course_id"] == course["course_id"]
+
+    _create_course(client, headers, "操作系统")
+    assert client.post("/assign/assignments/", json=_assignment(teacher), headers=headers).status_code == 400
+
+
+def test_teacher_assigns_course_to_unassigned_assignment(client, make_teacher):
+    teacher, headers = make_teacher()
+    course = _create_course(client, headers, "数据库")
+    assignment_id = _insert_unassigned(teacher["teacher_id"])
+
+    unassigned = client.get("/assign/assignments/unassigned", headers=headers).json()
+    assert [a["assignment_id"] for a in unassigned] == [assignment_id]
+
+    response = client.patch(f"/assign/assignments/{assignment_id}/course",
+                            json={"course_id": course["course_id"]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["course_id"] == course["course_id"]
+    assert client.get("/assign/assignments/unassigned", headers=headers).json() == []
+
+
+def test_cannot_assign_foreign_assignment_or_course(client, make_teacher):
+    owner, owner_headers = make_teacher()
+    other, other_headers = make_teacher()
+    own_course = _create_course(client, owner_headers, "数据库")
+    other_course = _create_course(client, other_headers, "编译原理")
+    assignment_id = _insert_unassigned(owner["teacher_id"])
+
+    # 不能把作业归入自己未教授的课程
+    response = client.patch(f"/assign/assignments/{assignment_id}/course",
+                            json={"course_id": other_course["course_id"]}, headers=owner_headers)
+    assert response.status_code == 403
+    # 不能修改其他教师的作业
+    response = client.patch(f"/assign/assignments/{assignment_id}/course",
+                            json={"course_id": other_course["course_id"]}, headers=other_headers)
+    assert response.status_code == 404
+    assert client.get("/assign/assignments/unassigned", headers=owner_headers).json()[0]["course_id"] is None
+    assert own_course["course_id"] != other_course["course_id"]
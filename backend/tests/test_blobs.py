@@ -0,0 +1,108 @@
+import io
+import logging
+import os
+
+import pytest
+
+from blobs import make_ref
+from models import BlobRef
+from uploads import store_upload
+
+
+@pytest.fixture
+def store(app):
+    from datastore import DataStore
+    return DataStore()
+
+
+def _refcount(store, digest):
+    with store.get_db_session() as db:
+        row = db.query(BlobRef.refcount, BlobRef.released_at).filter(BlobRef.digest == digest).first()
+        return row and (row.refcount, row.released_at is not None)
+
+
+def test_refcount_increment_release_and_collect(store):
+    info = store_upload(io.BytesIO(os.urandom(64)), store.blob_store)
+    digest = info["sha256"]
+    for _ in range(2):
+        with store.unit_of_work() as db:
+            store._ref_blob(db, digest, info["size"])
+    assert _refcount(store, digest) == (2, False)
+
+    with store.unit_of_work() as db:
+        store._release_blobs(db, [make_ref(digest, "a.txt"), "uploads/legacy.txt"])
+    assert _refcount(store, digest) == (1, False)
+    assert store.collect_blobs([digest], grace=0) == 0
+    assert os.path.exists(store.blob_store.path(digest))
+
+    with store.unit_of_work() as db:
+        store._release_blobs(db, [make_ref(digest, "b.txt")])
+    assert _refcount(store, digest) == (0, True)
+    assert store.collect_blobs([digest], grace=0) == 1
+    assert _refcount(store, digest) is None
+    assert not os.path.exists(store.blob_store.path(digest))
+
+
+def test_reference_after_release_clears_released_at(store):
+    info = store_upload(io.BytesIO(os.urandom(64)), store.blob_store)
+    digest = info["sha256"]
+    with store.unit_of_work() as db:
+        store._ref_blob(db, digest, info["size"])
+    with store.unit_of_work() as db:
+        store._release_blobs(db, [make_ref(digest, "a.txt")])
+    with store.unit_of_work() as db:
+        store._ref_blob(db, digest, info["size"])
+    assert _refcount(store, digest) == (1, False)
+    assert store.collect_blobs([digest], grace=0) == 0
+
+
+def test_recent_blob_survives_collect(store):
+    info = store_upload(io.BytesIO(os.urandom(64)), store.blob_store)
+    digest = info["sha256"]
+    with store.unit_of_work() as db:
+        store._ref_blob(db, digest, info["size"])
+        store._release_blobs(db, [make_ref(digest, "a.txt")])
+    assert store.collect_blobs([digest]) == 0
+    assert os.path.exists(store.blob_store.path(digest))
+
+
+def test_collect_script_exit_code(app, monkeypatch, caplog):
+    import collect_blobs
+    assert collect_blobs.main() == 0
+
+    def fail(store):
+        raise OSError("磁盘错误")
+
+    monkeypatch.setattr(collect_blobs, "collect_orphans", fail)
+    with caplog.at_level(logging.INFO, logger="collect_blobs"):
+        assert collect_blobs.main() == 1
+    assert "清理失败" in caplog.text
+    assert "过期上传会话" in caplog.text
+
+
+def test_sweep_selects_by_released_at(store):
+    from sqlalchemy import event
+    from db import engine
+    info = store_upload(io.BytesIO(os.urandom(64)), store.blob_store)
+    digest = info["sha256"]
+    with store.unit_of_work() as db:
+        store._ref_blob(db, digest, info["size"])
+        store._release_blobs(db, [make_ref(digest, "a.txt")])
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        # 刚归零的不在定期清理的候选中
+        assert store.collect_blobs(grace=3600) == 0
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    select = next(s for s in statements if s.lstrip().upper().startswith("SELECT"))
+    # 候选按 released_at 索引查找，不按无索引的 refcount 筛选
+    assert "released_at <" in select and "refcount" not in select
+    assert _refcount(store, digest) == (0, True)
+    assert store.collect_blobs(grace=0) >= 1
+    assert _refcount(store, digest) is None
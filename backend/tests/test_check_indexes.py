@@ -0,0 +1,16 @@
+import inspect
+
+from check_indexes import FULL_SCANS, NO_QUERY, read_checks, write_checks
+from datastore import DataStore
+
+
+def test_every_public_method_is_checked():
+    # 只取名称，不执行检查
+    names = [name for name, _ in read_checks(None) + write_checks(None)]
+    assert len(names) == len(set(names))
+    public = {name for name, _ in inspect.getmembers(DataStore, inspect.isfunction) if not name.startswith("_")}
+    checked = {name for name in names if not name.startswith("_")}
+    # 新增的 DataStore 方法须在 check_indexes.py 中登记
+    assert public - NO_QUERY == checked
+    assert FULL_SCANS <= checked
+    assert not NO_QUERY & checked
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from conditional import make_etag
+from datastore import DataStore
+from db import Base, make_engine
+from schemas import AssignmentCreate, CourseCreate, TeacherCreate, UserCreate
+
+
+def test_etag_changes_with_version_stamp_and_parameters():
+    assert make_etag(("e", 1), None, 20) == make_etag(("e", 1), None, 20)
+    assert make_etag(("e", 1), None, 20) != make_etag(("e", 2), None, 20)
+    assert make_etag(("e", 1), None, 20) != make_etag(("e", 1), "cursor", 20)
+    assert make_etag(("e", 1)).startswith('W/"')
+
+
+def test_stamped_request_reads_primary(tmp_path):
+    primary = make_engine(f"sqlite:///{tmp_path}/primary.db")
+    replica = make_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(primary)
+    # 副本不再同步，模拟复制延迟
+    Base.metadata.create_all(replica)
+    store = DataStore(primary, [replica])
+    teacher = store.create_teacher(TeacherCreate(
+        title="讲师", department="计算机", user=UserCreate(username="t", password="p", email="t@example.com")
+    ))
+    store.create_course(CourseCreate(course_name="数据库", credit=4), teacher["teacher_id"])
+    before = store.get_version_stamp("assignment")
+    store.create_assignment(AssignmentCreate(
+        content="实验一", deadline=datetime(2024, 6, 1), status="open", teacher_id=teacher["teacher_id"]
+    ))
+    assert store.get_version_stamp("assignment") != before
+
+    with store.get_db_session() as db:
+        assert store.get_assignments(db=db) == []
+    with store.get_db_session() as db:
+        store.get_version_stamp("assignment", db=db)
+        assert [a["content"] for a in store.get_assignments(db=db)] == ["实验一"]
+    assert [a["content"] for a in store.iter_assignments(primary=True)] == ["实验一"]
+
+
+def test_my_submissions_etag_is_per_student(client, make_student):
+    _, first = make_student()
+    _, second = make_student()
+    # 两个学生都没有提交，版本计数相同
+    response = client.get("/files/submissions/my", headers=first)
+    etag = response.headers["etag"]
+    assert "Authorization" in response.headers["vary"]
+    assert client.get("/files/submissions/my", headers={**first, "If-None-Match": etag}).status_code == 304
+
+    response = client.get("/files/submissions/my", headers={**second, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from delivery import FileDelivery
+
+
+def test_signed_mode_requires_secret(tmp_path):
+    with pytest.raises(RuntimeError):
+        FileDelivery(str(tmp_path), None, mode="signed")
+    with pytest.raises(RuntimeError):
+        FileDelivery(str(tmp_path), "", mode="signed")
+
+
+def test_no_secret_disables_signed_links(tmp_path):
+    delivery = FileDelivery(str(tmp_path), None, mode="app")
+    assert not delivery.can_sign
+    assert not delivery.verify("blobs/ab", "a.txt", False, int(time.time()) + 60, "")
+
+
+def test_signature_roundtrip(tmp_path):
+    delivery = FileDelivery(str(tmp_path), "secret", mode="app")
+    path = tmp_path / "blobs" / "ab"
+    url, _ = delivery.signed_url(str(path), "a.txt")
+    query = dict(part.split("=", 1) for part in url.split("?", 1)[1].split("&"))
+    expires = int(query["expires"])
+    assert delivery.verify("blobs/ab", "a.txt", False, expires, query["sig"])
+    assert not delivery.verify("blobs/ab", "b.txt", False, expires, query["sig"])
+    assert not delivery.verify("blobs/ab", "a.txt", True, expires, query["sig"])
+    assert not FileDelivery(str(tmp_path), "other", mode="app").verify("blobs/ab", "a.txt", False, expires, query["sig"])
+    assert not delivery.verify("blobs/ab", "a.txt", False, int(time.time()) - 1, query["sig"])
+
+
+def test_link_endpoint(client, make_submission, monkeypatch):
+    import main
+    submission, headers = make_submission(b"hello", "a.txt")
+    link = f"/files/submissions/{submission['submission_id']}/link"
+    assert client.get(link, headers=headers).status_code == 404
+
+    monkeypatch.setattr(main, "file_delivery", FileDelivery(main.data_store.upload_dir, "secret", mode="app"))
+    response = client.get(link, headers=headers)
+    assert response.status_code == 200
+    url = response.json()["url"]
+    assert client.get(url).content == b"hello"
+    assert client.get(url.replace("sig=", "sig=x")).status_code == 403
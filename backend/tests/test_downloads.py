@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from downloads import MAX_RANGES, parse_ranges
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-9", [(0, 9)]),
+    ("bytes=90-", [(90, 99)]),
+    ("bytes=-10", [(90, 99)]),
+    ("bytes=-200", [(0, 99)]),
+    ("bytes=50-500", [(50, 99)]),
+    ("bytes=0-9, 5-19, 30-39", [(0, 19), (30, 39)]),
+    ("bytes=20-29,10-19", [(10, 29)]),
+    ("bytes=0-9,200-300", [(0, 9)]),
+    ("bytes=100-", []),
+    ("bytes=-0", []),
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+    ("bytes=-", None),
+    ("bytes=a-b", None),
+    ("bytes=" + ",".join(f"{i}-{i}" for i in range(MAX_RANGES + 1)), None),
+])
+def test_parse_ranges(header, expected):
+    assert parse_ranges(header, 100) == expected
+
+
+@pytest.fixture
+def download(client, make_submission):
+    data = os.urandom(1000)
+    submission, headers = make_submission(data)
+    url = f"/files/submissions/download/{submission['submission_id']}"
+    return data, url, headers
+
+
+def test_full_download(client, download):
+    data, url, headers = download
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_single_range(client, download):
+    data, url, headers = download
+    response = client.get(url, headers={**headers, "Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 100-199/1000"
+    assert response.content == data[100:200]
+
+
+def test_multiple_ranges(client, download):
+    data, url, headers = download
+    response = client.get(url, headers={**headers, "Range": "bytes=0-9,-10"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    body = response.content
+    assert data[:10] in body and data[-10:] in body
+    assert b"Content-Range: bytes 0-9/1000" in body
+    assert b"Content-Range: bytes 990-999/1000" in body
+    assert int(response.headers["content-length"]) == len(body)
+
+
+def test_unsatisfiable_range(client, download):
+    _, url, headers = download
+    response = client.get(url, headers={**headers, "Range": "bytes=1000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1000"
+
+
+def test_if_range_mismatch_sends_whole_file(client, download):
+    data, url, headers = download
+    response = client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == data
+
+    etag = response.headers["etag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+    response = client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, paginate
+
+
+@pytest.mark.parametrize("values,types", [
+    ([42], (int,)),
+    ([datetime(2024, 6, 1, 8, 30, 15, 123456), 7], (datetime, int)),
+    (["2021", 3], (str, int)),
+])
+def test_cursor_roundtrip(values, types):
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, types) == values
+
+
+@pytest.mark.parametrize("cursor,types", [
+    ("!!!", (int,)),
+    (encode_cursor([1, 2]), (int,)),
+    (encode_cursor({"v": 1}), (int,)),
+    (encode_cursor(["x"]), (int,)),
+    (encode_cursor(["not a date", 1]), (datetime, int)),
+    ("bm90IGpzb24", (int,)),
+])
+def test_invalid_cursor(cursor, types):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, types)
+
+
+def test_paginate():
+    rows = [{"id": i} for i in range(1, 5)]
+    page = paginate(rows, 3, key=lambda r: (r["id"],))
+    assert page["items"] == rows[:3]
+    assert decode_cursor(page["next_cursor"], (int,)) == [3]
+    assert paginate(rows, 4, key=lambda r: (r["id"],)) == {"items": rows, "next_cursor": None}
+
+
+def test_course_pages_cover_every_course(client, make_teacher):
+    _, headers = make_teacher()
+    created = {client.post("/course/courses/", json={"course_name": f"课程{i}", "credit": 2},
+                           headers=headers).json()["course_id"] for i in range(5)}
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/course/courses/", params=params).json()
+        seen += [c["course_id"] for c in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen))
+    assert created <= set(seen)
+    assert client.get("/course/courses/", params={"cursor": "!!!"}).status_code == 400
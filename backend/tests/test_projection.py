@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from db import Base, SessionLocal
+
+
+@pytest.fixture
+def store(app):
+    from datastore import DataStore
+    return DataStore()
+
+
+def test_single_row_getters_do_not_load_entities(client, store, make_teacher, make_student):
+    teacher, headers = make_teacher()
+    student, student_headers = make_student()
+    course = client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=headers).json()
+    assignment = client.post("/assign/assignments/", json={
+        "content": "实验", "deadline": (datetime.utcnow() + timedelta(days=7)).isoformat(), "status": "open",
+        "teacher_id": teacher["teacher_id"]
+    }, headers=headers).json()
+    submission = client.post(f"/assign/assignments/{assignment['assignment_id']}/submit",
+                             files={"file": ("a.txt", b"x")}, headers=student_headers).json()
+    class_ = client.post("/classes/", json={"class_name": "一班", "grade": "2021"}).json()
+    student_user_id = store.get_student(student["student_id"])["user_id"]
+    teacher_user_id = store.get_teacher(teacher["teacher_id"])["user_id"]
+    user = store.get_user_by_id(student_user_id)
+
+    getters = [
+        (store.get_user, user["username"]),
+        (store.get_user_by_id, user["user_id"]),
+        (store.get_student, student["student_id"]),
+        (store.get_student_by_user_id, student_user_id),
+        (store.get_teacher, teacher["teacher_id"]),
+        (store.get_teacher_by_user_id, teacher_user_id),
+        (store.get_course, course["course_id"]),
+        (store.get_class, class_["class_id"]),
+        (store.get_assignment, assignment["assignment_id"]),
+        (store.get_submission_by_id, submission["submission_id"]),
+    ]
+    # 列投影直接返回行元组，不构造 ORM 实体
+    loaded = []
+
+    def on_load(target, context):
+        loaded.append(type(target).__name__)
+
+    event.listen(Base, "load", on_load, propagate=True)
+    try:
+        with SessionLocal() as db:
+            for getter, key in getters:
+                assert getter(key, db=db) is not None, getter.__name__
+    finally:
+        event.remove(Base, "load", on_load)
+    assert loaded == []
@@ -0,0 +1,58 @@
+import pytest
+
+import cache
+from cache import QueryCache, TableVersions, make_table_versions
+from datastore import DataStore
+from db import Base, make_engine
+from schemas import CourseCreate, TeacherCreate, UserCreate
+
+
+def test_entry_invalidated_by_version_bump():
+    qc = QueryCache(TableVersions())
+    hit, _, versions = qc.lookup(("k",), ["course"])
+    assert not hit
+    qc.store(("k",), versions, [{"a": 1}])
+    assert qc.lookup(("k",), ["course"])[:2] == (True, [{"a": 1}])
+    qc.versions.bump("course")
+    assert not qc.lookup(("k",), ["course"])[0]
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    qc = QueryCache(TableVersions(), ttl=10)
+    _, _, versions = qc.lookup(("k",), ["course"])
+    qc.store(("k",), versions, 1)
+    now[0] += 9
+    assert qc.lookup(("k",), ["course"])[0]
+    now[0] += 2
+    assert not qc.lookup(("k",), ["course"])[0]
+    assert qc.stats()["stale"] == 1
+
+
+def test_multiple_workers_require_shared_versions(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(cache, "QUERY_CACHE_VERSIONS_PATH", "")
+    with pytest.raises(RuntimeError):
+        make_table_versions()
+    monkeypatch.setattr(cache, "QUERY_CACHE_VERSIONS_PATH", str(tmp_path / "versions.db"))
+    assert make_table_versions().epoch == "shared"
+
+
+def test_cache_fill_reads_primary_not_lagging_replica(tmp_path):
+    primary = make_engine(f"sqlite:///{tmp_path}/primary.db")
+    replica = make_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(primary)
+    # 副本建表后不再同步，模拟复制延迟
+    Base.metadata.create_all(replica)
+    store = DataStore(primary, [replica])
+    teacher = store.create_teacher(TeacherCreate(
+        title="讲师", department="计算机", user=UserCreate(username="t", password="p", email="t@example.com")
+    ))
+    store.create_course(CourseCreate(course_name="数据库", credit=4), teacher["teacher_id"])
+
+    # 未缓存的读走副本，读不到刚提交的数据
+    assert store.get_course_students(1) == []
+    # 缓存填充读主库
+    assert [c["course_name"] for c in store.get_courses()] == ["数据库"]
+    assert store.get_course(1)["course_name"] == "数据库"
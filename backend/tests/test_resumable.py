@@ -0,0 +1,124 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from blobs import BlobStore
+from resumable import UploadSessionError, UploadSessions
+
+LIMIT = 4096
+
+
+@pytest.fixture
+def assignment_id(client, make_teacher):
+    teacher, headers = make_teacher()
+    client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=headers)
+    return client.post("/assign/assignments/", json={
+        "content": "实验", "deadline": (datetime.utcnow() + timedelta(days=7)).isoformat(), "status": "open",
+        "teacher_id": teacher["teacher_id"], "max_upload_bytes": LIMIT
+    }, headers=headers).json()["assignment_id"]
+
+
+def _create(client, headers, assignment_id, length, filename="report.pdf"):
+    return client.post("/files/uploads", json={
+        "assignment_id": assignment_id, "filename": filename, "length": length
+    }, headers=headers)
+
+
+def _patch(client, headers, upload_id, offset, data):
+    return client.patch(f"/files/uploads/{upload_id}", content=data,
+                        headers={**headers, "Upload-Offset": str(offset)})
+
+
+def test_resume_from_offset_and_finalize(client, make_student, assignment_id):
+    _, headers = make_student()
+    data = os.urandom(3000)
+    session = _create(client, headers, assignment_id, len(data))
+    assert session.status_code == 201
+    upload_id = session.json()["upload_id"]
+    assert session.json()["offset"] == 0
+
+    response = _patch(client, headers, upload_id, 0, data[:1000])
+    assert response.status_code == 200
+    assert response.headers["upload-offset"] == "1000"
+
+    # 断线重连后查询进度，从服务端偏移继续
+    progress = client.get(f"/files/uploads/{upload_id}", headers=headers)
+    assert progress.json()["offset"] == 1000
+    assert _patch(client, headers, upload_id, 1000, data[1000:]).json()["offset"] == len(data)
+
+    submission = client.post(f"/files/uploads/{upload_id}/finalize", headers=headers)
+    assert submission.status_code == 200
+    import main
+    digest = hashlib.sha256(data).hexdigest()
+    with open(main.data_store.blob_store.path(digest), "rb") as f:
+        assert f.read() == data
+    assert client.get(f"/files/uploads/{upload_id}", headers=headers).status_code == 404
+
+
+def test_offset_mismatch_returns_409_with_current_offset(client, make_student, assignment_id):
+    _, headers = make_student()
+    upload_id = _create(client, headers, assignment_id, 100).json()["upload_id"]
+    _patch(client, headers, upload_id, 0, b"x" * 40)
+
+    for offset in (0, 60):
+        response = _patch(client, headers, upload_id, offset, b"y" * 10)
+        assert response.status_code == 409
+        assert response.headers["upload-offset"] == "40"
+    assert client.get(f"/files/uploads/{upload_id}", headers=headers).json()["offset"] == 40
+
+    response = client.post(f"/files/uploads/{upload_id}/finalize", headers=headers)
+    assert response.status_code == 409
+    assert response.headers["upload-offset"] == "40"
+
+
+def test_length_limits_return_413(client, make_student, assignment_id):
+    _, headers = make_student()
+    assert _create(client, headers, assignment_id, LIMIT + 1).status_code == 413
+
+    upload_id = _create(client, headers, assignment_id, 100).json()["upload_id"]
+    assert _patch(client, headers, upload_id, 0, b"x" * 101).status_code == 413
+    # 声明长度之内的部分保留
+    assert client.get(f"/files/uploads/{upload_id}", headers=headers).json()["offset"] == 100
+
+
+def test_session_belongs_to_its_student(client, make_student, assignment_id):
+    _, owner = make_student()
+    _, other = make_student()
+    upload_id = _create(client, owner, assignment_id, 10).json()["upload_id"]
+    assert client.get(f"/files/uploads/{upload_id}", headers=other).status_code == 404
+    assert _patch(client, other, upload_id, 0, b"x").status_code == 404
+    assert client.delete(f"/files/uploads/{upload_id}", headers=owner).status_code == 204
+    assert client.get(f"/files/uploads/{upload_id}", headers=owner).status_code == 404
+
+
+def test_expired_session(tmp_path):
+    sessions = UploadSessions(BlobStore(str(tmp_path)), ttl=0)
+    upload_id = sessions.create(1, 1, "a.txt", 10)["upload_id"]
+    with pytest.raises(UploadSessionError) as e:
+        sessions.load(upload_id, 1)
+    assert e.value.status_code == 410
+    assert os.listdir(sessions.root) == []
+
+
+def test_append_loads_session_off_the_event_loop(tmp_path):
+    import asyncio
+    import threading
+    sessions = UploadSessions(BlobStore(str(tmp_path)))
+    upload_id = sessions.create(1, 1, "a.txt", 3)["upload_id"]
+    load = sessions.load
+    threads = []
+
+    def record(*args):
+        threads.append(threading.current_thread())
+        return load(*args)
+
+    sessions.load = record
+
+    async def body():
+        yield b"abc"
+
+    assert asyncio.run(sessions.append(upload_id, 1, 0, body()))["offset"] == 3
+    # 元数据读取是文件 I/O，不在事件循环线程中执行
+    assert threads and threading.current_thread() not in threads
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+from typing import List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from schemas import (
+    AssignmentOut, AssignmentPage, ClassOut, CourseGradeStats, CoursePage, CourseStudentOut, StudentOut,
+    StudentPage, SubmissionOut, SubmissionPage, TeacherOutBase, TeacherPage, Token, TranscriptSummaryOut
+)
+from serialization import fast_json
+
+DEADLINE = datetime(2024, 6, 1, 23, 59, 59)
+
+STUDENT = {
+    "student_id": 1, "grade": "2021", "major": "计算机", "user_id": 7,
+    "user": {"user_id": 7, "username": "stu", "email": "stu@example.com", "password": "x"}
+}
+TEACHER = {"teacher_id": 2, "title": "教授", "department": "计算机", "user_id": 8}
+COURSE = {"course_id": 3, "course_name": "数据库", "credit": 4}
+ASSIGNMENT = {
+    "assignment_id": 4, "content": "实验一", "deadline": DEADLINE, "status": "open",
+    "max_upload_bytes": 1024, "teacher_id": 2, "course_id": 3
+}
+SUBMISSION = {
+    "submission_id": 5, "student_id": 1, "assignment_id": 4, "submit_time": DEADLINE,
+    "file_path": "sha256:ab/report.pdf", "file_size": 10, "file_sha256": "ab"
+}
+GRADE_STATS = {
+    "course_id": 3, "enrolled": 3, "graded": 2,
+    "mean": 80.5, "median": 80.5, "std": 9.5, "min": 71.0, "max": 90.0, "pass_rate": 1.0,
+    "percentiles": {"50": 80.5, "90": 88.1},
+    "histogram": {"edges": [0.0, 60.0, 100.0], "counts": [0, 2]},
+    "ranking": {"student_id": [1, 2], "grade": [90.0, 71.0], "rank": [1, 2]}
+}
+
+# 每个响应模型的所有 Optional 字段都填上非空值
+CASES = [
+    (Token, {"access_token": "a", "token_type": "bearer", "refresh_token": "r"}),
+    (CourseStudentOut, {"student_id": 1, "major": "计算机", "grade": 92.5, "course_id": 3, "course_name": "数据库"}),
+    (AssignmentOut, ASSIGNMENT),
+    (SubmissionOut, SUBMISSION),
+    (CourseGradeStats, GRADE_STATS),
+    (TranscriptSummaryOut, {"student_id": 1, "course_count": 2, "graded_credits": 6, "earned_credits": 6, "gpa": 3.5}),
+    (List[ClassOut], [{"class_id": 1, "class_name": "一班", "grade": "2021"}]),
+    (List[StudentOut], [STUDENT]),
+    (List[CourseGradeStats], [GRADE_STATS]),
+    (StudentPage, {"items": [STUDENT], "next_cursor": "eyJ2IjpbMV19"}),
+    (TeacherPage, {"items": [TEACHER], "next_cursor": "eyJ2IjpbMl19"}),
+    (CoursePage, {"items": [COURSE], "next_cursor": "eyJ2IjpbM119"}),
+    (AssignmentPage, {"items": [ASSIGNMENT], "next_cursor": "eyJ2IjpbNF19"}),
+    (SubmissionPage, {"items": [SUBMISSION], "next_cursor": "eyJ2IjpbNV19"}),
+]
+
+
+def _expected(model, content):
+    return jsonable_encoder(TypeAdapter(model).validate_python(content))
+
+
+@pytest.mark.parametrize("model,content", CASES, ids=lambda v: getattr(v, "__name__", None) or str(v)[:20])
+def test_fast_json_matches_response_model(model, content):
+    assert json.loads(fast_json(model, content).body) == _expected(model, content)
+
+
+@pytest.mark.parametrize("model,content", [
+    (AssignmentOut, {**ASSIGNMENT, "max_upload_bytes": None, "course_id": None}),
+    (StudentPage, {"items": [], "next_cursor": None}),
+    (TranscriptSummaryOut, {"student_id": 1, "course_count": 0, "graded_credits": 0, "earned_credits": 0, "gpa": None}),
+])
+def test_fast_json_with_empty_optionals(model, content):
+    assert json.loads(fast_json(model, content).body) == _expected(model, content)
+
+
+def test_fast_json_drops_undeclared_fields():
+    body = json.loads(fast_json(StudentPage, {"items": [STUDENT], "next_cursor": None}).body)
+    assert "password" not in body["items"][0]["user"]
+    assert "user_id" not in body["items"][0]
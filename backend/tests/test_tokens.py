@@ -0,0 +1,78 @@
+import pytest
+
+import tokens
+from tokens import RevocationList, SQLiteRevocationList, make_revocation_list
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def revocations(request, tmp_path):
+    if request.param == "memory":
+        return RevocationList(user_ttl=3600)
+    return SQLiteRevocationList(str(tmp_path / "revoked.db"), user_ttl=3600)
+
+
+def test_revoke_user_keeps_tokens_issued_in_same_second(revocations, monkeypatch):
+    monkeypatch.setattr(tokens.time, "time", lambda: 1000.7)
+    revocations.revoke_user(1)
+    # 令牌 iat 为整数秒：吊销之前签发的失效，同一秒内重新登录签发的仍有效
+    assert revocations.is_revoked(user_id=1, issued_at=999)
+    assert not revocations.is_revoked(user_id=1, issued_at=1000)
+    assert revocations.is_revoked(user_id=1, issued_at=None)
+    assert not revocations.is_revoked(user_id=2, issued_at=999)
+
+
+def test_revoke_token(revocations):
+    revocations.revoke_token("a", expires_at=tokens.time.time() + 60)
+    assert revocations.is_revoked(jti="a")
+    assert not revocations.is_revoked(jti="b")
+
+
+def test_sqlite_list_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "revoked.db")
+    first, second = SQLiteRevocationList(path, 3600), SQLiteRevocationList(path, 3600)
+    first.revoke_token("a", expires_at=tokens.time.time() + 60)
+    first.revoke_user(1)
+    assert second.is_revoked(jti="a")
+    assert second.is_revoked(user_id=1, issued_at=0)
+    assert second.stats()["users"] == 1
+
+
+def test_multiple_workers_require_shared_list(monkeypatch):
+    monkeypatch.setattr(tokens, "WEB_CONCURRENCY", 2)
+    monkeypatch.setattr(tokens, "REVOCATION_LIST_PATH", "")
+    with pytest.raises(RuntimeError):
+        make_revocation_list(3600)
+
+
+def test_force_logout_is_limited_to_own_students(client, make_teacher, make_student):
+    teacher, teacher_headers = make_teacher()
+    student, student_headers = make_student()
+    other, other_headers = make_student()
+    course = client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=teacher_headers).json()
+    assert client.post(f"/course/courses/{course['course_id']}/enroll", headers=student_headers).status_code == 201
+
+    # 未选修该教师课程的学生、以及学生下线他人均被拒绝
+    assert client.post(f"/users/{other['user']['user_id']}/revoke-tokens", headers=teacher_headers).status_code == 403
+    assert client.post(f"/users/{student['user']['user_id']}/revoke-tokens", headers=other_headers).status_code == 403
+
+    assert client.post(f"/users/{student['user']['user_id']}/revoke-tokens", headers=teacher_headers).status_code == 204
+    assert client.post(f"/users/{other['user']['user_id']}/revoke-tokens", headers=other_headers).status_code == 204
+
+
+def test_status_endpoints_require_admin(client, make_teacher):
+    from db import SessionLocal
+    from models import Permission
+    teacher, headers = make_teacher()
+    for path in ("/api/pool", "/api/cache", "/api/datastore"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=headers).status_code == 403
+
+    with SessionLocal() as db:
+        permission = Permission(permission_name="admin", description="管理员")
+        db.add(permission)
+        db.commit()
+        permission_id = permission.permission_id
+    assert client.post(f"/users/{teacher['user']['user_id']}/permissions",
+                       json={"permission_id": permission_id}).status_code == 201
+    for path in ("/api/pool", "/api/cache", "/api/datastore"):
+        assert client.get(path, headers=headers).status_code == 200
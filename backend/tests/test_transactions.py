@@ -0,0 +1,54 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from db import RoutingSession
+
+
+def _teacher_payload():
+    name = uuid.uuid4().hex[:12]
+    return {
+        "title": "讲师", "department": "计算机",
+        "user": {"username": name, "password": "p", "email": f"{name}@example.com"}
+    }
+
+
+def test_write_is_committed_before_response_is_sent(app, client):
+    events = []
+
+    def on_commit(session):
+        if not session.info.get("readonly"):
+            events.append("commit")
+
+    async def recording_app(scope, receive, send):
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                events.append("response")
+            await send(message)
+        await app(scope, receive, recording_send)
+
+    event.listen(RoutingSession, "after_commit", on_commit)
+    try:
+        with TestClient(recording_app) as c:
+            response = c.post("/tea/teachers/", json=_teacher_payload())
+    finally:
+        event.remove(RoutingSession, "after_commit", on_commit)
+    assert response.status_code == 200
+    assert events.index("commit") < events.index("response")
+
+
+def test_commit_failure_returns_500_and_rolls_back(client, monkeypatch):
+    def failing_commit(db):
+        db.rollback()
+        raise RuntimeError("commit failed")
+
+    payload = _teacher_payload()
+    monkeypatch.setattr(main.data_store._store, "commit", failing_commit)
+    response = client.post("/tea/teachers/", json=payload)
+    assert response.status_code == 500
+    monkeypatch.undo()
+
+    token = client.post("/token", data={"username": payload["user"]["username"], "password": "p"})
+    assert token.status_code == 401
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import transcript
+from db import SessionLocal
+from models import Course, StudentTranscriptSummary
+
+
+def _random_grade(rng):
+    return None if rng.random() < 0.2 else rng.choice([rng.uniform(0, 100), 59.5, 60, 90])
+
+
+def test_delta_sum_equals_summarize():
+    rng = random.Random(19)
+    for _ in range(50):
+        credits = {course_id: rng.randint(1, 5) for course_id in range(8)}
+        grades = {}
+        summary = dict.fromkeys(transcript.SUMMARY_FIELDS, 0)
+        for _ in range(30):
+            course_id = rng.randrange(8)
+            new_grade = _random_grade(rng)
+            changes = transcript.delta(credits[course_id], grades.get(course_id), new_grade, course_id not in grades)
+            for name, value in changes.items():
+                summary[name] += value
+            grades[course_id] = new_grade
+        expected = transcript.summarize({"credit": credits[c], "grade": g} for c, g in grades.items())
+        assert summary == pytest.approx(expected)
+
+
+@pytest.fixture
+def store(app):
+    from datastore import DataStore
+    return DataStore()
+
+
+def _stored(student_id):
+    with SessionLocal() as db:
+        row = db.get(StudentTranscriptSummary, student_id)
+        return {name: getattr(row, name) for name in transcript.SUMMARY_FIELDS}
+
+
+def _expected(store, student_id):
+    return transcript.summarize(store.get_student_courses(student_id))
+
+
+def test_incremental_summary_matches_rebuild(client, store, make_teacher, make_student):
+    rng = random.Random(7)
+    _, headers = make_teacher()
+    courses = [client.post("/course/courses/", json={"course_name": f"课程{i}", "credit": rng.randint(1, 5)},
+                           headers=headers).json()["course_id"] for i in range(4)]
+    students = [make_student()[0]["student_id"] for _ in range(3)]
+    for _ in range(40):
+        student_id, course_id = rng.choice(students), rng.choice(courses)
+        if rng.random() < 0.3:
+            store.enroll_student_in_course(student_id, course_id, _random_grade(rng))
+        else:
+            store.record_grade(student_id, course_id, _random_grade(rng))
+
+    incremental = {s: _stored(s) for s in students}
+    for student_id in students:
+        assert incremental[student_id] == pytest.approx(_expected(store, student_id))
+    assert store.rebuild_transcript_summaries(students) == len(students)
+    for student_id in students:
+        assert _stored(student_id) == pytest.approx(incremental[student_id])
+
+
+def test_credit_change_requires_course_rebuild(client, store, make_teacher, make_student):
+    _, headers = make_teacher()
+    course_id = client.post("/course/courses/", json={"course_name": "数据库", "credit": 2},
+                            headers=headers).json()["course_id"]
+    student_id = make_student()[0]["student_id"]
+    store.record_grade(student_id, course_id, 95)
+    assert _stored(student_id)["graded_credits"] == 2
+
+    with SessionLocal() as db:
+        db.query(Course).filter(Course.course_id == course_id).update({Course.credit: 4})
+        db.commit()
+    assert _stored(student_id)["graded_credits"] == 2
+
+    assert store.rebuild_course_transcripts(course_id) == 1
+    assert _stored(student_id) == pytest.approx(_expected(store, student_id))
+    assert _stored(student_id)["graded_credits"] == 4
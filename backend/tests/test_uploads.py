@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.requests import ClientDisconnect, Request
+
+from blobs import BlobStore
+from uploads import MULTIPART_OVERHEAD_BYTES, UploadTooLarge, receive_upload
+
+LIMIT = 1024
+BOUNDARY = "test-boundary"
+
+
+@pytest.fixture
+def assignment(client, make_teacher):
+    teacher, headers = make_teacher()
+    client.post("/course/courses/", json={"course_name": "数据库", "credit": 3}, headers=headers)
+    return client.post("/assign/assignments/", json={
+        "content": "实验", "deadline": (datetime.utcnow() + timedelta(days=7)).isoformat(), "status": "open",
+        "teacher_id": teacher["teacher_id"], "max_upload_bytes": LIMIT
+    }, headers=headers).json()
+
+
+@pytest.fixture
+def staging(app):
+    import main
+    tmp_dir = main.data_store.blob_store.tmp_dir
+    before = set(os.listdir(tmp_dir))
+    yield lambda: set(os.listdir(tmp_dir)) - before
+
+
+def _multipart(*parts) -> bytes:
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _post(client, url, body, headers):
+    return client.post(url, content=body, headers={
+        **headers, "Content-Type": f"multipart/form-data; boundary={BOUNDARY}"
+    })
+
+
+def test_submit_streams_file_into_blob_store(client, make_student, assignment, staging):
+    _, headers = make_student()
+    data = os.urandom(LIMIT)
+    response = client.post(f"/assign/assignments/{assignment['assignment_id']}/submit",
+                           files={"file": ("report.pdf", data)}, headers=headers)
+    assert response.status_code == 200
+    digest = hashlib.sha256(data).hexdigest()
+    assert response.json()["file_path"] == f"sha256:{digest}/report.pdf"
+    import main
+    with open(main.data_store.blob_store.path(digest), "rb") as f:
+        assert f.read() == data
+    assert staging() == set()
+
+
+def test_submit_rejects_oversized_content_length(client, make_student, assignment, staging):
+    _, headers = make_student()
+    body = _multipart(("file", b"x" * (LIMIT + MULTIPART_OVERHEAD_BYTES + 1), "big.bin"))
+    response = _post(client, f"/assign/assignments/{assignment['assignment_id']}/submit", body, headers)
+    assert response.status_code == 413
+    assert staging() == set()
+
+
+def test_upload_rejects_overflow_while_streaming(client, make_student, assignment, staging):
+    _, headers = make_student()
+    body = _multipart(("assignment_id", str(assignment["assignment_id"]).encode(), None),
+                      ("file", b"x" * (LIMIT + 1), "big.bin"))
+    assert _post(client, "/files/submissions/upload", body, headers).status_code == 413
+    assert staging() == set()
+
+
+def test_upload_requires_assignment_before_file(client, make_student, assignment, staging):
+    _, headers = make_student()
+    body = _multipart(("file", b"x", "a.txt"), ("assignment_id", str(assignment["assignment_id"]).encode(), None))
+    assert _post(client, "/files/submissions/upload", body, headers).status_code == 400
+
+    body = _multipart(("assignment_id", b"999999", None), ("file", b"x", "a.txt"))
+    assert _post(client, "/files/submissions/upload", body, headers).status_code == 404
+    assert staging() == set()
+
+
+def _request(messages, content_length=None):
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    messages = iter(messages)
+
+    async def receive():
+        return next(messages)
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def test_content_length_checked_before_reading_body(tmp_path):
+    def unread():
+        raise AssertionError("请求体不应被读取")
+        yield
+
+    request = _request(unread(), content_length=LIMIT + MULTIPART_OVERHEAD_BYTES + 1)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_upload(request, BlobStore(str(tmp_path)), LIMIT))
+
+
+def test_disconnect_removes_staging_file(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    head = _multipart(("file", b"x" * 100, "a.txt"))[:-len(f"\r\n--{BOUNDARY}--\r\n")]
+    request = _request([{"type": "http.request", "body": head, "more_body": True}, {"type": "http.disconnect"}])
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(receive_upload(request, blobs, LIMIT))
+    assert os.listdir(blobs.tmp_dir) == []
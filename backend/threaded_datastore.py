@@ -0,0 +1,181 @@
+import asyncio
+import contextvars
+import inspect
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from datastore import DataStore
+from db import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STREAM_BATCH_SIZE
+
+# 工作线程数与连接池上限一致，避免线程等待连接
+DATASTORE_MAX_WORKERS = DB_POOL_SIZE + DB_MAX_OVERFLOW
+# 排队等待的调用数超过该值时直接拒绝
+DATASTORE_MAX_QUEUE = 200
+
+
+class DataStoreOverloaded(Exception):
+    """线程池排队已满，拒绝新的数据库调用"""
+    pass
+
+
+def _take(gen, n: int):
+    return list(itertools.islice(gen, n))
+
+
+# === 线程池卸载层 ===
+class ThreadedDataStore:
+    """
+    同步 DataStore 的异步包装
+    - 每个方法调用在独立的定长线程池中执行，不阻塞事件循环
+    - 记录每个方法的排队耗时和执行耗时
+    - 排队数超过阈值时抛出 DataStoreOverloaded
+    """
+
+    def __init__(self, store: Optional[DataStore] = None,
+                 max_workers: int = DATASTORE_MAX_WORKERS,
+                 max_queue: int = DATASTORE_MAX_QUEUE):
+        self._store = store or DataStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="datastore")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._store, name)
+        # 非方法属性（principal_cache、upload_dir 等）直接透传
+        if name.startswith("_") or not callable(attr) or not hasattr(attr, "__self__"):
+            return attr
+        if inspect.isgeneratorfunction(attr):
+            return self._wrap_generator(name, attr)
+
+        async def call(*args, **kwargs):
+            return await self._submit(name, attr, args, kwargs)
+
+        call.__name__ = name
+        return call
+
+    @asynccontextmanager
+    async def unit_of_work(self, db: Optional[Session] = None, readonly: bool = False) -> AsyncGenerator[Session, None]:
+        """请求级事务：会话的创建、提交和关闭同样在线程池中执行"""
+        if db is not None:
+            yield db
+            return
+        cm = self._store.unit_of_work(readonly=readonly)
+        db = await self._submit("unit_of_work", cm.__enter__, (), {})
+        try:
+            yield db
+        except BaseException:
+            await self._submit("unit_of_work", cm.__exit__, sys.exc_info(), {}, force=True)
+            raise
+        else:
+            # 提交/关闭不受排队上限限制，避免会话泄漏
+            await self._submit("unit_of_work", cm.__exit__, (None, None, None), {}, force=True)
+
+    async def commit(self, db: Session) -> None:
+        # 与 unit_of_work 的提交一样不受排队上限限制
+        await self._submit("commit", self._store.commit, (db,), {}, force=True)
+
+    def _wrap_generator(self, name: str, fn):
+        """流式方法：生成器在线程池中按批推进，对外表现为异步生成器"""
+
+        async def stream(*args, **kwargs):
+            gen = fn(*args, **kwargs)
+            try:
+                while True:
+                    batch = await self._submit(name, _take, (gen, DB_STREAM_BATCH_SIZE), {})
+                    if not batch:
+                        return
+                    for item in batch:
+                        yield item
+            finally:
+                # 客户端断开时也要在线程中关闭生成器，释放会话和服务端游标
+                await self._submit(name, gen.close, (), {}, force=True)
+
+        stream.__name__ = name
+        return stream
+
+    async def _submit(self, name: str, fn, args, kwargs, force: bool = False):
+        with self._lock:
+            if not force and self._queued >= self.max_queue:
+                self._record(name, rejected=True)
+                raise DataStoreOverloaded(f"数据库调用排队已满: {name}")
+            self._queued += 1
+
+        enqueued = time.perf_counter()
+        ctx = contextvars.copy_context()
+        # 记录任务是否已出队，防止取消时重复扣减排队数
+        state = {"dequeued": False}
+
+        def run():
+            started = time.perf_counter()
+            with self._lock:
+                if not state["dequeued"]:
+                    state["dequeued"] = True
+                    self._queued -= 1
+                self._running += 1
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._running -= 1
+                    self._record(name, wait=started - enqueued, elapsed=finished - started)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, run)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not state["dequeued"]:
+                    state["dequeued"] = True
+                    self._queued -= 1
+            raise
+
+    def _record(self, name: str, wait: float = 0.0, elapsed: float = 0.0, rejected: bool = False):
+        # 调用方需持有 self._lock
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = {
+                "calls": 0, "rejected": 0,
+                "wait_total": 0.0, "wait_max": 0.0,
+                "exec_total": 0.0, "exec_max": 0.0
+            }
+        if rejected:
+            m["rejected"] += 1
+            return
+        m["calls"] += 1
+        m["wait_total"] += wait
+        m["wait_max"] = max(m["wait_max"], wait)
+        m["exec_total"] += elapsed
+        m["exec_max"] = max(m["exec_max"], elapsed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            methods = {}
+            for name, m in self._metrics.items():
+                calls = m["calls"]
+                methods[name] = {
+                    **m,
+                    "wait_avg": m["wait_total"] / calls if calls else 0.0,
+                    "exec_avg": m["exec_total"] / calls if calls else 0.0
+                }
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "methods": methods
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from cache import WEB_CONCURRENCY
+
+# 吊销记录上限（超出时先清理已过期的记录）
+REVOCATION_LIST_MAXSIZE = 10000
+# 吊销列表的共享存储（本机 SQLite 文件），多个 worker 据此保持一致；为空时仅进程内有效
+REVOCATION_LIST_PATH = os.getenv("REVOCATION_LIST_PATH", "")
+
+
+# === 令牌吊销列表 ===
+class RevocationList:
+    """
+    进程内令牌吊销列表（多 worker 部署使用 SQLiteRevocationList）
+    - 按 jti 吊销单个令牌（注销）
+    - 按用户吊销某时间点之前签发的全部令牌（强制下线）
+    记录在令牌自然过期后自动清理，列表保持很小
+    """
+
+    def __init__(self, user_ttl: float, maxsize: int = REVOCATION_LIST_MAXSIZE):
+        # 用户级吊销的保留时长，应不短于最长的令牌有效期
+        self.user_ttl = user_ttl
+        self.maxsize = maxsize
+        self._tokens: Dict[str, float] = {}
+        self._users: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._prune()
+            self._tokens[jti] = expires_at
+
+    def revoke_user(self, user_id: int) -> None:
+        # 令牌的 iat 精确到秒，吊销时间同样取整：同一秒内重新登录签发的令牌不受影响
+        with self._lock:
+            self._prune()
+            self._users[user_id] = int(time.time())
+
+    def is_revoked(self, jti: Optional[str] = None, user_id: Optional[int] = None,
+                   issued_at: Optional[float] = None) -> bool:
+        with self._lock:
+            if jti is not None and jti in self._tokens:
+                return True
+            if user_id is not None and user_id in self._users:
+                # 没有签发时间的旧令牌一律视为已吊销
+                return issued_at is None or issued_at < self._users[user_id]
+            return False
+
+    def _prune(self) -> None:
+        now = time.time()
+        if len(self._tokens) >= self.maxsize:
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        if len(self._users) >= self.maxsize:
+            self._users = {uid: at for uid, at in self._users.items() if at + self.user_ttl > now}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"tokens": len(self._tokens), "users": len(self._users), "shared": False}
+
+
+class SQLiteRevocationList:
+    """
+    保存在本机 SQLite 文件中的吊销列表，同一主机上的多个 worker 共享（接口同 RevocationList）
+    每个线程使用自己的连接；WAL 模式下读不阻塞写
+    """
+
+    def __init__(self, path: str, user_ttl: float):
+        self.path = path
+        self.user_ttl = user_ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS revoked_tokens (jti TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS revoked_users "
+            "(user_id INTEGER PRIMARY KEY, revoked_at INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        conn = self._conn()
+        self._prune(conn)
+        conn.execute("INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+
+    def revoke_user(self, user_id: int) -> None:
+        conn = self._conn()
+        self._prune(conn)
+        now = int(time.time())
+        conn.execute(
+            "INSERT OR REPLACE INTO revoked_users (user_id, revoked_at, expires_at) VALUES (?, ?, ?)",
+            (user_id, now, now + self.user_ttl)
+        )
+
+    def is_revoked(self, jti: Optional[str] = None, user_id: Optional[int] = None,
+                   issued_at: Optional[float] = None) -> bool:
+        conn = self._conn()
+        if jti is not None and conn.execute("SELECT 1 FROM revoked_tokens WHERE jti = ?", (jti,)).fetchone():
+            return True
+        if user_id is not None:
+            row = conn.execute("SELECT revoked_at FROM revoked_users WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                return issued_at is None or issued_at < row[0]
+        return False
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM revoked_users WHERE expires_at <= ?", (now,))
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        return {
+            "tokens": conn.execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0],
+            "users": conn.execute("SELECT COUNT(*) FROM revoked_users").fetchone()[0],
+            "shared": True
+        }
+
+
+def make_revocation_list(user_ttl: float):
+    """多 worker 时必须共享：进程内列表只在处理注销请求的 worker 中生效"""
+    if REVOCATION_LIST_PATH:
+        return SQLiteRevocationList(REVOCATION_LIST_PATH, user_ttl)
+    if WEB_CONCURRENCY > 1:
+        raise RuntimeError("WEB_CONCURRENCY > 1 时须设置 REVOCATION_LIST_PATH，各 worker 共享令牌吊销列表")
+    return RevocationList(user_ttl)
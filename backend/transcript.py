@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, Optional
+
+# 百分制成绩到 4.0 绩点的换算：(最低分, 绩点)，从高到低
+GRADE_POINTS = (
+    (90, 4.0), (85, 3.7), (82, 3.3), (78, 3.0), (75, 2.7),
+    (72, 2.3), (68, 2.0), (64, 1.5), (60, 1.0),
+)
+# 及格线，及格的课程计入已获学分
+PASSING_GRADE = 60
+# 汇总表（student_transcript_summary）中由选课记录计算的列
+SUMMARY_FIELDS = ("course_count", "graded_credits", "earned_credits", "grade_points")
+
+
+# === 成绩单汇总 ===
+def grade_point(grade: float) -> float:
+    for floor, point in GRADE_POINTS:
+        if grade >= floor:
+            return point
+    return 0.0
+
+
+def contribution(credit: int, grade: Optional[float]) -> Dict[str, float]:
+    """一门课对汇总的贡献；未出成绩的课程只计入课程数"""
+    if grade is None:
+        return {"graded_credits": 0, "earned_credits": 0, "grade_points": 0.0}
+    return {
+        "graded_credits": credit,
+        "earned_credits": credit if grade >= PASSING_GRADE else 0,
+        "grade_points": credit * grade_point(grade)
+    }
+
+
+def delta(credit: int, old_grade: Optional[float], new_grade: Optional[float], new_course: bool) -> Dict[str, float]:
+    """选课或改成绩时汇总各项的增量"""
+    old = contribution(credit, old_grade)
+    new = contribution(credit, new_grade)
+    changes = {name: new[name] - old[name] for name in new}
+    changes["course_count"] = 1 if new_course else 0
+    return changes
+
+
+def summarize(rows: Iterable[Dict]) -> Dict[str, float]:
+    """由选课记录（含 credit、grade）整体计算汇总，用于批量重建"""
+    summary = {"course_count": 0, "graded_credits": 0, "earned_credits": 0, "grade_points": 0.0}
+    for row in rows:
+        summary["course_count"] += 1
+        for name, value in contribution(row["credit"], row["grade"]).items():
+            summary[name] += value
+    return summary
+
+
+def summary_out(student_id: int, summary: Dict[str, float]) -> Dict:
+    """对外返回的汇总：加权绩点 = Σ(学分 × 绩点) / 已出成绩的学分"""
+    graded = summary["graded_credits"]
+    return {
+        "student_id": student_id,
+        "course_count": summary["course_count"],
+        "graded_credits": graded,
+        "earned_credits": summary["earned_credits"],
+        "gpa": round(summary["grade_points"] / graded, 2) if graded else None
+    }
@@ -0,0 +1,216 @@
+import hashlib
+import os
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import python_multipart as multipart
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # 旧版本的包名
+    import multipart
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import parse_options_header
+
+from blobs import BlobStore, make_ref
+
+# 每次读写的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 作业未单独设置上限时的提交文件大小上限（字节）
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# multipart 请求中文件以外的部分（表单字段、分段头）允许的字节数
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过大小上限"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"文件超过大小限制（{limit // (1024 * 1024)} MB）")
+        self.limit = limit
+
+
+class UploadFormError(Exception):
+    """multipart 请求格式错误或缺少文件"""
+
+
+# === 上传文件落盘 ===
+def _copy(source: BinaryIO, target: BinaryIO, max_bytes: int) -> Dict:
+    """逐块复制，同时计算长度和 sha256；超过上限立即停止"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        digest.update(chunk)
+        target.write(chunk)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+def store_upload(source: BinaryIO, blobs: BlobStore, max_bytes: int = UPLOAD_MAX_BYTES) -> Dict:
+    """
+    把文件流写入内容寻址存储，返回 {"sha256", "size", "created"}
+    先写入存储内的临时文件，得到摘要后收入存储；已有相同内容时丢弃临时文件（created 为 False）
+    """
+    fd, tmp_path = blobs.staging_file()
+    try:
+        with os.fdopen(fd, "wb") as target:
+            info = _copy(source, target, max_bytes)
+        info["created"] = blobs.adopt(tmp_path, info["sha256"])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return info
+
+
+def upload_openapi(**form_fields: str) -> Dict:
+    """流式接收的上传路由不声明 File / Form 参数，请求体结构通过 openapi_extra 写入接口文档"""
+    properties = {name: {"type": kind} for name, kind in form_fields.items()}
+    properties["file"] = {"type": "string", "format": "binary"}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": properties, "required": list(properties)
+    }}}}}
+
+
+class _StagedFile:
+    """multipart 中文件部分的落盘：攒满一块后在线程池中写入临时文件并更新摘要"""
+
+    def __init__(self, blobs: BlobStore, max_bytes: int):
+        fd, self.path = blobs.staging_file()
+        self.file = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.max_bytes = max_bytes
+        self.buffer = bytearray()
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self.buffer += data
+        if len(self.buffer) >= UPLOAD_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        block, self.buffer = bytes(self.buffer), bytearray()
+        if block:
+            await run_in_threadpool(self._write, block)
+
+    def _write(self, block: bytes) -> None:
+        self.digest.update(block)
+        self.file.write(block)
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def receive_upload(
+    request: Request,
+    blobs: BlobStore,
+    max_bytes: Union[int, Callable[[Dict[str, str]], Awaitable[int]]],
+    field: str = "file"
+) -> Dict:
+    """
+    直接解析 multipart 请求体，文件部分边接收边写入存储内的临时文件（只写一次盘），同时计算长度和摘要
+    返回 {"path", "size", "sha256", "created", "fields"}，path 为提交记录使用的引用，fields 为其他表单字段
+    - max_bytes 为大小上限，或以文件之前已收到的表单字段为参数返回上限的协程函数
+    - 上限固定时，Content-Length 已超过上限（加上表单开销）则不读取请求体，直接抛出 UploadTooLarge
+    - 超过上限、格式错误或客户端断开时删除临时文件
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadFormError("请求须为 multipart/form-data")
+    if isinstance(max_bytes, int):
+        declared = request.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise UploadTooLarge(max_bytes)
+
+    # 解析器的回调是同步的，事件先入队，每写入一块请求体后再依次处理
+    events: List[Tuple[str, bytes]] = []
+
+    def on(kind: str):
+        return lambda: events.append((kind, b""))
+
+    def on_data(kind: str):
+        return lambda data, start, end: events.append((kind, data[start:end]))
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on("begin"),
+        "on_header_field": on_data("header_field"),
+        "on_header_value": on_data("header_value"),
+        "on_header_end": on("header_end"),
+        "on_headers_finished": on("headers_finished"),
+        "on_part_data": on_data("data"),
+        "on_part_end": on("end"),
+    })
+
+    fields: Dict[str, str] = {}
+    form_bytes = 0
+    staged: Optional[_StagedFile] = None
+    filename = None
+    done = False
+    headers: Dict[bytes, bytes] = {}
+    header_field = header_value = b""
+    name = None
+    value = bytearray()
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    headers, header_field, header_value, name, value = {}, b"", b"", None, bytearray()
+                elif kind == "header_field":
+                    header_field += data
+                elif kind == "header_value":
+                    header_value += data
+                elif kind == "header_end":
+                    headers[header_field.lower()] = header_value
+                    header_field = header_value = b""
+                elif kind == "headers_finished":
+                    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    if name == field and b"filename" in options:
+                        if staged is not None:
+                            raise UploadFormError("只能上传一个文件")
+                        filename = options[b"filename"].decode("utf-8", "replace")
+                        limit = max_bytes if isinstance(max_bytes, int) else await max_bytes(fields)
+                        staged = _StagedFile(blobs, limit or UPLOAD_MAX_BYTES)
+                elif kind == "data":
+                    if name == field and staged is not None and not done:
+                        await staged.write(data)
+                    else:
+                        form_bytes += len(data)
+                        if form_bytes > MULTIPART_OVERHEAD_BYTES:
+                            raise UploadFormError("表单字段过大")
+                        value += data
+                elif kind == "end":
+                    if name == field and staged is not None:
+                        done = True
+                    elif name:
+                        fields[name] = value.decode("utf-8", "replace")
+            events.clear()
+        parser.finalize()
+        if staged is None or not done:
+            raise UploadFormError(f"缺少文件字段 {field}")
+        await staged.flush()
+        await run_in_threadpool(staged.file.close)
+        created = await run_in_threadpool(blobs.adopt, staged.path, staged.digest.hexdigest())
+    except BaseException as e:
+        if staged is not None:
+            await run_in_threadpool(staged.discard)
+        if isinstance(e, FormParserError):
+            raise UploadFormError("multipart 请求格式错误") from e
+        raise
+    sha256 = staged.digest.hexdigest()
+    return {"path": make_ref(sha256, filename), "size": staged.size, "sha256": sha256,
+            "created": created, "fields": fields}
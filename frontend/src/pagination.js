@@ -0,0 +1,15 @@
+import axios from 'axios';
+
+// 按 next_cursor 依次拉取分页列表，合并为一个数组
+export const fetchAllPages = async (url, config = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const params = { ...(config.params || {}) };
+    if (cursor) params.cursor = cursor;
+    const res = await axios.get(url, { ...config, params });
+    items.push(...res.data.items);
+    cursor = res.data.next_cursor;
+  } while (cursor);
+  return items;
+};